@@ -0,0 +1,69 @@
+"""
+Pull/reward throughput as the number of threads grows, with all threads
+on one bandit and with a bandit per thread, checking that no update is lost.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_contention
+"""
+
+import threading
+import time
+
+from flask_mab.bandits import EpsilonGreedyBandit, ThompsonBandit
+
+ITERATIONS = 20000
+
+
+def make_bandit(bandit_cls):
+    bandit = bandit_cls()
+    for arm in ("green", "red", "blue"):
+        bandit.add_arm(arm, arm)
+    return bandit
+
+
+def run(bandits):
+    def work(bandit):
+        for _ in range(ITERATIONS):
+            bandit.pull_arm("green")
+            bandit.reward_arm("green", 1.0)
+
+    workers = [threading.Thread(target=work, args=(bandit,)) for bandit in bandits]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def main():
+    print(
+        "%-22s %-8s %-10s %14s %8s" % ("bandit", "threads", "sharing", "ops/s", "exact")
+    )
+    for bandit_cls in (EpsilonGreedyBandit, ThompsonBandit):
+        for threads in (1, 2, 4, 8):
+            shared = make_bandit(bandit_cls)
+            for sharing, bandits in (
+                ("one", [shared] * threads),
+                ("separate", [make_bandit(bandit_cls) for _ in range(threads)]),
+            ):
+                elapsed = run(bandits)
+                exact = all(
+                    bandit["green"]["pulls"] == ITERATIONS * bandits.count(bandit)
+                    for bandit in bandits
+                )
+                print(
+                    "%-22s %-8d %-10s %14.0f %8s"
+                    % (
+                        bandit_cls.__name__,
+                        threads,
+                        sharing,
+                        2 * ITERATIONS * threads / elapsed,
+                        exact,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Cost of one request (suggest, pull and, some of the time, reward) as the
+number of arms grows to catalog scale, with and without the tree-backed
+large-arm mode.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_large_arms
+"""
+
+import timeit
+from random import random
+
+from flask_mab import bandits
+
+BANDITS = [
+    ("EpsilonGreedyBandit", {"epsilon": 0.1}),
+    ("NaiveStochasticBandit", {}),
+    ("SoftmaxBandit", {"tau": 0.1}),
+    ("AnnealingSoftmaxBandit", {}),
+    ("UCB1Bandit", {}),
+]
+
+
+def make_bandit(bandit_type, kwargs, n_arms, threshold):
+    bandit = getattr(bandits, bandit_type)(**kwargs)
+    bandit.large_arm_threshold = threshold
+    for arm in range(n_arms):
+        bandit.add_arm("arm-%d" % arm, arm)
+    for arm_id in bandit.arms:
+        bandit.pull_arm(arm_id)
+        if random() < 0.1:
+            bandit.reward_arm(arm_id, 1.0)
+    return bandit
+
+
+def request(bandit):
+    arm = bandit.suggest_arm()
+    bandit.pull_arm(arm.id)
+    if random() < 0.1:
+        bandit.reward_arm(arm.id, 1.0)
+
+
+def per_call(func, budget=0.05):
+    number, elapsed = 1, 0.0
+    while elapsed < budget:
+        number *= 2
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+    return elapsed / number * 1e6
+
+
+def main():
+    print("%-24s %8s %14s %14s" % ("bandit", "arms", "tree us", "scan us"))
+    for n_arms in (1000, 10000, 100000):
+        for bandit_type, kwargs in BANDITS:
+            timings = []
+            for threshold in (0, float("inf")):
+                bandit = make_bandit(bandit_type, kwargs, n_arms, threshold)
+                timings.append(per_call(lambda: request(bandit)))
+            print("%-24s %8d %14.2f %14.2f" % ((bandit_type, n_arms) + tuple(timings)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Per-request overhead of ``BanditMiddleware``, broken down by hook:
+``detect_last_bandits``, ``suggest_arm_for``, ``persist_bandits``,
+``remember_bandit_arms`` and ``send_debug_header``, plus the whole request
+as seen by the test client.
+
+Each configuration varies one thing from a baseline of one bandit with
+three arms, one ``choose_arm`` decorator, JSON cookies and no storage: the
+number of registered bandits, the number of stacked decorators, the arm
+count, the cookie encoding (or server-side assignments) or the storage
+engine.  Every configuration is timed for three kinds of request:
+a new visitor (arms are assigned, pulled and saved), a returning visitor
+(arms come from the cookie) and a reward.
+
+Results are written as JSON, and a previous results file can be compared
+against::
+
+    python -m benchmarks.bench_middleware --output before.json
+    # ... change things ...
+    python -m benchmarks.bench_middleware --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from importlib import metadata
+
+import flask
+import flask_mab
+from flask_mab import BanditMiddleware, choose_arm, reward_endpt
+from flask_mab.bandits import EpsilonGreedyBandit
+
+HOOKS = (
+    "detect_last_bandits",
+    "suggest_arm_for",
+    "persist_bandits",
+    "remember_bandit_arms",
+    "send_debug_header",
+)
+
+BASELINE = {
+    "storage": "BanditStorage",
+    "encoding": "json",
+    "bandits": 1,
+    "stacked": 1,
+    "arms": 3,
+}
+
+VARIATIONS = [
+    ("bandits", [5, 20, 100]),
+    ("stacked", [3, 5]),
+    ("arms", [100, 1000]),
+    ("encoding", ["compact", "server"]),
+    (
+        "storage",
+        [
+            "JSONBanditStorage",
+            "JSONBanditStorage+write-behind",
+            "BinaryBanditStorage",
+            "SQLiteBanditStorage",
+        ],
+    ),
+]
+
+
+def configurations():
+    yield dict(BASELINE)
+    for key, values in VARIATIONS:
+        for value in values:
+            config = dict(BASELINE)
+            config[key] = value
+            if key == "stacked":
+                config["bandits"] = max(config["bandits"], value)
+            yield config
+
+
+def make_app(config, directory):
+    app = flask.Flask("bench_app")
+    engine, _, write_behind = config["storage"].partition("+")
+    app.config["MAB_STORAGE_ENGINE"] = engine
+    if engine != "BanditStorage":
+        app.config["MAB_STORAGE_OPTS"] = (os.path.join(directory, "bandits"),)
+    app.config["MAB_WRITE_BEHIND"] = bool(write_behind)
+    if config["encoding"] == "server":
+        app.config["MAB_ASSIGNMENT_ENGINE"] = "AssignmentStorage"
+    else:
+        app.config["MAB_COOKIE_ENCODING"] = config["encoding"]
+    BanditMiddleware(app)
+    for ind in range(config["bandits"]):
+        bandit = EpsilonGreedyBandit(0.1)
+        for arm in range(config["arms"]):
+            bandit.add_arm("arm-%d" % arm, arm)
+        app.add_bandit("exp-%d" % ind, bandit)
+
+    def view(**kwargs):
+        return "ok"
+
+    def reward():
+        return "thanks"
+
+    for ind in range(config["stacked"]):
+        view = choose_arm("exp-%d" % ind)(view)
+        reward = reward_endpt("exp-%d" % ind, 1.0)(reward)
+    app.add_url_rule("/view", "view", view)
+    app.add_url_rule("/reward", "reward", reward)
+    return app
+
+
+def instrument(app, timings):
+    def timed(name, func):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[name] += time.perf_counter() - started
+
+        return wrapper
+
+    for funcs in (app.before_request_funcs[None], app.after_request_funcs[None]):
+        for position, func in enumerate(funcs):
+            if func.__name__ in HOOKS:
+                funcs[position] = timed(func.__name__, func)
+    return timed("suggest_arm_for", flask_mab.suggest_arm_for)
+
+
+def run_config(config, requests):
+    directory = tempfile.mkdtemp()
+    original = flask_mab.suggest_arm_for
+    try:
+        app = make_app(config, directory)
+        timings = defaultdict(float)
+        flask_mab.suggest_arm_for = instrument(app, timings)
+        client = app.test_client(use_cookies=False)
+        set_cookie = client.get("/view").headers.get("Set-Cookie")
+        cookie = {"Cookie": set_cookie.split(";")[0]}
+
+        rows = []
+        for scenario, path, headers in (
+            ("new", "/view", {}),
+            ("returning", "/view", cookie),
+            ("reward", "/reward", cookie),
+        ):
+            timings.clear()
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.get(path, headers=headers)
+            elapsed = time.perf_counter() - started
+            row = dict(config)
+            row["scenario"] = scenario
+            row["request_us"] = elapsed / requests * 1e6
+            row["hooks_us"] = dict(
+                [(hook, timings[hook] / requests * 1e6) for hook in HOOKS]
+            )
+            rows.append(row)
+        storage = app.extensions["mab"].bandit_storage
+        if hasattr(storage, "close"):
+            storage.close()
+        return rows
+    finally:
+        flask_mab.suggest_arm_for = original
+        shutil.rmtree(directory)
+
+
+def row_key(row):
+    return tuple(
+        row.get(key, BASELINE.get(key))
+        for key in ("scenario", "storage", "encoding", "bandits", "stacked", "arms")
+    )
+
+
+def print_rows(rows, previous=None):
+    previous = dict([(row_key(row), row) for row in (previous or [])])
+    header = "%-10s %-31s %-8s %4s %4s %5s %10s" % (
+        "scenario",
+        "storage",
+        "cookie",
+        "bnd",
+        "stk",
+        "arms",
+        "request",
+    )
+    print(header + "".join(" %10s" % hook[:10] for hook in HOOKS))
+    for row in rows:
+        line = "%-10s %-31s %-8s %4d %4d %5d %10.1f" % (
+            row["scenario"],
+            row["storage"],
+            row["encoding"],
+            row["bandits"],
+            row["stacked"],
+            row["arms"],
+            row["request_us"],
+        )
+        line += "".join(" %10.1f" % row["hooks_us"][hook] for hook in HOOKS)
+        before = previous.get(row_key(row))
+        if before:
+            line += "  (%+.0f%%)" % (
+                (row["request_us"] / before["request_us"] - 1) * 100
+            )
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="bench_middleware.json")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for config in configurations():
+        rows.extend(run_config(config, args.requests))
+
+    results = {
+        "flask_mab": flask_mab.__version__,
+        "flask": metadata.version("flask"),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "requests": args.requests,
+        "results": rows,
+    }
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as earlier:
+            previous = json.load(earlier)["results"]
+    print_rows(rows, previous)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares the JSON and binary snapshot formats: encoded size, and encode and
+decode time, for a range of bandit and arm counts.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_snapshot
+"""
+
+import json
+import timeit
+from random import random
+
+import flask_mab.storage
+from flask_mab.bandits import EpsilonGreedyBandit
+
+
+def make_bandits(n_bandits, n_arms):
+    bandits = {}
+    for ind in range(n_bandits):
+        bandit = EpsilonGreedyBandit(0.1)
+        for arm in range(n_arms):
+            bandit.add_arm("arm-%d" % arm, "value-%d" % arm)
+            bandit.pulls[arm] = int(random() * 100000)
+            bandit.reward[arm] = random() * 1000
+            bandit.confidence[arm] = random()
+        bandits["experiment-%d" % ind] = bandit
+    return bandits
+
+
+def formats():
+    yield "json", (
+        lambda bandits: json.dumps(
+            bandits, indent=4, cls=flask_mab.storage.BanditEncoder
+        ),
+        lambda data: json.loads(data, cls=flask_mab.storage.BanditDecoder),
+    )
+    yield "binary", (
+        flask_mab.storage.dumps_binary,
+        flask_mab.storage.loads_binary,
+    )
+    yield "binary+zlib", (
+        lambda bandits: flask_mab.storage.dumps_binary(bandits, compress=True),
+        flask_mab.storage.loads_binary,
+    )
+
+
+def main():
+    print(
+        "%-10s %-6s %-12s %12s %12s %12s"
+        % ("bandits", "arms", "format", "bytes", "encode ms", "decode ms")
+    )
+    for n_bandits, n_arms in [(10, 3), (500, 3), (500, 50), (10, 5000)]:
+        bandits = make_bandits(n_bandits, n_arms)
+        for name, (dumps, loads) in formats():
+            data = dumps(bandits)
+            encode = min(timeit.repeat(lambda: dumps(bandits), number=1, repeat=5))
+            decode = min(timeit.repeat(lambda: loads(data), number=1, repeat=5))
+            print(
+                "%-10d %-6d %-12s %12d %12.2f %12.2f"
+                % (n_bandits, n_arms, name, len(data), encode * 1e3, decode * 1e3)
+            )
+
+
+if __name__ == "__main__":
+    main()
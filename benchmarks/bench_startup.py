@@ -0,0 +1,69 @@
+"""
+Measures app startup time, i.e. registering every experiment with
+``add_bandit``, against a JSON storage file holding that many saved bandits.
+
+The "per-call load" column re-reads the whole file for each registration,
+which is how ``add_bandit`` used to work; it is skipped for the largest
+sizes where it takes minutes.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_startup
+"""
+
+import os
+import tempfile
+import time
+
+import flask
+import flask_mab.storage
+from flask_mab import BanditMiddleware
+from flask_mab.bandits import EpsilonGreedyBandit
+
+
+def make_bandit():
+    bandit = EpsilonGreedyBandit(0.1)
+    for arm in ("green", "red", "blue"):
+        bandit.add_arm(arm, arm)
+    return bandit
+
+
+def start_app(path, names):
+    app = flask.Flask("bench_app")
+    app.config["MAB_STORAGE_ENGINE"] = "JSONBanditStorage"
+    app.config["MAB_STORAGE_OPTS"] = (path,)
+    BanditMiddleware(app)
+    started = time.perf_counter()
+    for name in names:
+        app.add_bandit(name, make_bandit())
+    return time.perf_counter() - started
+
+
+def start_app_per_call_load(path, names):
+    storage = flask_mab.storage.JSONBanditStorage(path)
+    bandits = {}
+    started = time.perf_counter()
+    for name in names:
+        bandits[name] = storage.load().get(name, None) or make_bandit()
+    return time.perf_counter() - started
+
+
+def main():
+    print("%-10s %16s %16s" % ("bandits", "cached load s", "per-call load s"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bandits.json")
+        for count in (100, 1000, 3000, 5000):
+            names = ["experiment-%d" % ind for ind in range(count)]
+            flask_mab.storage.JSONBanditStorage(path).save(
+                dict([(name, make_bandit()) for name in names])
+            )
+            cached = start_app(path, names)
+            if count <= 1000:
+                per_call = "%16.3f" % start_app_per_call_load(path, names)
+            else:
+                per_call = "%16s" % "skipped"
+            print("%-10d %16.3f %s" % (count, cached, per_call))
+
+
+if __name__ == "__main__":
+    main()
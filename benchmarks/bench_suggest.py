@@ -0,0 +1,68 @@
+"""
+Per-suggestion cost of each bandit class for small, medium and large arm
+counts, along with the cost of an arm lookup, a pull and a reward.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_suggest
+"""
+
+import timeit
+from random import random
+
+from flask_mab import bandits
+
+BANDITS = [
+    ("EpsilonGreedyBandit", {"epsilon": 0.1}),
+    ("NaiveStochasticBandit", {}),
+    ("SoftmaxBandit", {"tau": 0.1}),
+    ("AnnealingSoftmaxBandit", {}),
+    ("ThompsonBandit", {}),
+    ("UCB1Bandit", {}),
+]
+
+
+def make_bandit(bandit_type, kwargs, n_arms):
+    bandit = getattr(bandits, bandit_type)(**kwargs)
+    for arm in range(n_arms):
+        bandit.add_arm("arm-%d" % arm, arm)
+    for arm in range(n_arms):
+        arm_id = "arm-%d" % arm
+        bandit.pull_arm(arm_id)
+        if random() < 0.5:
+            bandit.reward_arm(arm_id, 1.0)
+    return bandit
+
+
+def per_call(func, budget=0.05):
+    number, elapsed = 1, 0.0
+    while elapsed < budget:
+        number *= 2
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+    return elapsed / number * 1e6
+
+
+def main():
+    print(
+        "%-24s %6s %14s %12s %12s %12s"
+        % ("bandit", "arms", "suggest us", "lookup us", "pull us", "reward us")
+    )
+    for n_arms in (2, 50, 5000):
+        for bandit_type, kwargs in BANDITS:
+            bandit = make_bandit(bandit_type, kwargs, n_arms)
+            last = "arm-%d" % (n_arms - 1)
+            print(
+                "%-24s %6d %14.2f %12.2f %12.2f %12.2f"
+                % (
+                    bandit_type,
+                    n_arms,
+                    per_call(bandit.suggest_arm),
+                    per_call(lambda: bandit[last]),
+                    per_call(lambda: bandit.pull_arm(last)),
+                    per_call(lambda: bandit.reward_arm(last, 1.0)),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
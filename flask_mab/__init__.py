@@ -11,9 +11,12 @@ Multi-armed bandit experiments on Flask apps.
 """
 
 from flask import current_app, request
-import json
 import flask_mab.storage
+import flask_mab.counters
+import flask_mab.cookies
+import flask_mab.assignments
 from flask_mab.mab import Mab
+import inspect
 import types
 from functools import wraps
 
@@ -21,28 +24,47 @@ from functools import wraps
 __version__ = "3.0.0"
 
 
-def choose_arm(bandit):
+def choose_arm(bandit, context=None):
     """Route decorator for registering an impression conveinently
 
+    Works on both plain and ``async def`` views.
+
     :param bandit: The bandit/experiment to register for
     :type bandit: string
+    :param context: Optional callable returning the feature vector for the
+                    current request, for contextual bandits such as
+                    :class:`flask_mab.bandits.LinUCBBandit`
     """
 
     def decorator(func):
         # runs @ service init
         if not hasattr(func, "bandits"):
             func.bandits = []
-        func.bandits.append(bandit)
+        func.bandits.append((bandit, context))
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
+        def assign_arms(kwargs):
             # runs at endpoint hit
             add_args = []
-            for bandit in func.bandits:
+            for bandit, context in func.bandits:
                 # Fetch from request first here?
-                arm_id, arm_value = suggest_arm_for(bandit)
+                arm_id, arm_value = suggest_arm_for(
+                    bandit, context() if context is not None else None
+                )
                 add_args.append((bandit, arm_value))
             kwargs.update(add_args)
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                assign_arms(kwargs)
+                return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            assign_arms(kwargs)
             return func(*args, **kwargs)
 
         return wrapper
@@ -50,8 +72,8 @@ def choose_arm(bandit):
     return decorator
 
 
-def reward_endpt(bandit, reward_val=1):
-    """Route decorator for rewards.
+def reward_endpt(bandit, reward_val=1, context=None):
+    """Route decorator for rewards, on plain or ``async def`` views.
 
     :param bandit: The bandit/experiment to register rewards
                    for using arm found in cookie.
@@ -59,20 +81,37 @@ def reward_endpt(bandit, reward_val=1):
     :param reward: The amount of reward this endpoint should
                    give its winning arm
     :type reward: float
+    :param context: Optional callable returning the feature vector for the
+                    current request, passed along with the reward
     """
 
     def decorator(func):
         if not hasattr(func, "rewards"):
             func.rewards = []
-        func.rewards.append((bandit, reward_val))
+        func.rewards.append((bandit, reward_val, context))
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for bandit, reward_amt in func.rewards:
+        def register_rewards():
+            _load_request_bandits(current_app)
+            for bandit, reward_amt, context in func.rewards:
                 if bandit in request.bandits.keys():
                     request.bandits_reward.add(
                         (bandit, request.bandits[bandit][0], reward_amt)
                     )
+                    if context is not None:
+                        request.bandit_contexts.setdefault(bandit, context())
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                register_rewards()
+                return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            register_rewards()
             return func(*args, **kwargs)
 
         return wrapper
@@ -99,8 +138,25 @@ class BanditMiddleware(object):
         )
         storage_opts = app.config.get("MAB_STORAGE_OPTS", tuple())
         storage_backend = storage_engine(*storage_opts)
+        if app.config.get("MAB_WRITE_BEHIND", False):
+            storage_backend = flask_mab.storage.WriteBehindStorage(
+                storage_backend,
+                app.config.get("MAB_FLUSH_INTERVAL", 5.0),
+                app.config.get("MAB_FLUSH_MAX_PENDING", 100),
+            )
         app.extensions["mab"].bandit_storage = storage_backend
 
+    def _register_assignment_store(self, app):
+        engine_name = app.config.get("MAB_ASSIGNMENT_ENGINE")
+        if not engine_name:
+            return
+        assignment_engine = getattr(flask_mab.assignments, engine_name)
+        app.extensions["mab"].assignment_store = flask_mab.assignments.AssignmentStore(
+            assignment_engine(*app.config.get("MAB_ASSIGNMENT_OPTS", tuple())),
+            app.config.get("MAB_ASSIGNMENT_CACHE_SIZE", 10000),
+            app.config.get("MAB_ASSIGNMENT_TTL", 30 * 86400),
+        )
+
     def init_app(self, app):
         """Attach Multi Armed Bandit to application and configure
 
@@ -109,11 +165,28 @@ class BanditMiddleware(object):
         app.config.setdefault("MAB_COOKIE_NAME", "MAB")
         app.config.setdefault("MAB_COOKIE_PATH", "/")
         app.config.setdefault("MAB_COOKIE_TTL", None)
+        app.config.setdefault("MAB_COOKIE_ENCODING", "json")
+        app.config.setdefault("MAB_COOKIE_CACHE_SIZE", 1024)
+        app.config.setdefault("MAB_ASSIGNMENT_ENGINE", None)
+        app.config.setdefault("MAB_ASSIGNMENT_OPTS", tuple())
+        app.config.setdefault("MAB_ASSIGNMENT_CACHE_SIZE", 10000)
+        app.config.setdefault("MAB_ASSIGNMENT_TTL", 30 * 86400)
         app.config.setdefault("MAB_DEBUG_HEADERS", True)
+        app.config.setdefault("MAB_WRITE_BEHIND", False)
+        app.config.setdefault("MAB_FLUSH_INTERVAL", 5.0)
+        app.config.setdefault("MAB_FLUSH_MAX_PENDING", 100)
+        app.config.setdefault("MAB_SHARED_COUNTERS", None)
+        app.config.setdefault("MAB_SHARED_COUNTERS_SLOTS", 4096)
         if not hasattr(app, "extensions"):
             app.extensions = {}
         app.extensions["mab"] = Mab(app)
         self._register_storage(app)
+        self._register_assignment_store(app)
+        if app.config.get("MAB_SHARED_COUNTERS"):
+            app.extensions["mab"].counter_table = flask_mab.counters.SharedCounterTable(
+                app.config["MAB_SHARED_COUNTERS"],
+                app.config.get("MAB_SHARED_COUNTERS_SLOTS", 4096),
+            )
         if hasattr(app, "teardown_appcontext"):
             app.teardown_appcontext(self.teardown)
         else:
@@ -122,9 +195,18 @@ class BanditMiddleware(object):
         app.extensions["mab"].bandits = {}
         app.extensions["mab"].reward_endpts = []
         app.extensions["mab"].pull_endpts = []
+        app.extensions["mab"].bandit_endpoints = {}
 
         app.extensions["mab"].debug_headers = app.config.get("MAB_DEBUG_HEADERS", True)
         app.extensions["mab"].cookie_name = app.config.get("MAB_COOKIE_NAME", "MAB")
+        try:
+            app.extensions["mab"].cookie_codec = flask_mab.cookies.CookieCodec(
+                app.extensions["mab"].bandits,
+                app.config.get("MAB_COOKIE_ENCODING", "json"),
+                app.config.get("MAB_COOKIE_CACHE_SIZE", 1024),
+            )
+        except ValueError as err:
+            raise MABConfigException(str(err))
         self._init_detection(app)
 
     def teardown(self, *args, **kwargs):
@@ -135,62 +217,101 @@ class BanditMiddleware(object):
         """
         Attaches all request before/after handlers for bandits.
 
+        Only requests that touch a bandit are tracked: those routed to a view
+        decorated with :func:`choose_arm` or :func:`reward_endpt`, and those
+        calling :func:`suggest_arm_for`.  For every other request (static
+        files, health checks...) the handlers return straight away, without
+        reading the cookie, saving bandits or setting headers.
+
         Nested functions are as follows
 
         * detect_last_bandits: Loads any arms already assigned to this user
-                               from the cookie.
+                               from the cookie, for decorated endpoints.
         * persist_bandits:     Saves bandits down to storage engine at the end
-                               of the request
-        * remember_bandit_arms: Sets the cookie for all requests that pulled an arm
+                               of the request, if any of them changed
+        * remember_bandit_arms: Pulls and rewards arms, and sets the cookie
+                                if an assignment or open reward changed (or
+                                saves the visitor's assignments to the
+                                assignment store, if there is one)
         * send_debug_header: Attaches a header for the MAB to the HTTP response for easier debugging
         """
 
         @app.before_request
         def detect_last_bandits():
-            bandits = request.cookies.get(app.extensions["mab"].cookie_name)
-            request.bandits_save = False
-            request.bandits_reward = set()
-            if bandits:
-                request.bandits = json.loads(bandits)
-            else:
-                request.bandits = {}
+            if _endpoint_uses_bandits(app, request.endpoint):
+                _load_request_bandits(app)
 
         @app.after_request
         def persist_bandits(response):
-            app.extensions["mab"].bandit_storage.save(app.extensions["mab"].bandits)
+            if not hasattr(request, "bandits"):
+                return response
+            bandits = app.extensions["mab"].bandits
+            dirty = [bandit for bandit in bandits.values() if bandit._dirty]
+            if dirty:
+                for bandit in dirty:
+                    bandit._dirty = False
+                app.extensions["mab"].bandit_storage.save(bandits)
             return response
 
         @app.after_request
         def remember_bandit_arms(response):
+            if not hasattr(request, "bandits"):
+                return response
+            storage = app.extensions["mab"].bandit_storage
             if request.bandits_save:
                 for (
                     bandit_id,
                     (arm, _),
                 ) in request.bandits.items():
-                    # hook event for saving an impression here
-                    app.extensions["mab"].bandits[bandit_id].pull_arm(arm)
+                    storage.apply_pull(
+                        bandit_id,
+                        app.extensions["mab"].bandits[bandit_id],
+                        arm,
+                        request.bandit_contexts.get(bandit_id),
+                    )
 
             for bandit_id, arm, amt in request.bandits_reward:
                 try:
                     stored_arm, open = request.bandits[bandit_id]
                     if open:
-                        app.extensions["mab"].bandits[bandit_id].reward_arm(arm, amt)
+                        storage.apply_reward(
+                            bandit_id,
+                            app.extensions["mab"].bandits[bandit_id],
+                            arm,
+                            amt,
+                            request.bandit_contexts.get(bandit_id),
+                        )
                         request.bandits[bandit_id] = (arm, False)
-                    # hook event for saving a reward line here
+                        request.bandits_changed = True
                 except KeyError:
                     raise MABConfigException("Bandit %s not found" % bandit_id)
 
-            response.set_cookie(
-                app.extensions["mab"].cookie_name,
-                json.dumps(request.bandits),
-                secure=True,
-                httponly=True,
-                samesite="Lax",
-            )
+            if not (request.bandits_save or request.bandits_changed):
+                return response
+            assignment_store = app.extensions["mab"].assignment_store
+            cookie = None
+            if assignment_store is None:
+                cookie = app.extensions["mab"].cookie_codec.encode(request.bandits)
+            else:
+                # Known visitors keep their id, only the store changes
+                if request.bandit_visitor is None:
+                    cookie = flask_mab.assignments.new_visitor_id()
+                    request.bandit_visitor = cookie
+                assignment_store.set(request.bandit_visitor, request.bandits)
+            if cookie is not None:
+                response.set_cookie(
+                    app.extensions["mab"].cookie_name,
+                    cookie,
+                    secure=True,
+                    httponly=True,
+                    samesite="Lax",
+                )
             return response
 
         @app.after_request
         def send_debug_header(response):
+            if not hasattr(request, "bandits"):
+                return response
             if app.extensions["mab"].debug_headers and request.bandits_save:
                 response.headers["X-MAB-Debug"] = "STORE; " + ";".join(
                     ["%s:%s" % (key, val[0]) for key, val in request.bandits.items()]
@@ -204,6 +325,51 @@ class BanditMiddleware(object):
         app.add_bandit = types.MethodType(add_bandit, app)
 
 
+def _endpoint_uses_bandits(app, endpoint):
+    """Whether the view for ``endpoint`` is decorated with
+    :func:`choose_arm` or :func:`reward_endpt`, cached per endpoint
+    """
+    known = app.extensions["mab"].bandit_endpoints
+    try:
+        return known[endpoint]
+    except KeyError:
+        view = app.view_functions.get(endpoint)
+        uses = hasattr(view, "bandits") or hasattr(view, "rewards")
+        known[endpoint] = uses
+        return uses
+
+
+def _load_request_bandits(app):
+    """Start tracking bandits for the current request, reading the arms
+    already assigned to this user from the cookie.  Does nothing if the
+    request is tracked already.
+    """
+    if hasattr(request, "bandits"):
+        return
+    bandits = request.cookies.get(app.extensions["mab"].cookie_name)
+    request.bandits_save = False
+    request.bandits_changed = False
+    request.bandits_reward = set()
+    request.bandit_contexts = {}
+    request.bandit_visitor = None
+    assignment_store = app.extensions["mab"].assignment_store
+    if not bandits:
+        request.bandits = {}
+    elif flask_mab.assignments.is_visitor_id(bandits):
+        if assignment_store is not None:
+            request.bandit_visitor = bandits
+            request.bandits = assignment_store.get(bandits) or {}
+        else:
+            request.bandits = {}
+    else:
+        codec = app.extensions["mab"].cookie_codec
+        request.bandits = codec.decode(bandits)
+        # Assignments move into the store when there is one
+        request.bandits_changed = assignment_store is not None or (
+            codec.needs_rewrite(bandits)
+        )
+
+
 def add_bandit(app, name, bandit=None):
     """Attach a bandit for an experiment
 
@@ -211,14 +377,20 @@ def add_bandit(app, name, bandit=None):
     :param bandit: The bandit to use for this experiment
     :type bandit: Bandit
     """
-    saved_bandits = app.extensions["mab"].bandit_storage.load()
-    if name in saved_bandits.keys():
-        app.extensions["mab"].bandits[name] = saved_bandits[name]
-    else:
-        app.extensions["mab"].bandits[name] = bandit
+    saved_bandit = app.extensions["mab"].bandit_storage.load_bandit(name)
+    if saved_bandit is not None:
+        bandit = saved_bandit
+    if app.extensions["mab"].counter_table is not None:
+        app.extensions["mab"].counter_table.attach(name, bandit)
+    app.extensions["mab"].bandits[name] = bandit
+    try:
+        app.extensions["mab"].cookie_codec.add(name)
+    except ValueError as err:
+        del app.extensions["mab"].bandits[name]
+        raise MABConfigException(str(err))
 
 
-def suggest_arm_for(key):
+def suggest_arm_for(key, context=None):
     """Get an experimental outcome by id.  The primary way the implementor interfaces with their
     experiments.
 
@@ -226,10 +398,14 @@ def suggest_arm_for(key):
 
     :param key: The bandit/experiment to get a suggested arm for
     :type key: string
-    :param also_pull: Should we register a pull/impression at the same time as suggesting
+    :param context: Feature vector for contextual bandits, also used for the
+                    pull and any reward later in this request
     :raises KeyError: in case requested experiment does not exist
     """
     app = current_app
+    _load_request_bandits(app)
+    if context is not None:
+        request.bandit_contexts[key] = context
     try:
         # Try to get the selected bandits from cookie
         arm = app.extensions["mab"].bandits[key][request.bandits[key][0]]
@@ -237,7 +413,11 @@ def suggest_arm_for(key):
     except (AttributeError, TypeError, KeyError) as err:
         # Assign an arm for a new client
         try:
-            arm = app.extensions["mab"].bandits[key].suggest_arm()
+            bandit = app.extensions["mab"].bandits[key]
+            if context is None:
+                arm = bandit.suggest_arm()
+            else:
+                arm = bandit.suggest_arm(context)
             request.bandits[key] = (arm["id"], True)
             request.bandits_save = True
             return arm["id"], arm["value"]
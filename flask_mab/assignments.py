@@ -0,0 +1,207 @@
+"""
+flask_mab.assignments
+~~~~~~~~~~~~~~~~~~~~~
+
+Server-side storage of visitors' assigned arms.  With
+``MAB_ASSIGNMENT_ENGINE`` set, the cookie holds only a short visitor id and
+the assignments, ``{experiment: (arm_id, reward_open)}``, are looked up in an
+:class:`AssignmentStore`: an in-process LRU with a time to live in front of
+one of the engines below.  Headers stay the same size however many
+experiments are live, and ``MAB_ASSIGNMENT_CACHE_SIZE`` bounds the memory
+assignments take.
+"""
+
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+#: Prefix of visitor ids, telling them apart from cookies holding assignments
+VISITOR_PREFIX = "v."
+
+_VISITOR_ID = re.compile(r"^v\.[A-Za-z0-9_-]{8,43}$")
+
+
+def new_visitor_id():
+    return VISITOR_PREFIX + secrets.token_urlsafe(12)
+
+
+def is_visitor_id(value):
+    """Whether a cookie value is a visitor id rather than assignments"""
+    return bool(_VISITOR_ID.match(value))
+
+
+class AssignmentStorage(object):
+    """The base interface for an assignment engine.  Keeps nothing, so
+    assignments only live in the in-process cache.
+    """
+
+    def load(self, visitor_id, since):
+        """``(assignments, saved)`` for a visitor whose assignments were
+        saved at or after ``since``, a :func:`time.time`, otherwise ``None``
+        """
+        return None
+
+    def newer(self, visitor_id, saved):
+        """``(assignments, saved)`` for a visitor whose assignments were
+        saved after ``saved``, by another process, otherwise ``None``
+        """
+        return None
+
+    def save(self, visitor_id, assignments, timestamp):
+        pass
+
+    def expire(self, before):
+        """Drop assignments last saved before ``before``"""
+        pass
+
+
+class SQLiteAssignmentStorage(AssignmentStorage):
+    """SQLite table of assignments, one row per visitor
+
+    Like :class:`flask_mab.storage.SQLiteBanditStorage`, the database runs in
+    WAL mode and each thread reuses its own connection, so several processes
+    on one host can share the file.
+
+    :param filepath: Path of the database file
+    """
+
+    def __init__(self, filepath):
+        self.file_handle = filepath
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS assignments ("
+                "visitor TEXT PRIMARY KEY, assigned TEXT NOT NULL, "
+                "saved REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS assignments_saved ON assignments (saved)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.file_handle, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _select(self, visitor_id, condition, timestamp):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT assigned, saved FROM assignments "
+                "WHERE visitor = ? AND saved %s ?" % condition,
+                (visitor_id, timestamp),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        assignments = dict(
+            [(name, tuple(assigned)) for name, assigned in json.loads(row[0]).items()]
+        )
+        return assignments, row[1]
+
+    def load(self, visitor_id, since):
+        return self._select(visitor_id, ">=", since)
+
+    def newer(self, visitor_id, saved):
+        return self._select(visitor_id, ">", saved)
+
+    def save(self, visitor_id, assignments, timestamp):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO assignments (visitor, assigned, saved) "
+                "VALUES (?, ?, ?)",
+                (visitor_id, json.dumps(assignments), timestamp),
+            )
+
+    def expire(self, before):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM assignments WHERE saved < ?", (before,))
+
+
+class AssignmentStore(object):
+    """Visitors' assignments, kept in an LRU of ``max_size`` visitors in
+    front of an :class:`AssignmentStorage`
+
+    Assignments expire ``ttl`` seconds after the visitor was last seen.
+    Cached visitors are saved again once half the ttl has passed since their
+    last save, so the engine's copy does not expire while they keep coming
+    back.  A cached copy is only used while the engine holds nothing newer,
+    so processes sharing an engine see each other's changes.
+
+    :param storage: The engine, written through on every change
+    :param max_size: Visitors kept in memory
+    :param ttl: Seconds assignments are kept for
+    :param expire_every: Saves between purges of expired visitors from
+                         the engine
+    """
+
+    def __init__(self, storage=None, max_size=10000, ttl=30 * 86400, expire_every=1000):
+        self.storage = storage if storage is not None else AssignmentStorage()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.expire_every = expire_every
+        # visitor id -> [assignments, last seen, last saved]
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._saves = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _remember(self, visitor_id, assignments, seen, saved):
+        self._cache[visitor_id] = [assignments, seen, saved]
+        self._cache.move_to_end(visitor_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def get(self, visitor_id):
+        """A copy of a visitor's assignments, ``None`` for unknown or
+        expired visitors
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(visitor_id)
+            if entry is not None and entry[1] < now - self.ttl:
+                del self._cache[visitor_id]
+                entry = None
+            if entry is not None:
+                entry[1] = now
+                self._cache.move_to_end(visitor_id)
+                assignments, saved = entry[0], entry[2]
+        if entry is None:
+            loaded = self.storage.load(visitor_id, now - self.ttl)
+            if loaded is None:
+                return None
+        else:
+            # Saved since by another process sharing the engine
+            loaded = self.storage.newer(visitor_id, saved)
+        if loaded is not None:
+            assignments, saved = loaded
+            with self._lock:
+                self._remember(visitor_id, assignments, now, saved)
+        if saved < now - self.ttl / 2.0:
+            self.set(visitor_id, assignments)
+        return dict(assignments)
+
+    def set(self, visitor_id, assignments):
+        """Save a visitor's assignments, in memory and to the engine"""
+        now = time.time()
+        assignments = dict(assignments)
+        with self._lock:
+            self._remember(visitor_id, assignments, now, now)
+            self._saves += 1
+            purge = self._saves % self.expire_every == 0
+        self.storage.save(visitor_id, assignments, now)
+        if purge:
+            self.storage.expire(now - self.ttl)
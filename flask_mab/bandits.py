@@ -1,5 +1,40 @@
-from random import random, choice, uniform, betavariate
-from math import log, exp
+from random import random, randrange, betavariate
+from math import log, exp, sqrt
+from heapq import heapify, heappop, heappush
+from array import array
+import json
+import os
+import threading
+
+from flask_mab.trees import MaxTree, SumTree
+
+try:
+    import numpy
+except ImportError:  # optional, install the "fast" extra for batched sampling
+    numpy = None
+
+
+def _numpy_random():
+    global _np_rng
+    if _np_rng is None:
+        _np_rng = numpy.random.default_rng()
+    return _np_rng
+
+
+def _reset_numpy_random():
+    # Forked workers must not replay their parent's random stream
+    global _np_rng
+    _np_rng = None
+
+
+_np_rng = None
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_numpy_random)
+
+#: Locks shared by all bandits, picked per arm.  Pulls and rewards on
+#: different experiments (or arms) rarely land on the same stripe, so they
+#: don't wait on each other, while the number of locks stays fixed.
+_LOCK_STRIPES = [threading.Lock() for _ in range(64)]
 
 
 class Bandit(object):
@@ -9,56 +44,179 @@ class Bandit(object):
     Used as a control to test against and as an interface to define methods against.
     """
 
+    #: Per-arm numeric state, persisted alongside ``arms`` and ``values``
+    counter_fields = ("pulls", "reward", "confidence")
+    #: :mod:`array` typecodes for the counter fields, float64 if not listed
+    counter_typecodes = {"pulls": "q"}
+    #: Per-arm state that is not a single number per arm, persisted in the
+    #: bandit's spec through :meth:`_get_state` and :meth:`_set_state`
+    state_fields = ()
+    #: Arm count from which bandits that support it pick arms through the
+    #: trees in :mod:`flask_mab.trees`, in O(log arms), instead of scanning
+    large_arm_threshold = 1024
+    #: Whether a pull alone can change which arms get suggested
+    _pull_invalidates = True
+
+    @classmethod
+    def _counter_array(cls, field, values=()):
+        typecode = cls.counter_typecodes.get(field, "d")
+        if typecode == "q":
+            values = [int(value) for value in values]
+        return array(typecode, values)
+
     @classmethod
     def fromdict(cls, dict_spec):
+        bandit_cls = globals()[dict_spec["bandit_type"]]
+        state_keys = (
+            ("arms", "values", "bandit_type")
+            + bandit_cls.counter_fields
+            + bandit_cls.state_fields
+        )
         extra_args = dict(
+            [(key, value) for key, value in dict_spec.items() if key not in state_keys]
+        )
+
+        bandit = bandit_cls(**extra_args)
+        bandit.arms = list(dict_spec["arms"])
+        bandit.values = dict_spec["values"]
+        for field in bandit_cls.counter_fields:
+            if field in dict_spec:
+                values = dict_spec[field]
+            else:
+                # Saved before this counter existed
+                values = bandit._missing_counter(field)
+            setattr(bandit, field, bandit._counter_array(field, values))
+        for field in bandit_cls.state_fields:
+            bandit._set_state(field, dict_spec.get(field))
+        bandit._reindex()
+        return bandit
+
+    def _missing_counter(self, field):
+        """Values for a counter absent from a spec passed to :meth:`fromdict`"""
+        return [0] * len(self.arms)
+
+    def _get_state(self, field):
+        """JSON serializable value of one of :attr:`state_fields`"""
+        return getattr(self, "_" + field)
+
+    def _set_state(self, field, value):
+        """Restore one of :attr:`state_fields`, ``None`` if the spec had none"""
+        setattr(self, "_" + field, value)
+
+    def todict(self):
+        """Serializable representation of this bandit, the inverse of
+        :meth:`fromdict`.  Private (underscored) attributes are runtime
+        bookkeeping and are left out.
+        """
+        dict_repr = dict(
             [
                 (key, value)
-                for key, value in dict_spec.items()
-                if key
-                not in [
-                    "arms",
-                    "pulls",
-                    "reward",
-                    "values",
-                    "bandit_type",
-                    "confidence",
-                ]
+                for key, value in self.__dict__.items()
+                if not key.startswith("_")
             ]
         )
+        for field in self.counter_fields:
+            dict_repr[field] = list(dict_repr[field])
+        for field in self.state_fields:
+            dict_repr[field] = self._get_state(field)
+        dict_repr["bandit_type"] = self.__class__.__name__
+        return dict_repr
 
-        bandit = globals()[dict_spec["bandit_type"]](**extra_args)
-        bandit.arms = dict_spec["arms"]
-        bandit.pulls = dict_spec["pulls"]
-        bandit.reward = dict_spec["reward"]
-        bandit.values = dict_spec["values"]
-        bandit.confidence = dict_spec.get("confidence", [0.0] * len(bandit.arms))
-        return bandit
+    @staticmethod
+    def merge(snapshot_a, snapshot_b):
+        """Merge two mergeable snapshots of the same bandit
+
+        A mergeable snapshot is a dict with a ``spec`` (the bandit without
+        its counters, plus the counters it started from under ``initial``)
+        and ``nodes``, mapping each node id to that node's own increments:
+        ``{node_id: {arm_key: {field: amount}}}``.  Every node only ever
+        grows its own increments, so merging takes the maximum for each
+        node, arm and field.  The result does not depend on merge order or
+        on how often a snapshot is merged in.
+
+        The spec with more arms wins, ties are broken by comparing their
+        JSON encodings so that every node picks the same one.
+        """
+        specs = sorted(
+            [snapshot_a["spec"], snapshot_b["spec"]],
+            key=lambda spec: (len(spec["arms"]), json.dumps(spec, sort_keys=True)),
+        )
+        nodes = {}
+        for snapshot in (snapshot_a, snapshot_b):
+            for node_id, arms in snapshot["nodes"].items():
+                merged_arms = nodes.setdefault(node_id, {})
+                for arm_key, counters in arms.items():
+                    merged = merged_arms.setdefault(arm_key, {})
+                    for field, amount in counters.items():
+                        merged[field] = max(merged.get(field, amount), amount)
+        return {"spec": specs[-1], "nodes": nodes}
 
     def __init__(self):
         self.arms = []
-        self.pulls = []
-        self.reward = []
+        self.pulls = self._counter_array("pulls")
+        self.reward = self._counter_array("reward")
         self.values = []
-        self.confidence = []
+        self.confidence = self._counter_array("confidence")
+        self._index = {}
+        self._dirty = False
+        self._version = 0
+        # Off when other processes write the counters behind our back
+        self._cache_weights = True
 
     def add_arm(self, arm_id, value=None):
+        self._version += 1
+        self._index[arm_id] = len(self.arms)
         self.arms.append(arm_id)
         self.pulls.append(0)
         self.reward.append(0.0)
         self.confidence.append(0.0)
         self.values.append(value)
 
+    def _reindex(self):
+        self._index = dict([(arm_id, ind) for ind, arm_id in enumerate(self.arms)])
+
+    def arm_index(self, arm_id):
+        """Position of an arm in :attr:`arms` and the counter arrays
+
+        :raises KeyError: if the bandit has no such arm
+        """
+        try:
+            return self._index[arm_id]
+        except KeyError:
+            if len(self._index) == len(self.arms):
+                raise KeyError("Arm is not found in this bandit")
+        # arms was replaced wholesale, catch up
+        self._reindex()
+        return self._index[arm_id]
+
+    def _lock_for(self, arm_index):
+        """Context manager guarding read-modify-write of an arm's counters,
+        one of :data:`_LOCK_STRIPES`.  Replaced by a cross-process lock when
+        counters live in shared memory.
+        """
+        return _LOCK_STRIPES[hash((id(self), arm_index)) % len(_LOCK_STRIPES)]
+
     def pull_arm(self, arm_id):
-        ind = self.arms.index(arm_id)
-        if ind > -1:
+        ind = self.arm_index(arm_id)
+        with self._lock_for(ind):
             self.pulls[ind] += 1
+        if self._pull_invalidates:
+            self._version += 1
+        self._dirty = True
 
     def reward_arm(self, arm_id, reward):
-        ind = self.arms.index(arm_id)
-        if ind > -1:
+        ind = self.arm_index(arm_id)
+        with self._lock_for(ind):
             self.reward[ind] += reward
-        self._update(ind, reward)
+            self._update(ind, reward)
+        self._version += 1
+        self._dirty = True
+
+    def _counters_changed(self):
+        """Note that counters were written directly, not through
+        :meth:`pull_arm` or :meth:`reward_arm`, so cached state is stale
+        """
+        self._version += 1
 
     def _update(self, arm_index, reward):
         n = max(1, self.pulls[arm_index])
@@ -70,22 +228,28 @@ class Bandit(object):
     def suggest_arm(self):
         """Uniform random for default bandit.
 
-        Just uses random.choice to choose between arms
+        Just picks uniformly between arms
         """
-        return self[random.choice(self.arms)]
+        return Arm(self, randrange(len(self.arms)))
+
+    def suggest_arms(self, n):
+        """Suggest ``n`` arms at once, as if calling :meth:`suggest_arm` ``n``
+        times without any pulls or rewards in between.  Vectorized with
+        NumPy when it is installed.
+
+        :param n: How many arms to suggest
+        :type n: int
+        :rtype: list of :class:`Arm`
+        """
+        return [Arm(self, int(ind)) for ind in self._suggest_indexes(n)]
+
+    def _suggest_indexes(self, n):
+        if numpy is not None:
+            return _numpy_random().integers(0, len(self.arms), n)
+        return [randrange(len(self.arms)) for _ in range(n)]
 
     def __getitem__(self, key):
-        ind = self.arms.index(key)
-        if ind > -1:
-            arm = {
-                "id": self.arms[ind],
-                "pulls": self.pulls[ind],
-                "reward": self.reward[ind],
-                "value": self.values[ind],
-            }
-            return arm
-        else:
-            raise KeyError("Arm is not found in this bandit")
+        return Arm(self, self.arm_index(key))
 
     def __str__(self):
         output = "%s  " % self.__class__.__name__
@@ -95,6 +259,49 @@ class Bandit(object):
         return output
 
 
+class Arm(object):
+    """A lightweight view of one arm of a bandit, as returned by suggestions
+    and lookups.  Reads through to the bandit, so counts are always current.
+
+    Supports ``arm["id"]`` style access to ``id``, ``value``, ``pulls`` and
+    ``reward``, as well as attribute access.
+    """
+
+    __slots__ = ("bandit", "index")
+    _keys = ("id", "pulls", "reward", "value")
+
+    def __init__(self, bandit, index):
+        self.bandit = bandit
+        self.index = index
+
+    @property
+    def id(self):
+        return self.bandit.arms[self.index]
+
+    @property
+    def value(self):
+        return self.bandit.values[self.index]
+
+    @property
+    def pulls(self):
+        return self.bandit.pulls[self.index]
+
+    @property
+    def reward(self):
+        return self.bandit.reward[self.index]
+
+    def keys(self):
+        return self._keys
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self):
+        return "Arm(%s)" % ", ".join(["%s=%r" % (key, self[key]) for key in self._keys])
+
+
 class EpsilonGreedyBandit(Bandit):
     """Epsilon Greedy Bandit implementation.  Aggressively favors the present winner.
 
@@ -112,19 +319,84 @@ class EpsilonGreedyBandit(Bandit):
     def __init__(self, epsilon=0.1):
         super(EpsilonGreedyBandit, self).__init__()
         self.epsilon = epsilon
+        self._best_lock = threading.Lock()
+        self._best = None
+        self._max_tree = None
 
     def suggest_arm(self):
         """Get an arm according to the EpsilonGreedy Strategy"""
         random_determination = random()
         if random_determination > self.epsilon:
-            key = self._ind_max()
+            ind = self._ind_max()
         else:
-            key = choice(self.arms)
+            ind = randrange(len(self.arms))
+
+        return Arm(self, ind)
 
-        return self[key]
+    def _suggest_indexes(self, n):
+        best = self._ind_max()
+        if numpy is not None:
+            rng = _numpy_random()
+            indexes = numpy.full(n, best)
+            explore = rng.random(n) <= self.epsilon
+            indexes[explore] = rng.integers(0, len(self.arms), int(explore.sum()))
+            return indexes
+        return [
+            best if random() > self.epsilon else randrange(len(self.arms))
+            for _ in range(n)
+        ]
+
+    def add_arm(self, arm_id, value=None):
+        super(EpsilonGreedyBandit, self).add_arm(arm_id, value)
+        with self._best_lock:
+            self._best = None
+            self._max_tree = None
+
+    def _update(self, arm_index, reward):
+        super(EpsilonGreedyBandit, self)._update(arm_index, reward)
+        # Keep the leader current as rewards arrive, so exploiting does not
+        # scan every arm.  Only the leader dropping forces a rescan.
+        with self._best_lock:
+            if self._max_tree is not None:
+                self._max_tree.update(arm_index, self.confidence[arm_index])
+                return
+            best = self._best
+            if best is None or best >= len(self.confidence):
+                return
+            if arm_index == best:
+                if self.confidence[arm_index] < self._best_confidence:
+                    self._best = None
+                else:
+                    self._best_confidence = self.confidence[arm_index]
+            elif self.confidence[arm_index] > self._best_confidence or (
+                self.confidence[arm_index] == self._best_confidence and arm_index < best
+            ):
+                self._best = arm_index
+                self._best_confidence = self.confidence[arm_index]
+
+    def _counters_changed(self):
+        with self._best_lock:
+            self._best = None
+            self._max_tree = None
+        super(EpsilonGreedyBandit, self)._counters_changed()
 
     def _ind_max(self):
-        return self.arms[self.confidence.index(max(self.confidence))]
+        with self._best_lock:
+            if len(self.arms) >= self.large_arm_threshold and self._cache_weights:
+                # Rescanning when the leader drops would cost O(arms)
+                if self._max_tree is None or len(self._max_tree) != len(self.arms):
+                    self._max_tree = MaxTree(self.confidence)
+                return self._max_tree.argmax()
+            best = self._best
+            if (
+                best is None
+                or not self._cache_weights
+                or len(self.confidence) != len(self.arms)
+            ):
+                best = self.confidence.index(max(self.confidence))
+                self._best = best
+                self._best_confidence = self.confidence[best]
+            return best
 
     def __str__(self):
         return Bandit.__str__(self)
@@ -133,19 +405,178 @@ class EpsilonGreedyBandit(Bandit):
         return Bandit.__str__(self)
 
 
+class UCB1Bandit(Bandit):
+    """UCB1: deterministically suggests the arm with the highest upper
+    confidence bound, ``mean + sqrt(2 * ln(total pulls) / pulls)``.  Arms
+    that were never pulled come first.
+
+    Arms are kept in one heap per pull count, ordered by mean reward.
+    Among arms pulled equally often that order does not change as the pull
+    total grows, so choosing an arm only compares the top of each heap:
+    there are at most as many heaps as distinct pull counts, far fewer
+    than arms.  A pull or reward pushes a fresh entry for its arm and
+    leaves the old one to be skipped.
+    """
+
+    def __init__(self):
+        super(UCB1Bandit, self).__init__()
+        self._heap_lock = threading.Lock()
+        self._heaps = None
+        self._stamps = []
+        self._entries = 0
+        self._total_pulls = 0
+
+    def _mean(self, arm_index):
+        n = self.pulls[arm_index]
+        return self.reward[arm_index] / float(n) if n else 0.0
+
+    def _rebuild_heaps(self):
+        self._total_pulls = sum(self.pulls)
+        self._stamps = [0] * len(self.arms)
+        self._heaps = {}
+        for ind, n in enumerate(self.pulls):
+            self._heaps.setdefault(n, []).append((-self._mean(ind), ind, 0))
+        for heap in self._heaps.values():
+            heapify(heap)
+        self._entries = len(self.arms)
+
+    def _heaps_current(self):
+        return (
+            self._heaps is not None
+            and self._cache_weights
+            and len(self._stamps) == len(self.arms)
+        )
+
+    def _push(self, arm_index):
+        self._stamps[arm_index] += 1
+        heappush(
+            self._heaps.setdefault(self.pulls[arm_index], []),
+            (-self._mean(arm_index), arm_index, self._stamps[arm_index]),
+        )
+        self._entries += 1
+
+    def pull_arm(self, arm_id):
+        super(UCB1Bandit, self).pull_arm(arm_id)
+        ind = self.arm_index(arm_id)
+        with self._heap_lock:
+            if self._heaps_current():
+                self._total_pulls += 1
+                self._push(ind)
+
+    def _update(self, arm_index, reward):
+        super(UCB1Bandit, self)._update(arm_index, reward)
+        with self._heap_lock:
+            if self._heaps_current():
+                self._push(arm_index)
+
+    def _counters_changed(self):
+        with self._heap_lock:
+            self._heaps = None
+        super(UCB1Bandit, self)._counters_changed()
+
+    def _ind_max(self):
+        with self._heap_lock:
+            if not self._heaps_current() or self._entries > 4 * len(self.arms) + 64:
+                self._rebuild_heaps()
+            log_total = log(max(self._total_pulls, 1))
+            best = None
+            for n, heap in list(self._heaps.items()):
+                while heap and heap[0][2] != self._stamps[heap[0][1]]:
+                    heappop(heap)
+                    self._entries -= 1
+                if not heap:
+                    del self._heaps[n]
+                    continue
+                mean, ind, _ = heap[0]
+                bound = -mean + sqrt(2 * log_total / n) if n else float("inf")
+                if best is None or (bound, -ind) > (best[0], -best[1]):
+                    best = (bound, ind)
+            return best[1]
+
+    def suggest_arm(self):
+        """Get the arm with the highest upper confidence bound"""
+        return Arm(self, self._ind_max())
+
+    def _suggest_indexes(self, n):
+        return [self._ind_max()] * n
+
+
 def all_same(items):
     return all(x == items[0] for x in items)
 
 
+class _AliasTable(object):
+    """Walker/Vose alias table over a discrete distribution, for O(1) draws
+
+    :param probabilities: Probability of each index, summing to 1
+    """
+
+    __slots__ = ("prob", "alias", "_arrays")
+
+    def __init__(self, probabilities):
+        n = len(probabilities)
+        scaled = [p * n for p in probabilities]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [ind for ind, p in enumerate(scaled) if p < 1.0]
+        large = [ind for ind, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left over is 1 up to rounding error
+        self._arrays = None
+
+    def draw(self):
+        ind = randrange(len(self.prob))
+        return ind if random() < self.prob[ind] else self.alias[ind]
+
+    def draw_many(self, n):
+        if numpy is None:
+            return [self.draw() for _ in range(n)]
+        if self._arrays is None:
+            self._arrays = (numpy.asarray(self.prob), numpy.asarray(self.alias))
+        prob, alias = self._arrays
+        rng = _numpy_random()
+        indexes = rng.integers(0, len(prob), n)
+        return numpy.where(rng.random(n) < prob[indexes], indexes, alias[indexes])
+
+
 class NaiveStochasticBandit(Bandit):
     """A naive weighted random Bandit.  Favors the winner by giving it greater weight
     in random selection.
 
     Winner will eventually flatten out the losers if margin is great enough
+
+    Suggestions are drawn from a cached alias table in constant time.  The
+    table is rebuilt once the counters have changed more than ``max_stale``
+    times since it was built, so the default of 0 always samples the exact
+    current weights.
+
+    From :attr:`large_arm_threshold` arms on, weights are kept in a
+    :class:`~flask_mab.trees.SumTree` instead, updated per pull and reward,
+    so both are O(log arms) and nothing is ever rebuilt from scratch.
+
+    :param max_stale: How many pulls/rewards a cached table may lag behind
+    :type max_stale: int
     """
 
-    def __init__(self):
+    #: Whether weights are relative, rather than probabilities whose
+    #: shortfall from 1 goes to the first arm
+    _relative_weights = False
+
+    def __init__(self, max_stale=0):
         super(NaiveStochasticBandit, self).__init__()
+        self.max_stale = max_stale
+        self._alias = None
+        self._alias_version = None
+        self._tree_lock = threading.Lock()
+        self._sum_tree = None
 
     def _compute_weights(self):
         weights = []
@@ -157,74 +588,744 @@ class NaiveStochasticBandit(Bandit):
                 weights.append(1.0 / len(self.arms))
         return weights
 
+    def _selection_probabilities(self):
+        """Chance of each arm under the Naive Stochastic Strategy: the first
+        arm whose cumulative weight exceeds a uniform draw from [0, 1), or
+        the first arm if none does.
+        """
+        probabilities = []
+        cum_weight = 0.0
+        for weight in self._compute_weights():
+            start = min(cum_weight, 1.0)
+            cum_weight += weight
+            probabilities.append(max(0.0, min(cum_weight, 1.0) - start))
+        if probabilities:
+            probabilities[0] += max(0.0, 1.0 - cum_weight)
+        return probabilities
+
+    def _alias_table(self):
+        version = self._version
+        table = self._alias
+        if (
+            table is None
+            or not self._cache_weights
+            or len(table.prob) != len(self.arms)
+            or version - self._alias_version > self.max_stale
+        ):
+            table = _AliasTable(self._selection_probabilities())
+            self._alias, self._alias_version = table, version
+        return table
+
+    def _large(self):
+        return len(self.arms) >= self.large_arm_threshold and self._cache_weights
+
+    def _tree_weight(self, arm_index):
+        """Current weight of one arm, ``None`` if it can't be told cheaply"""
+        n = self.pulls[arm_index]
+        if not n:
+            return 1.0 / len(self.arms)
+        return float(self.reward[arm_index]) / float(n)
+
+    def _tree_weights(self):
+        return self._compute_weights()
+
+    def _tree_changed(self, arm_index):
+        with self._tree_lock:
+            if self._sum_tree is None:
+                return
+            weight = self._tree_weight(arm_index)
+            if weight is None:
+                self._sum_tree = None
+            else:
+                self._sum_tree.update(arm_index, weight)
+
+    def _tree_draw(self):
+        with self._tree_lock:
+            tree = self._sum_tree
+            if tree is None or len(tree) != len(self.arms):
+                tree = self._sum_tree = SumTree(self._tree_weights())
+            if self._relative_weights:
+                return tree.find(random() * tree.total)
+            value = random()
+            return tree.find(value) if value < tree.total else 0
+
+    def pull_arm(self, arm_id):
+        super(NaiveStochasticBandit, self).pull_arm(arm_id)
+        if self._pull_invalidates and self._sum_tree is not None:
+            self._tree_changed(self.arm_index(arm_id))
+
+    def reward_arm(self, arm_id, reward):
+        super(NaiveStochasticBandit, self).reward_arm(arm_id, reward)
+        if self._sum_tree is not None:
+            self._tree_changed(self.arm_index(arm_id))
+
+    def _counters_changed(self):
+        with self._tree_lock:
+            self._sum_tree = None
+        super(NaiveStochasticBandit, self)._counters_changed()
+
     def suggest_arm(self):
         """Get an arm according to the Naive Stochastic Strategy"""
-        weights = self._compute_weights()
-        random_determination = uniform(0.0, 1.0)
+        if self._large():
+            return Arm(self, self._tree_draw())
+        return Arm(self, self._alias_table().draw())
 
-        cum_weight = 0.0
-        for ind, weight in enumerate(weights):
-            cum_weight += weight
-            if cum_weight > random_determination:
-                return self[self.arms[ind]]
-        return self[self.arms[0]]
+    def _suggest_indexes(self, n):
+        if self._large():
+            return [self._tree_draw() for _ in range(n)]
+        return self._alias_table().draw_many(n)
 
 
 class SoftmaxBandit(NaiveStochasticBandit):
-    def __init__(self, tau=0.1):
-        super(SoftmaxBandit, self).__init__()
+    """Softmax (Boltzmann) exploration: arms are weighted by
+    ``exp(confidence / tau)``.
+
+    The exponentials are kept shifted by the largest confidence seen at the
+    last full recompute, along with their sum, so a reward adjusts the
+    normalizer in constant time instead of redoing ``exp`` for every arm.
+    Everything is recomputed from the counters every
+    :attr:`resync_every` rewards, to shed rounding drift, and whenever
+    ``tau`` or the arms change.
+
+    :param tau: Temperature, lower values favor the leader more strongly
+    :type tau: float
+    """
+
+    _pull_invalidates = False
+    _relative_weights = True
+    #: Rewards between full recomputes of the running normalizer
+    resync_every = 1024
+    # exp() overflows a float a little past this
+    _MAX_EXPONENT = 700.0
+
+    def __init__(self, tau=0.1, max_stale=0):
+        super(SoftmaxBandit, self).__init__(max_stale)
         self.tau = tau
+        self._softmax_lock = threading.Lock()
+        self._exps = None
+        self._exps_tau = None
+        self._shift = 0.0
+        self._normalizer = 0.0
+        self._since_resync = 0
+
+    def _resync_softmax(self):
+        self._shift = max(self.confidence) if len(self.confidence) else 0.0
+        self._exps = [exp((x - self._shift) / self.tau) for x in self.confidence]
+        self._exps_tau = self.tau
+        self._normalizer = sum(self._exps)
+        self._since_resync = 0
+        # Its leaves were shifted exponentials from before
+        self._sum_tree = None
+
+    def _softmax_current(self):
+        return (
+            self._exps is not None
+            and self._cache_weights
+            and self._exps_tau == self.tau
+            and len(self._exps) == len(self.confidence)
+        )
+
+    def _update(self, arm_index, reward):
+        super(SoftmaxBandit, self)._update(arm_index, reward)
+        with self._softmax_lock:
+            if not self._softmax_current():
+                return
+            exponent = (self.confidence[arm_index] - self._shift) / self.tau
+            self._since_resync += 1
+            if exponent > self._MAX_EXPONENT or self._since_resync >= self.resync_every:
+                # Rebuilt lazily by the next suggestion
+                self._exps = None
+                return
+            weight = exp(exponent)
+            self._normalizer += weight - self._exps[arm_index]
+            self._exps[arm_index] = weight
+
+    def _counters_changed(self):
+        with self._softmax_lock:
+            self._exps = None
+        super(SoftmaxBandit, self)._counters_changed()
+
+    def _selection_probabilities(self):
+        return self._compute_weights()
+
+    def _tree_weight(self, arm_index):
+        if not self._softmax_current():
+            return None
+        return self._exps[arm_index]
+
+    def _tree_weights(self):
+        with self._softmax_lock:
+            if not self._softmax_current() or not self._normalizer > 0.0:
+                self._resync_softmax()
+            return list(self._exps)
 
     def _compute_weights(self):
-        weights = []
-        total_reward = sum([exp(x / self.tau) for x in self.confidence])
-        for ind, _ in enumerate(self.pulls):
-            weights.append(exp(self.confidence[ind] / self.tau) / total_reward)
-        return weights
+        with self._softmax_lock:
+            if not self._softmax_current() or not self._normalizer > 0.0:
+                self._resync_softmax()
+            normalizer = self._normalizer
+            return [weight / normalizer for weight in self._exps]
 
 
 class AnnealingSoftmaxBandit(SoftmaxBandit):
-    def __init__(self):
-        super(AnnealingSoftmaxBandit, self).__init__()
-        self.tau = 1
+    """Softmax with a temperature that cools as pulls accumulate,
+    ``tau = 1 / log(total pulls + 1)``.
 
-    def _compute_weights(self):
-        t = sum(self.pulls) + 1
+    The pull total is counted as pulls come in and ``tau`` is refreshed
+    once it has grown by :attr:`tau_refresh_ratio` since the last refresh,
+    rather than summing the pulls for every suggestion.
+    """
+
+    #: Relative growth of the pull total that triggers a new tau
+    tau_refresh_ratio = 0.01
+
+    def __init__(self, tau=1, max_stale=0):
+        super(AnnealingSoftmaxBandit, self).__init__(tau, max_stale)
+        self._total_pulls = None
+        self._tau_pulls = 0
+
+    def _refresh_tau(self):
+        t = self._total_pulls + 1
         self.tau = 1 / log(t + 0.0000001)
+        self._tau_pulls = self._total_pulls
 
-        weights = []
-        total_reward = sum([exp(x / self.tau) for x in self.confidence])
-        for ind, n in enumerate(self.pulls):
-            weights.append(exp(self.confidence[ind] / self.tau) / total_reward)
-        return weights
+    def pull_arm(self, arm_id):
+        super(AnnealingSoftmaxBandit, self).pull_arm(arm_id)
+        with self._softmax_lock:
+            if self._total_pulls is None:
+                return
+            self._total_pulls += 1
+            if self._total_pulls - self._tau_pulls >= max(
+                1, int(self._tau_pulls * self.tau_refresh_ratio)
+            ):
+                self._refresh_tau()
+                self._version += 1
+                self._sum_tree = None
+
+    def _counters_changed(self):
+        with self._softmax_lock:
+            self._total_pulls = None
+        super(AnnealingSoftmaxBandit, self)._counters_changed()
+
+    def _resync_softmax(self):
+        if self._total_pulls is None or not self._cache_weights:
+            self._total_pulls = sum(self.pulls)
+            self._refresh_tau()
+        super(AnnealingSoftmaxBandit, self)._resync_softmax()
 
 
 class ThompsonBandit(NaiveStochasticBandit):
+    """Thompson sampling over Beta posteriors, one ``Beta(a, b)`` per arm
+    starting from ``prior``.
+
+    Posterior draws are batched through NumPy when it is installed.  With a
+    ``sample_buffer``, that many suggestions are drawn in one go and handed
+    out until the posteriors have changed more than ``max_stale`` times.
+
+    :param prior: Starting ``(a, b)`` for new arms
+    :param max_stale: How many rewards buffered suggestions may lag behind
+    :param sample_buffer: Number of suggestions to pre-draw, 0 to disable
+    """
 
     MIN_DIST = 0.001
-    a = []
-    b = []
+    counter_fields = Bandit.counter_fields + ("a", "b")
+    _pull_invalidates = False
+
+    def __init__(self, prior=(1.0, 1.0), max_stale=0, sample_buffer=0):
+        super(ThompsonBandit, self).__init__(max_stale)
+        self.prior = list(prior)
+        self.sample_buffer = sample_buffer
+        self.a = self._counter_array("a")
+        self.b = self._counter_array("b")
+        self._buffer = []
+        self._buffer_version = None
 
-    def __init__(self, prior=(1.0, 1.0)):
-        super(ThompsonBandit, self).__init__()
+    def _missing_counter(self, field):
+        # Older snapshots kept a and b on the class, where they were lost
+        # on restart; rebuild them from the rewards, each of which was 1
+        if field == "a":
+            return [self.prior[0] + reward for reward in self.reward]
+        if field == "b":
+            return [self.prior[1]] * len(self.arms)
+        return super(ThompsonBandit, self)._missing_counter(field)
 
     def add_arm(self, arm_id, value=None):
         super(ThompsonBandit, self).add_arm(arm_id, value)
-        self.a.append(1.0)
-        self.b.append(1.0)
+        self.a.append(self.prior[0])
+        self.b.append(self.prior[1])
 
     def _compute_weights(self):
+        if numpy is not None:
+            return _numpy_random().beta(self._posterior("a"), self._posterior("b"))
         beta_params = zip(self.a, self.b)
         return [betavariate(i[0], i[1]) for i in beta_params]
 
+    def _posterior(self, field):
+        return numpy.asarray(getattr(self, field), dtype=float)
+
     def suggest_arm(self):
-        weights = [w for w in self._compute_weights()]
-        return self[self.arms[weights.index(max(weights))]]
+        if self.sample_buffer and self._cache_weights:
+            return Arm(self, self._buffered_index())
+        return Arm(self, self._draw_index())
+
+    def _draw_index(self):
+        weights = self._compute_weights()
+        if numpy is not None:
+            return int(weights.argmax())
+        return weights.index(max(weights))
+
+    def _buffered_index(self):
+        if (
+            self._buffer_version is None
+            or self._version - self._buffer_version > self.max_stale
+        ):
+            self._buffer = []
+        try:
+            return self._buffer.pop()
+        except IndexError:
+            pass
+        version = self._version
+        self._buffer = [int(ind) for ind in self._suggest_indexes(self.sample_buffer)]
+        self._buffer_version = version
+        return self._buffer.pop()
+
+    def _suggest_indexes(self, n):
+        if numpy is None:
+            return [self._draw_index() for _ in range(n)]
+        a, b = self._posterior("a"), self._posterior("b")
+        rng = _numpy_random()
+        # One posterior draw per arm per suggestion, in chunks to bound memory
+        chunk = max(1, (1 << 20) // max(1, len(a)))
+        return numpy.concatenate(
+            [
+                rng.beta(a, b, size=(min(chunk, n - start), len(a))).argmax(axis=1)
+                for start in range(0, n, chunk)
+            ]
+            or [numpy.zeros(0, dtype=int)]
+        )
 
     def reward_arm(self, arm_id, reward):
         if reward != 1.0:
             reward = 1.0
         super(ThompsonBandit, self).reward_arm(arm_id, reward)
-        ind = self.arms.index(arm_id)
-        self.a[ind] = self.a[ind] + reward
-        self.b[ind] = self.b[ind] + (1 - reward)
+
+    def _update(self, arm_index, reward):
+        super(ThompsonBandit, self)._update(arm_index, reward)
+        self.a[arm_index] = self.a[arm_index] + reward
+        self.b[arm_index] = self.b[arm_index] + (1 - reward)
+
+
+class LinUCBBandit(Bandit):
+    """Contextual bandit (LinUCB with disjoint linear models).  Each
+    suggestion takes a feature vector describing the request, and every arm
+    scores ``theta . x + alpha * sqrt(x . A^-1 . x)`` where ``A`` is the
+    arm's design matrix and ``theta = A^-1 . b``.
+
+    Only the inverses are kept.  A pull with a context applies the rank-1
+    Sherman-Morrison update ``A^-1 -= (A^-1 x)(A^-1 x)' / (1 + x' A^-1 x)``
+    and a reward adds ``reward * x`` to ``b``, so nothing is inverted on the
+    request path.  Scoring is vectorized across arms when NumPy is
+    installed.
+
+    Pulls and rewards without a context only update the counters, and a
+    suggestion without one is uniform random.  The matrices are persisted in
+    the bandit's spec, which is rewritten by the snapshot engines (JSON,
+    binary) but not by engines that only store counter increments.
+
+    :param dimensions: Length of the feature vectors
+    :type dimensions: int
+    :param alpha: Weight of the exploration bonus
+    :type alpha: float
+    """
+
+    state_fields = ("a_inv", "b_vec")
+
+    def __init__(self, dimensions, alpha=1.0):
+        super(LinUCBBandit, self).__init__()
+        self.dimensions = dimensions
+        self.alpha = alpha
+        self._set_state("a_inv", [])
+        self._set_state("b_vec", [])
+
+    def _identity(self):
+        d = self.dimensions
+        return [1.0 if i == j else 0.0 for i in range(d) for j in range(d)]
+
+    def _get_state(self, field):
+        if field == "a_inv":
+            if numpy is not None:
+                return self._a_inv.reshape(len(self._a_inv), -1).tolist()
+            return [list(a_inv) for a_inv in self._a_inv]
+        if numpy is not None:
+            return self._b_vec.tolist()
+        return [list(b_vec) for b_vec in self._b_vec]
+
+    def _set_state(self, field, value):
+        d = self.dimensions
+        if value is None:
+            if field == "a_inv":
+                value = [self._identity() for _ in self.arms]
+            else:
+                value = [[0.0] * d for _ in self.arms]
+        if numpy is not None:
+            shape = (-1, d, d) if field == "a_inv" else (-1, d)
+            value = numpy.array(value, dtype=float).reshape(shape)
+        else:
+            value = [[float(x) for x in row] for row in value]
+        setattr(self, "_" + field, value)
+
+    def add_arm(self, arm_id, value=None):
+        super(LinUCBBandit, self).add_arm(arm_id, value)
+        if numpy is not None:
+            d = self.dimensions
+            self._a_inv = numpy.concatenate([self._a_inv, numpy.eye(d)[None]])
+            self._b_vec = numpy.concatenate([self._b_vec, numpy.zeros((1, d))])
+        else:
+            self._a_inv.append(self._identity())
+            self._b_vec.append([0.0] * self.dimensions)
+
+    def _context(self, context):
+        if len(context) != self.dimensions:
+            raise ValueError(
+                "Expected %d features, got %d" % (self.dimensions, len(context))
+            )
+        if numpy is not None:
+            return numpy.asarray(context, dtype=float)
+        return [float(x) for x in context]
+
+    def _times(self, a_inv, x):
+        d = self.dimensions
+        return [sum(a_inv[i * d + j] * x[j] for j in range(d)) for i in range(d)]
+
+    def pull_arm(self, arm_id, context=None):
+        super(LinUCBBandit, self).pull_arm(arm_id)
+        if context is None:
+            return
+        x = self._context(context)
+        ind = self.arm_index(arm_id)
+        with self._lock_for(ind):
+            a_inv = self._a_inv[ind]
+            if numpy is not None:
+                u = a_inv @ x
+                a_inv -= numpy.outer(u, u) / (1.0 + x @ u)
+            else:
+                d = self.dimensions
+                u = self._times(a_inv, x)
+                denominator = 1.0 + sum(xi * ui for xi, ui in zip(x, u))
+                for i in range(d):
+                    for j in range(d):
+                        a_inv[i * d + j] -= u[i] * u[j] / denominator
+
+    def reward_arm(self, arm_id, reward, context=None):
+        super(LinUCBBandit, self).reward_arm(arm_id, reward)
+        if context is None:
+            return
+        x = self._context(context)
+        ind = self.arm_index(arm_id)
+        with self._lock_for(ind):
+            if numpy is not None:
+                self._b_vec[ind] += reward * x
+            else:
+                b_vec = self._b_vec[ind]
+                for i, xi in enumerate(x):
+                    b_vec[i] += reward * xi
+
+    def scores(self, context):
+        """Upper confidence bound of every arm for this context"""
+        x = self._context(context)
+        if numpy is not None:
+            # A^-1 is symmetric, so theta . x == b . (A^-1 x)
+            ax = self._a_inv @ x
+            variance = numpy.maximum((ax * x).sum(axis=1), 0.0)
+            return (self._b_vec * ax).sum(axis=1) + self.alpha * numpy.sqrt(variance)
+        scores = []
+        for a_inv, b_vec in zip(self._a_inv, self._b_vec):
+            ax = self._times(a_inv, x)
+            variance = max(sum(xi * ui for xi, ui in zip(x, ax)), 0.0)
+            mean = sum(bi * ui for bi, ui in zip(b_vec, ax))
+            scores.append(mean + self.alpha * sqrt(variance))
+        return scores
+
+    def suggest_arm(self, context=None):
+        """Get the arm with the highest upper confidence bound for this
+        context, or a uniformly random one without a context
+
+        :param context: Feature vector of length :attr:`dimensions`
+        """
+        if context is None:
+            return super(LinUCBBandit, self).suggest_arm()
+        scores = self.scores(context)
+        if numpy is not None:
+            return Arm(self, int(scores.argmax()))
+        return Arm(self, scores.index(max(scores)))
+
+
+class SlidingWindowBandit(Bandit):
+    """Base for bandits that only learn from the last ``window`` pulls.
+
+    Pulls go into a ring buffer of ``window`` slots, each holding the arm
+    and the reward credited to that pull.  A reward is credited to the
+    latest pull of its arm, if that is still in the window.  Per-arm totals
+    over the window are kept alongside, so a pull (which evicts the oldest
+    slot) and a reward are both constant time and memory stays fixed
+    however long the experiment runs.  The lifetime ``pulls``, ``reward``
+    and ``confidence`` counters are kept as usual.
+
+    :param window: Number of most recent pulls to learn from
+    :type window: int
+    """
+
+    state_fields = ("window_state",)
+
+    def __init__(self, window=1000):
+        super(SlidingWindowBandit, self).__init__()
+        self.window = window
+        self._stats_lock = threading.Lock()
+        self._set_state("window_state", None)
+
+    def add_arm(self, arm_id, value=None):
+        super(SlidingWindowBandit, self).add_arm(arm_id, value)
+        with self._stats_lock:
+            self._window_pulls.append(0.0)
+            self._window_reward.append(0.0)
+            self._last_seq.append(-1)
+
+    def _get_state(self, field):
+        return {
+            "seq": self._seq,
+            "arms": list(self._slot_arm),
+            "rewards": list(self._slot_reward),
+        }
+
+    def _set_state(self, field, value):
+        value = value or {"seq": 0, "arms": [], "rewards": []}
+        self._seq = value["seq"]
+        self._slot_arm = array("q", value["arms"] or [-1] * self.window)
+        self._slot_reward = array("d", value["rewards"] or [0.0] * self.window)
+        self._window_pulls = array("d", [0.0] * len(self.arms))
+        self._window_reward = array("d", [0.0] * len(self.arms))
+        self._last_seq = array("q", [-1] * len(self.arms))
+        # Oldest slot first, so each arm ends up with its latest pull
+        for seq in range(max(0, self._seq - self.window), self._seq):
+            ind = self._slot_arm[seq % self.window]
+            if ind < 0:
+                continue
+            self._window_pulls[ind] += 1
+            self._window_reward[ind] += self._slot_reward[seq % self.window]
+            self._last_seq[ind] = seq
+
+    def pull_arm(self, arm_id):
+        super(SlidingWindowBandit, self).pull_arm(arm_id)
+        ind = self.arm_index(arm_id)
+        with self._stats_lock:
+            slot = self._seq % self.window
+            evicted = self._slot_arm[slot]
+            if evicted >= 0:
+                self._window_pulls[evicted] -= 1
+                self._window_reward[evicted] -= self._slot_reward[slot]
+            self._slot_arm[slot] = ind
+            self._slot_reward[slot] = 0.0
+            self._window_pulls[ind] += 1
+            self._last_seq[ind] = self._seq
+            self._seq += 1
+
+    def reward_arm(self, arm_id, reward):
+        super(SlidingWindowBandit, self).reward_arm(arm_id, reward)
+        ind = self.arm_index(arm_id)
+        with self._stats_lock:
+            seq = self._last_seq[ind]
+            if seq < 0 or seq < self._seq - self.window:
+                return
+            self._slot_reward[seq % self.window] += reward
+            self._window_reward[ind] += reward
+
+    def _stats(self):
+        """Pulls and reward per arm over the window, and their total pulls"""
+        with self._stats_lock:
+            return (
+                list(self._window_pulls),
+                list(self._window_reward),
+                min(self._seq, self.window),
+            )
+
+
+class DiscountedBandit(Bandit):
+    """Base for bandits whose memory fades: every pull of the bandit
+    multiplies all earlier pulls and rewards by ``discount``.
+
+    Each arm keeps its discounted pulls and reward as of the last time it
+    was touched, and catches up on the decay it missed when next touched or
+    read, so updates are constant time and memory is constant per arm.  The
+    lifetime ``pulls``, ``reward`` and ``confidence`` counters are kept as
+    usual.
+
+    :param discount: Weight kept by a pull each time the bandit is pulled,
+                     between 0 and 1.  The effective memory is roughly
+                     ``1 / (1 - discount)`` pulls.
+    :type discount: float
+    """
+
+    state_fields = ("discounted_state",)
+
+    def __init__(self, discount=0.999):
+        super(DiscountedBandit, self).__init__()
+        self.discount = discount
+        self._stats_lock = threading.Lock()
+        self._set_state("discounted_state", None)
+
+    def add_arm(self, arm_id, value=None):
+        super(DiscountedBandit, self).add_arm(arm_id, value)
+        with self._stats_lock:
+            self._decayed_pulls.append(0.0)
+            self._decayed_reward.append(0.0)
+            self._touched_step.append(self._step)
+
+    def _get_state(self, field):
+        return {
+            "step": self._step,
+            "total": self._decayed_total,
+            "pulls": list(self._decayed_pulls),
+            "reward": list(self._decayed_reward),
+            "touched": list(self._touched_step),
+        }
+
+    def _set_state(self, field, value):
+        n = len(self.arms)
+        value = value or {
+            "step": 0,
+            "total": 0.0,
+            "pulls": [0.0] * n,
+            "reward": [0.0] * n,
+            "touched": [0] * n,
+        }
+        self._step = value["step"]
+        self._decayed_total = value["total"]
+        self._decayed_pulls = array("d", value["pulls"])
+        self._decayed_reward = array("d", value["reward"])
+        self._touched_step = array("q", value["touched"])
+
+    def _catch_up(self, ind):
+        decay = self.discount ** (self._step - self._touched_step[ind])
+        self._decayed_pulls[ind] *= decay
+        self._decayed_reward[ind] *= decay
+        self._touched_step[ind] = self._step
+
+    def pull_arm(self, arm_id):
+        super(DiscountedBandit, self).pull_arm(arm_id)
+        ind = self.arm_index(arm_id)
+        with self._stats_lock:
+            self._step += 1
+            self._decayed_total = self._decayed_total * self.discount + 1
+            self._catch_up(ind)
+            self._decayed_pulls[ind] += 1
+
+    def reward_arm(self, arm_id, reward):
+        super(DiscountedBandit, self).reward_arm(arm_id, reward)
+        ind = self.arm_index(arm_id)
+        with self._stats_lock:
+            self._catch_up(ind)
+            self._decayed_reward[ind] += reward
+
+    def _stats(self):
+        """Discounted pulls and reward per arm, and their total pulls"""
+        with self._stats_lock:
+            decays = [
+                self.discount ** (self._step - step) for step in self._touched_step
+            ]
+            return (
+                [n * d for n, d in zip(self._decayed_pulls, decays)],
+                [r * d for r, d in zip(self._decayed_reward, decays)],
+                self._decayed_total,
+            )
+
+
+class _ForgettingStrategy(object):
+    """Suggests arms from the windowed or discounted :meth:`_stats` of a
+    :class:`SlidingWindowBandit` or :class:`DiscountedBandit`
+    """
+
+    def _choose(self, pulls, reward, total):
+        raise NotImplementedError
+
+    def suggest_arm(self):
+        return Arm(self, self._choose(*self._stats()))
+
+    def _suggest_indexes(self, n):
+        stats = self._stats()
+        return [self._choose(*stats) for _ in range(n)]
+
+
+class _ForgettingEpsilonGreedy(_ForgettingStrategy):
+    def _choose(self, pulls, reward, total):
+        if random() <= self.epsilon:
+            return randrange(len(pulls))
+        means = [r / n if n > 0 else 0.0 for n, r in zip(pulls, reward)]
+        return means.index(max(means))
+
+
+class _ForgettingUCB(_ForgettingStrategy):
+    def _choose(self, pulls, reward, total):
+        log_total = log(max(total, 1.0))
+        bounds = [
+            r / n + sqrt(2 * log_total / n) if n > 0 else float("inf")
+            for n, r in zip(pulls, reward)
+        ]
+        return bounds.index(max(bounds))
+
+
+class _ForgettingThompson(_ForgettingStrategy):
+    def _choose(self, pulls, reward, total):
+        # Rewards are treated as successes, pulls without one as failures
+        a = [self.prior[0] + max(r, 0.0) for r in reward]
+        b = [self.prior[1] + max(n - r, 0.0) for n, r in zip(pulls, reward)]
+        if numpy is not None:
+            return int(_numpy_random().beta(a, b).argmax())
+        draws = [betavariate(i, j) for i, j in zip(a, b)]
+        return draws.index(max(draws))
+
+    def reward_arm(self, arm_id, reward):
+        super(_ForgettingThompson, self).reward_arm(arm_id, min(max(reward, 0.0), 1.0))
+
+
+class SlidingWindowEpsilonGreedyBandit(_ForgettingEpsilonGreedy, SlidingWindowBandit):
+    """:class:`EpsilonGreedyBandit` over the last ``window`` pulls"""
+
+    def __init__(self, epsilon=0.1, window=1000):
+        super(SlidingWindowEpsilonGreedyBandit, self).__init__(window)
+        self.epsilon = epsilon
+
+
+class DiscountedEpsilonGreedyBandit(_ForgettingEpsilonGreedy, DiscountedBandit):
+    """:class:`EpsilonGreedyBandit` over exponentially discounted pulls"""
+
+    def __init__(self, epsilon=0.1, discount=0.999):
+        super(DiscountedEpsilonGreedyBandit, self).__init__(discount)
+        self.epsilon = epsilon
+
+
+class SlidingWindowUCBBandit(_ForgettingUCB, SlidingWindowBandit):
+    """UCB1 over the last ``window`` pulls"""
+
+
+class DiscountedUCBBandit(_ForgettingUCB, DiscountedBandit):
+    """UCB1 over exponentially discounted pulls (discounted UCB)"""
+
+
+class SlidingWindowThompsonBandit(_ForgettingThompson, SlidingWindowBandit):
+    """Thompson sampling with Beta posteriors over the last ``window``
+    pulls, for rewards between 0 and 1
+    """
+
+    def __init__(self, prior=(1.0, 1.0), window=1000):
+        super(SlidingWindowThompsonBandit, self).__init__(window)
+        self.prior = list(prior)
+
+
+class DiscountedThompsonBandit(_ForgettingThompson, DiscountedBandit):
+    """Thompson sampling with Beta posteriors over exponentially discounted
+    pulls, for rewards between 0 and 1
+    """
+
+    def __init__(self, prior=(1.0, 1.0), discount=0.999):
+        super(DiscountedThompsonBandit, self).__init__(discount)
+        self.prior = list(prior)
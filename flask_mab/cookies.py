@@ -0,0 +1,176 @@
+"""
+flask_mab.cookies
+~~~~~~~~~~~~~~~~~
+
+Encodings of the cookie holding a visitor's assigned arms, as
+``{experiment: (arm_id, reward_open)}``.
+
+``json``
+    The assignments as a JSON object, readable but hundreds of bytes once a
+    dozen experiments are live.
+``compact``
+    A version byte, then per experiment a 4 byte code (the CRC32 of its
+    name) and a varint of the arm's position, its lowest bit flagging an
+    open reward, all base64 encoded.  Positions follow the order arms were
+    added in, so reordering the arms of a live experiment reassigns its
+    visitors.
+
+Either codec reads cookies in both encodings, so switching
+``MAB_COOKIE_ENCODING`` migrates visitors as their cookie is next written.
+"""
+
+import base64
+import binascii
+import json
+import struct
+import zlib
+from functools import lru_cache
+
+COMPACT_VERSION = 1
+
+_CODE = struct.Struct(">I")
+
+
+def experiment_code(name):
+    """Short code of an experiment in compact cookies"""
+    return zlib.crc32(name.encode("utf-8"))
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return out
+
+
+def _read_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class CookieCodec(object):
+    """Turns assignments into a cookie value and back
+
+    :param bandits: The app's ``{name: bandit}``.  Call :meth:`add` after
+                    adding to it, :meth:`refresh` after removing from it.
+    :param encoding: ``"json"`` or ``"compact"``, used when writing
+    :param cache_size: Parsed cookie values to remember, 0 to parse every
+                       time.  Returning visitors send the same value on
+                       every request until an assignment changes.
+    """
+
+    encodings = ("json", "compact")
+
+    def __init__(self, bandits, encoding="json", cache_size=1024):
+        if encoding not in self.encodings:
+            raise ValueError("Unknown cookie encoding %r" % encoding)
+        self.bandits = bandits
+        self.encoding = encoding
+        self.cache_size = cache_size
+        self.refresh()
+
+    def add(self, name):
+        """Pick up one added bandit, without rescanning the others
+
+        :raises ValueError: if its name shares a code with another experiment
+        """
+        code = experiment_code(name)
+        known = self._codes.setdefault(code, name)
+        if known != name:
+            raise ValueError(
+                "Experiments %r and %r share a cookie code" % (known, name)
+            )
+        # Cookies parsed before now dropped the new experiment, forget them
+        # on the next decode rather than once per added bandit
+        self._stale = True
+
+    def refresh(self):
+        """Pick up added bandits and forget parsed cookies
+
+        :raises ValueError: if two experiment names share a code
+        """
+        codes = {}
+        for name in self.bandits:
+            code = experiment_code(name)
+            if codes.setdefault(code, name) != name:
+                raise ValueError(
+                    "Experiments %r and %r share a cookie code" % (codes[code], name)
+                )
+        self._codes = codes
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._stale = False
+        if self.cache_size:
+            self._parse = lru_cache(self.cache_size)(self._decode)
+        else:
+            self._parse = self._decode
+
+    def needs_rewrite(self, value):
+        """Whether a cookie value is in another encoding than the one
+        written, so should be set again even if nothing changed
+        """
+        return value.startswith("{") != (self.encoding == "json")
+
+    def encode(self, assignments):
+        if self.encoding == "json":
+            return json.dumps(assignments)
+        out = bytearray([COMPACT_VERSION])
+        for name, (arm_id, open_reward) in assignments.items():
+            try:
+                index = self.bandits[name].arm_index(arm_id)
+            except KeyError:
+                # Carried over from a JSON cookie, but gone since
+                continue
+            out += _CODE.pack(experiment_code(name))
+            out += _varint(index << 1 | bool(open_reward))
+        return base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode("ascii")
+
+    def decode(self, value):
+        """Assignments held by a cookie value, as a new dict the caller may
+        change.  Experiments or arms that no longer exist are left out of
+        compact cookies.
+        """
+        if self._stale:
+            self._reset_cache()
+        return dict(self._parse(value))
+
+    def _decode(self, value):
+        if value.startswith("{"):
+            return dict(
+                [
+                    (name, tuple(assigned))
+                    for name, assigned in json.loads(value).items()
+                ]
+            )
+        try:
+            data = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        except (binascii.Error, ValueError):
+            return {}
+        if not data or data[0] != COMPACT_VERSION:
+            return {}
+        experiments = self._codes
+        assignments = {}
+        pos = 1
+        try:
+            while pos < len(data):
+                (code,) = _CODE.unpack_from(data, pos)
+                packed, pos = _read_varint(data, pos + _CODE.size)
+                name = experiments.get(code)
+                if name is None:
+                    continue
+                arms = self.bandits[name].arms
+                if packed >> 1 < len(arms):
+                    assignments[name] = (arms[packed >> 1], bool(packed & 1))
+        except (struct.error, IndexError):
+            # Truncated, keep what was read
+            pass
+        return assignments
@@ -0,0 +1,198 @@
+"""
+Shared, memory-mapped arm counters
+
+Under a pre-fork server every worker holds its own copy of each bandit and
+learns only from the traffic it serves.  A :class:`SharedCounterTable` keeps
+the per-arm counters in a fixed-layout file mapped into every worker, so that
+pulls and rewards land in one place and every worker decides from the
+host-wide totals.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+class CounterView(object):
+    """A list-like view of one counter field across the arms of a bandit,
+    reading and writing straight through to the shared table.
+    """
+
+    def __init__(self, table, slots, field):
+        self.table = table
+        self.slots = slots
+        self.field = field
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __getitem__(self, ind):
+        if isinstance(ind, slice):
+            return [self.table.get(slot, self.field) for slot in self.slots[ind]]
+        return self.table.get(self.slots[ind], self.field)
+
+    def __setitem__(self, ind, value):
+        self.table.set(self.slots[ind], self.field, value)
+
+    def __iter__(self):
+        for slot in self.slots:
+            yield self.table.get(slot, self.field)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def index(self, value):
+        return list(self).index(value)
+
+    def append(self, value):
+        raise TypeError("Arms cannot be added once a bandit is attached")
+
+
+class SharedCounterTable(object):
+    """Fixed-size, memory-mapped table of arm counters
+
+    The file starts with a 64 byte header followed by ``slots`` records of 64
+    bytes: the SHA-1 of the ``(bandit, arm)`` pair, then pulls (int64) and
+    reward, confidence, a and b (float64).  Records are placed by open
+    addressing on the digest, so every process finds the same slot for the
+    same arm without any coordination beyond a lock on the header while
+    claiming it.
+
+    Updates are synchronized per slot with a byte range lock on the record,
+    plus a thread lock since range locks are held per process.
+
+    :param filepath: Path of the table file, ideally on a tmpfs like /dev/shm
+    :param slots: Number of arm records, only used when creating the file
+    :type slots: int
+    """
+
+    MAGIC = b"MABC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHI")
+    HEADER_SIZE = 64
+    RECORD = struct.Struct("<20s4xqdddd")
+    FIELDS = ("pulls", "reward", "confidence", "a", "b")
+    LOCK_STRIPES = 64
+
+    def __init__(self, filepath, slots=4096):
+        if fcntl is None:
+            raise RuntimeError("Shared counters require a POSIX platform")
+        self.file_handle = filepath
+        self._fd = os.open(filepath, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.HEADER_SIZE, 0)
+        try:
+            header = os.pread(self._fd, self.HEADER.size, 0)
+            if len(header) < self.HEADER.size or not header.startswith(self.MAGIC):
+                os.ftruncate(self._fd, self.HEADER_SIZE + slots * self.RECORD.size)
+                os.pwrite(
+                    self._fd, self.HEADER.pack(self.MAGIC, self.VERSION, 0, slots), 0
+                )
+            else:
+                magic, version, _, slots = self.HEADER.unpack(header)
+                if version != self.VERSION:
+                    raise ValueError("Unsupported counter table version %s" % version)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.HEADER_SIZE, 0)
+        self.slots = slots
+        self._map = mmap.mmap(self._fd, self.HEADER_SIZE + slots * self.RECORD.size)
+        self._offsets = dict(
+            [(field, 24 + 8 * ind) for ind, field in enumerate(self.FIELDS)]
+        )
+        self._thread_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._claimed = {}
+
+    def _offset(self, slot):
+        return self.HEADER_SIZE + slot * self.RECORD.size
+
+    def get(self, slot, field):
+        fmt = "<q" if field == "pulls" else "<d"
+        return struct.unpack_from(
+            fmt, self._map, self._offset(slot) + self._offsets[field]
+        )[0]
+
+    def set(self, slot, field, value):
+        fmt, value = ("<q", int(value)) if field == "pulls" else ("<d", value)
+        struct.pack_into(
+            fmt, self._map, self._offset(slot) + self._offsets[field], value
+        )
+
+    @contextmanager
+    def lock(self, slot):
+        """Exclusive access to one record, across threads and processes"""
+        with self._thread_locks[slot % self.LOCK_STRIPES]:
+            offset = self._offset(slot)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.RECORD.size, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.RECORD.size, offset)
+
+    def claim(self, bandit_id, arm_id, initial=None):
+        """Find the slot for an arm, claiming an empty one if needed
+
+        :param initial: Counter values for a newly claimed slot
+        :type initial: dict
+        :returns: A tuple of the slot number and whether it was just claimed
+        """
+        digest = hashlib.sha1(json.dumps([bandit_id, arm_id]).encode()).digest()
+        if digest in self._claimed:
+            return self._claimed[digest], False
+        start = int.from_bytes(digest[:4], "little") % self.slots
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.HEADER_SIZE, 0)
+        try:
+            for probe in range(self.slots):
+                slot = (start + probe) % self.slots
+                key = self._map[self._offset(slot) : self._offset(slot) + 20]
+                if key == digest:
+                    self._claimed[digest] = slot
+                    return slot, False
+                if key == b"\x00" * 20:
+                    self.RECORD.pack_into(
+                        self._map, self._offset(slot), digest, 0, 0.0, 0.0, 1.0, 1.0
+                    )
+                    for field, value in (initial or {}).items():
+                        self.set(slot, field, value)
+                    self._claimed[digest] = slot
+                    return slot, True
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.HEADER_SIZE, 0)
+        raise IndexError("Shared counter table %s is full" % self.file_handle)
+
+    def attach(self, bandit_id, bandit):
+        """Move a bandit's counters into the table
+
+        Arms seen for the first time are seeded with the bandit's current
+        counts; otherwise the bandit adopts the totals already in the table.
+        """
+        slots = []
+        for ind, arm_id in enumerate(bandit.arms):
+            initial = dict(
+                [
+                    (field, getattr(bandit, field)[ind])
+                    for field in bandit.counter_fields
+                ]
+            )
+            slot, _ = self.claim(bandit_id, arm_id, initial)
+            slots.append(slot)
+        for field in bandit.counter_fields:
+            setattr(bandit, field, CounterView(self, slots, field))
+        bandit._lock_for = lambda ind: self.lock(slots[ind])
+        # Other processes change the counters without telling this bandit
+        bandit._cache_weights = False
+        return bandit
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
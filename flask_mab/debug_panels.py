@@ -45,5 +45,5 @@ class BanditDebugPanel(DebugPanel):
         context["storage_engine"] = current_app.config.get("MAB_STORAGE_ENGINE")
         context["storage_opts"] = current_app.config.get("MAB_STORAGE_OPTS", tuple())
         context["bandits"] = current_app.extensions["mab"].bandits.items()
-        context["assigned"] = request.bandits
+        context["assigned"] = getattr(request, "bandits", {})
         return self.render("panels/mab-panel.html", context)
@@ -5,6 +5,10 @@ class Mab(object):
         self.bandits = {}
         self.reward_endpts = []
         self.pull_endpts = []
+        self.bandit_endpoints = {}
         self.debug_headers = app.config.get("MAB_DEBUG_HEADERS", True)
         self.cookie_name = app.config.get("MAB_COOKIE_NAME", "MAB")
         self.bandit_storage = None
+        self.counter_table = None
+        self.cookie_codec = None
+        self.assignment_store = None
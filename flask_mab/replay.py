@@ -0,0 +1,199 @@
+"""
+Offline (counterfactual) evaluation of bandit policies on logged traffic
+
+Each logged record holds the context of an impression (``None`` for
+non-contextual experiments), the arm that was shown, the probability the
+logging policy had of showing it (its propensity) and the reward that
+followed.  :func:`evaluate` streams such a log through a candidate bandit
+and estimates the average reward the candidate would have earned::
+
+    from flask_mab.bandits import ThompsonBandit
+    from flask_mab.replay import evaluate, read_log
+
+    candidate = ThompsonBandit()
+    for arm_id in ("green", "red", "blue"):
+        candidate.add_arm(arm_id)
+    print(evaluate(candidate, read_log("impressions.jsonl.gz")))
+
+Logs are read in chunks, so they never have to fit in memory.
+"""
+
+import gzip
+import json
+import math
+from itertools import islice
+
+import flask_mab.bandits
+
+
+def read_log(path):
+    """Stream records from a JSON lines log, gzip compressed if the name
+    ends in ``.gz``.  Each line is an object with ``arm``, ``reward`` and
+    optionally ``context`` and ``propensity``.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as log:
+        for line in log:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _record(item):
+    if isinstance(item, dict):
+        return (
+            item.get("context"),
+            item["arm"],
+            item.get("propensity"),
+            item.get("reward", 0.0),
+        )
+    return tuple(item)
+
+
+def _chunks(records, chunk_size):
+    records = iter(records)
+    while True:
+        chunk = [_record(item) for item in islice(records, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def _suggestions(bandit, chunk):
+    """Arm ids the bandit picks for every record of a chunk"""
+    if all(context is None for context, _, _, _ in chunk):
+        return [arm.id for arm in bandit.suggest_arms(len(chunk))]
+    return [
+        (bandit.suggest_arm() if context is None else bandit.suggest_arm(context)).id
+        for context, _, _, _ in chunk
+    ]
+
+
+def _score_chunk(chunk, suggested, has_propensity, offset):
+    """Record count, matches, matched reward and the IPS sums
+    (``reward / propensity``, its square and ``1 / propensity``) of a chunk
+    """
+    numpy = flask_mab.bandits.numpy
+    propensities = [propensity for _, _, propensity, _ in chunk]
+    if has_propensity:
+        for position, propensity in enumerate(propensities):
+            if not (propensity or 0) > 0:
+                raise ValueError(
+                    "Record %d has no positive propensity" % (offset + position + 1)
+                )
+    else:
+        propensities = [1.0] * len(chunk)
+    rewards = [float(reward) for _, _, _, reward in chunk]
+    matched = [choice == arm_id for (_, arm_id, _, _), choice in zip(chunk, suggested)]
+    if numpy is not None:
+        matched = numpy.array(matched, dtype=bool)
+        rewards = numpy.array(rewards)[matched]
+        propensities = numpy.array(propensities, dtype=float)[matched]
+        scaled = rewards / propensities
+        return (
+            len(chunk),
+            int(matched.sum()),
+            float(rewards.sum()),
+            float(scaled.sum()),
+            float((scaled**2).sum()),
+            float((1.0 / propensities).sum()),
+        )
+    pairs = [
+        (reward, propensity)
+        for reward, propensity, match in zip(rewards, propensities, matched)
+        if match
+    ]
+    return (
+        len(chunk),
+        len(pairs),
+        sum(reward for reward, _ in pairs),
+        sum(reward / propensity for reward, propensity in pairs),
+        sum((reward / propensity) ** 2 for reward, propensity in pairs),
+        sum(1.0 / propensity for _, propensity in pairs),
+    )
+
+
+def evaluate(bandit, records, chunk_size=10000, learn=True):
+    """Estimate the average reward per impression ``bandit`` would have
+    earned on logged traffic
+
+    For every chunk of records the bandit suggests an arm per record, all
+    at once (vectorized where :meth:`~flask_mab.bandits.Bandit.suggest_arms`
+    is).  Records where it agrees with the logged arm are matches, and the
+    estimates are built from them:
+
+    * ``replay``: mean reward over matches (Li et al.), unbiased when the
+      logging policy was uniformly random
+    * ``ips``: inverse propensity scoring, the mean over all records of
+      ``reward / propensity`` on matches and 0 elsewhere
+    * ``snips``: self-normalized IPS, lower variance at a small bias
+
+    :param bandit: The policy to evaluate, with the logged arms added.  It
+                   is updated in place when ``learn`` is set.
+    :param records: Iterable of dicts (see :func:`read_log`) or
+                    ``(context, arm, propensity, reward)`` tuples
+    :param chunk_size: Records per chunk.  A learning bandit only sees the
+                       matches of a chunk once the chunk is scored, so 1
+                       gives the strict one-at-a-time replay.
+    :param learn: Whether to pull and reward the bandit on matches, as it
+                  would have been on live traffic
+    :raises ValueError: on a record without a positive propensity, unless
+                        no record has one (``ips`` and ``snips`` are then
+                        ``None``)
+    :returns: A dict with ``records``, ``matches`` and the estimates, plus
+              ``ips_stderr``
+    """
+    totals = [0, 0, 0.0, 0.0, 0.0, 0.0]
+    has_propensity = None
+    for chunk in _chunks(records, chunk_size):
+        if has_propensity is None:
+            has_propensity = chunk[0][2] is not None
+        suggested = _suggestions(bandit, chunk)
+        scored = _score_chunk(chunk, suggested, has_propensity, totals[0])
+        totals = [total + part for total, part in zip(totals, scored)]
+        if learn:
+            for (context, arm_id, _, reward), choice in zip(chunk, suggested):
+                if choice != arm_id:
+                    continue
+                if context is None:
+                    bandit.pull_arm(arm_id)
+                    if reward:
+                        bandit.reward_arm(arm_id, reward)
+                else:
+                    bandit.pull_arm(arm_id, context)
+                    if reward:
+                        bandit.reward_arm(arm_id, reward, context)
+
+    total, matches, matched_reward, weighted, weighted_squares, weights = totals
+    result = {
+        "records": total,
+        "matches": matches,
+        "replay": matched_reward / matches if matches else None,
+        "ips": None,
+        "ips_stderr": None,
+        "snips": None,
+    }
+    if has_propensity and total:
+        ips = weighted / total
+        result["ips"] = ips
+        result["ips_stderr"] = math.sqrt(
+            max(weighted_squares / total - ips**2, 0.0) / total
+        )
+        result["snips"] = weighted / weights if weights else None
+    return result
+
+
+def compare(policies, log_factory, chunk_size=10000):
+    """Evaluate several policies on the same log
+
+    :param policies: ``{name: bandit}``
+    :param log_factory: Callable returning a fresh iterable of records for
+                        each policy, e.g. ``lambda: read_log(path)``, so the
+                        log is streamed once per policy instead of kept
+    :returns: ``{name: result}`` as from :func:`evaluate`
+    """
+    return dict(
+        [
+            (name, evaluate(bandit, log_factory(), chunk_size))
+            for name, bandit in policies.items()
+        ]
+    )
@@ -0,0 +1,268 @@
+"""
+Offline simulation of bandit strategies
+
+Runs bandits against synthetic reward distributions, so strategies and
+their parameters can be compared before they see live traffic.  Trials are
+independent and are spread over a process pool::
+
+    from flask_mab.simulation import BernoulliArms, simulate, format_report
+
+    results = simulate(
+        [
+            ("greedy 0.1", "EpsilonGreedyBandit", {"epsilon": 0.1}),
+            ("thompson", "ThompsonBandit", {}),
+        ],
+        BernoulliArms([0.02, 0.03, 0.05]),
+        horizon=10000,
+        trials=20,
+    )
+    print(format_report(results))
+"""
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import flask_mab.bandits
+
+
+class RewardDistribution(object):
+    """Rewards for each arm, possibly changing over time
+
+    :param n_arms: Number of arms
+    """
+
+    def __init__(self, n_arms):
+        self.n_arms = n_arms
+
+    def mean(self, arm_index, step):
+        """Expected reward of an arm at a step"""
+        raise NotImplementedError
+
+    def draw(self, arm_index, step, rng):
+        """Sample a reward of an arm at a step
+
+        :param rng: A :class:`random.Random`
+        """
+        raise NotImplementedError
+
+
+class BernoulliArms(RewardDistribution):
+    """Each arm pays 1 with a fixed probability, 0 otherwise"""
+
+    def __init__(self, probabilities):
+        super(BernoulliArms, self).__init__(len(probabilities))
+        self.probabilities = list(probabilities)
+
+    def mean(self, arm_index, step):
+        return self.probabilities[arm_index]
+
+    def draw(self, arm_index, step, rng):
+        return 1.0 if rng.random() < self.probabilities[arm_index] else 0.0
+
+
+class GaussianArms(RewardDistribution):
+    """Each arm pays a normally distributed reward"""
+
+    def __init__(self, means, sigma=1.0):
+        super(GaussianArms, self).__init__(len(means))
+        self.means = list(means)
+        self.sigma = sigma
+
+    def mean(self, arm_index, step):
+        return self.means[arm_index]
+
+    def draw(self, arm_index, step, rng):
+        return rng.gauss(self.means[arm_index], self.sigma)
+
+
+class DriftingArms(RewardDistribution):
+    """Bernoulli arms whose probabilities move linearly from ``start`` to
+    ``end`` over ``period`` steps and stay there after
+    """
+
+    def __init__(self, start, end, period):
+        super(DriftingArms, self).__init__(len(start))
+        self.start = list(start)
+        self.end = list(end)
+        self.period = period
+
+    def mean(self, arm_index, step):
+        progress = min(float(step) / self.period, 1.0)
+        start = self.start[arm_index]
+        return start + (self.end[arm_index] - start) * progress
+
+    def draw(self, arm_index, step, rng):
+        return 1.0 if rng.random() < self.mean(arm_index, step) else 0.0
+
+
+def _bandit_class(bandit_type):
+    if isinstance(bandit_type, str):
+        return getattr(flask_mab.bandits, bandit_type)
+    return bandit_type
+
+
+@contextmanager
+def _seeded(seed):
+    """Seed the generators bandits draw from, putting back the caller's
+    state afterwards, as trials may run in the process serving the app
+    """
+    state, np_rng = random.getstate(), flask_mab.bandits._np_rng
+    random.seed(seed)
+    if flask_mab.bandits.numpy is not None:
+        flask_mab.bandits._np_rng = flask_mab.bandits.numpy.random.default_rng(seed)
+    try:
+        yield
+    finally:
+        random.setstate(state)
+        flask_mab.bandits._np_rng = np_rng
+
+
+def run_trial(bandit_type, kwargs, distribution, horizon, seed, checkpoints=20):
+    """Play one bandit against a distribution for ``horizon`` steps
+
+    :param bandit_type: A :class:`~flask_mab.bandits.Bandit` subclass or the
+                        name of one in :mod:`flask_mab.bandits`
+    :param kwargs: Constructor arguments for the bandit
+    :param checkpoints: How many points of the regret curve to keep
+    :returns: A dict with the cumulative ``regret`` at the end, the
+              ``regret_curve`` at evenly spaced steps, the step at which the
+              bandit ``converged`` (``None`` if it did not) and the time
+              spent suggesting as ``suggestions_per_second``
+    """
+    with _seeded(seed):
+        return _play(bandit_type, kwargs, distribution, horizon, seed, checkpoints)
+
+
+def _play(bandit_type, kwargs, distribution, horizon, seed, checkpoints):
+    rng = random.Random(seed)
+    bandit = _bandit_class(bandit_type)(**kwargs)
+    for ind in range(distribution.n_arms):
+        bandit.add_arm("arm-%d" % ind, ind)
+
+    every = max(1, horizon // checkpoints)
+    regret, curve, best_picks = 0.0, [], 0
+    converged, suggest_time = None, 0.0
+    for step in range(horizon):
+        started = time.perf_counter()
+        arm = bandit.suggest_arm()
+        suggest_time += time.perf_counter() - started
+
+        means = [distribution.mean(ind, step) for ind in range(distribution.n_arms)]
+        best = max(means)
+        regret += best - means[arm.index]
+        best_picks += means[arm.index] == best
+
+        bandit.pull_arm(arm.id)
+        reward = distribution.draw(arm.index, step, rng)
+        if reward:
+            bandit.reward_arm(arm.id, reward)
+
+        if (step + 1) % every == 0:
+            curve.append(regret)
+            # Converged once a whole checkpoint window mostly picks the best
+            if best_picks >= 0.9 * every:
+                if converged is None:
+                    converged = step + 1 - every
+            else:
+                converged = None
+            best_picks = 0
+    return {
+        "regret": regret,
+        "regret_curve": curve,
+        "converged": converged,
+        "suggestions_per_second": horizon / suggest_time if suggest_time else None,
+    }
+
+
+def _run_trial(args):
+    return run_trial(*args)
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def simulate(strategies, distribution, horizon=1000, trials=10, processes=None, seed=0):
+    """Run every strategy for ``trials`` independent trials
+
+    :param strategies: ``(name, bandit_type, kwargs)`` tuples, where
+                       ``bandit_type`` is as for :func:`run_trial`
+    :param distribution: A :class:`RewardDistribution`
+    :param processes: Size of the process pool, ``None`` for one per CPU
+                      and 1 to run everything in this process
+    :param seed: Trial ``i`` of every strategy is seeded with ``seed + i``,
+                 so strategies face the same reward draws
+    :returns: One dict per strategy with its ``name``, ``kwargs`` and the
+              trial results averaged: ``regret``, its ``regret_stdev``,
+              ``regret_curve``, ``converged`` (mean step over the trials
+              that converged), ``converged_share`` and
+              ``suggestions_per_second``
+    """
+    jobs = [
+        (bandit_type, kwargs, distribution, horizon, seed + trial)
+        for _, bandit_type, kwargs in strategies
+        for trial in range(trials)
+    ]
+    if processes == 1:
+        outcomes = [_run_trial(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            outcomes = list(pool.map(_run_trial, jobs, chunksize=max(1, trials // 4)))
+
+    results = []
+    for position, (name, _, kwargs) in enumerate(strategies):
+        runs = outcomes[position * trials : (position + 1) * trials]
+        regrets = [run["regret"] for run in runs]
+        mean_regret = _mean(regrets)
+        converged = [run["converged"] for run in runs]
+        results.append(
+            {
+                "name": name,
+                "kwargs": kwargs,
+                "regret": mean_regret,
+                "regret_stdev": math.sqrt(
+                    _mean([(regret - mean_regret) ** 2 for regret in regrets])
+                ),
+                "regret_curve": [
+                    _mean(points)
+                    for points in zip(*[run["regret_curve"] for run in runs])
+                ],
+                "converged": _mean(converged),
+                "converged_share": (
+                    sum(step is not None for step in converged) / float(trials)
+                ),
+                "suggestions_per_second": _mean(
+                    [run["suggestions_per_second"] for run in runs]
+                ),
+            }
+        )
+    return results
+
+
+def format_report(results):
+    """Render :func:`simulate` results as a plain text table"""
+    lines = [
+        "%-28s %12s %10s %12s %10s %16s"
+        % ("strategy", "regret", "stdev", "converged", "share", "suggestions/s")
+    ]
+    for result in results:
+        lines.append(
+            "%-28s %12.2f %10.2f %12s %10.2f %16.0f"
+            % (
+                result["name"],
+                result["regret"],
+                result["regret_stdev"],
+                (
+                    "-"
+                    if result["converged"] is None
+                    else "%d" % round(result["converged"])
+                ),
+                result["converged_share"],
+                result["suggestions_per_second"] or 0,
+            )
+        )
+    return "\n".join(lines)
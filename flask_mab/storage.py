@@ -3,8 +3,33 @@ Defines various storage engines for the MAB
 interface
 """
 
+import asyncio
+import atexit
 import json
+import logging
+import os
+import socket
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
 import flask_mab.bandits
+import flask_mab.counters
+
+
+log = logging.getLogger(__name__)
+
+_BINARY_MAGIC = b"MABB"
+_BINARY_VERSION = 1
+_BINARY_COMPRESSED = 1
+_BINARY_HEADER = struct.Struct("<4sHHI")
+_BINARY_LENGTH = struct.Struct("<I")
+_BINARY_ARMS = struct.Struct("<IH")
+_BINARY_FIELD = struct.Struct("<16sc")
 
 
 class BanditEncoder(json.JSONEncoder):
@@ -12,9 +37,7 @@ class BanditEncoder(json.JSONEncoder):
 
     def default(self, obj):
         if isinstance(obj, flask_mab.bandits.Bandit):
-            dict_repr = obj.__dict__
-            dict_repr["bandit_type"] = obj.__class__.__name__
-            return dict_repr
+            return obj.todict()
         return json.JSONEncoder.default(self, obj)
 
 
@@ -30,18 +53,205 @@ class BanditDecoder(json.JSONDecoder):
         return dict_repr
 
 
+def _atomic_write(path, data):
+    """Replace the file at ``path`` with ``data`` (str or bytes) so that
+    readers, and the file after a crash, see either all of the old or all of
+    the new content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".mab-")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def dumps_binary(bandits, compress=False):
+    """Encode bandits in the compact binary snapshot format
+
+    The format starts with a header: the magic ``MABB``, a version, flags
+    and the number of bandits (little-endian ``<4sHHI``).  The rest, zlib
+    compressed when flag bit 0 is set, holds for each bandit its name, its
+    arm ids and remaining non-counter state as length-prefixed JSON, then
+    each of its :attr:`~flask_mab.bandits.Bandit.counter_fields` as a packed
+    array: int64 for pulls, float64 for everything else.
+
+    :param bandits: A dict of bandits, as passed to :meth:`BanditStorage.save`
+    :param compress: Whether to zlib compress the body
+    :rtype: bytes
+    """
+    body = []
+    for name, bandit in bandits.items():
+        state = bandit.todict()
+        counters = [(field, state.pop(field)) for field in bandit.counter_fields]
+        arms = state.pop("arms")
+        for blob in (name, json.dumps(arms), json.dumps(state)):
+            blob = blob.encode()
+            body.append(_BINARY_LENGTH.pack(len(blob)) + blob)
+        body.append(_BINARY_ARMS.pack(len(arms), len(counters)))
+        for field, values in counters:
+            typecode = "q" if field == "pulls" else "d"
+            packed = array(
+                typecode, [int(v) for v in values] if typecode == "q" else values
+            )
+            if sys.byteorder != "little":
+                packed.byteswap()
+            body.append(
+                _BINARY_FIELD.pack(field.encode(), typecode.encode()) + packed.tobytes()
+            )
+    body = b"".join(body)
+    flags = 0
+    if compress:
+        body = zlib.compress(body)
+        flags |= _BINARY_COMPRESSED
+    return (
+        _BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, flags, len(bandits)) + body
+    )
+
+
+def loads_binary(data):
+    """Decode bandits from :func:`dumps_binary` output
+
+    :raises ValueError: if the data is not a supported snapshot
+    """
+    if len(data) < _BINARY_HEADER.size:
+        raise ValueError("Snapshot is truncated")
+    magic, version, flags, count = _BINARY_HEADER.unpack_from(data)
+    if magic != _BINARY_MAGIC or version != _BINARY_VERSION:
+        raise ValueError("Not a version %d bandit snapshot" % _BINARY_VERSION)
+    body = data[_BINARY_HEADER.size :]
+    if flags & _BINARY_COMPRESSED:
+        body = zlib.decompress(body)
+    body = memoryview(body)
+
+    bandits = {}
+    offset = 0
+    try:
+        for _ in range(count):
+            blobs = []
+            for _ in range(3):
+                (length,) = _BINARY_LENGTH.unpack_from(body, offset)
+                offset += _BINARY_LENGTH.size
+                blobs.append(bytes(body[offset : offset + length]).decode())
+                offset += length
+            name, arms, state = blobs
+            dict_spec = json.loads(state)
+            dict_spec["arms"] = json.loads(arms)
+            n_arms, n_fields = _BINARY_ARMS.unpack_from(body, offset)
+            offset += _BINARY_ARMS.size
+            for _ in range(n_fields):
+                field, typecode = _BINARY_FIELD.unpack_from(body, offset)
+                offset += _BINARY_FIELD.size
+                values = array(typecode.decode())
+                end = offset + n_arms * values.itemsize
+                values.frombytes(body[offset:end])
+                if sys.byteorder != "little":
+                    values.byteswap()
+                offset = end
+                dict_spec[field.rstrip(b"\x00").decode()] = values.tolist()
+            bandits[name] = flask_mab.bandits.Bandit.fromdict(dict_spec)
+    except struct.error:
+        raise ValueError("Snapshot is truncated")
+    return bandits
+
+
+def convert_json_snapshot(json_path, binary_path, compress=True):
+    """Rewrite a :class:`JSONBanditStorage` file in the binary format read by
+    :class:`BinaryBanditStorage`
+    """
+    bandits = JSONBanditStorage(json_path).load()
+    _atomic_write(binary_path, dumps_binary(bandits, compress))
+    return bandits
+
+
 class BanditStorage(object):
     """The base interface for a storage engine, implements no-ops for tests"""
 
+    #: Whether :meth:`record_pull` and :meth:`record_reward` must run in step
+    #: with the bandit changing, because saved snapshots are matched against
+    #: recorded events.  Such events are never buffered by write-behind.
+    ordered_events = False
+
     def flush(self):
         pass
 
+    def apply_pull(self, bandit_id, bandit, arm_id, context=None):
+        """Pull an arm of a bandit and record the pull, as the middleware
+        does for every impression
+        """
+        if context is None:
+            bandit.pull_arm(arm_id)
+        else:
+            bandit.pull_arm(arm_id, context)
+        self.record_pull(bandit_id, arm_id)
+
+    def apply_reward(self, bandit_id, bandit, arm_id, reward, context=None):
+        """Reward an arm of a bandit and record the reward, see
+        :meth:`apply_pull`
+        """
+        if context is None:
+            bandit.reward_arm(arm_id, reward)
+        else:
+            bandit.reward_arm(arm_id, reward, context)
+        self.record_reward(bandit_id, arm_id, reward)
+
+    def record_pull(self, bandit_id, arm_id):
+        """Called for every impression registered by the middleware, before
+        the bandits are saved.  Engines that persist individual events
+        rather than whole bandits override this.
+        """
+        pass
+
+    def record_reward(self, bandit_id, arm_id, reward):
+        """Called for every reward registered by the middleware, before
+        the bandits are saved.
+        """
+        pass
+
     def save(self, bandits):
         pass
 
     def load(self):
         return {}
 
+    def _snapshot_version(self):
+        """Changes whenever the stored bandits may have been changed by
+        someone else, e.g. a file's modification time.  ``None`` means the
+        engine cannot tell.
+        """
+        return None
+
+    def load_bandit(self, name):
+        """Load one saved bandit, or ``None`` if there is none by that name
+
+        Used when registering bandits, so that starting an app with many
+        experiments reads the storage once rather than once per experiment.
+        The result of :meth:`load` is kept until :meth:`_snapshot_version`
+        changes.
+        """
+        version = self._snapshot_version()
+        cache = getattr(self, "_load_cache", None)
+        if cache is None or cache[0] != version:
+            cache = self._load_cache = (version, self.load())
+        return cache[1].get(name)
+
+    async def asave(self, bandits):
+        """Awaitable :meth:`save`.  Runs the blocking save in the event
+        loop's default executor, engines with native async I/O override it.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.save, bandits)
+
+    async def aload(self):
+        """Awaitable :meth:`load`, see :meth:`asave`"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.load)
+
 
 class JSONBanditStorage(BanditStorage):
     """Json based file storage
@@ -67,3 +277,996 @@ class JSONBanditStorage(BanditStorage):
             return json.loads(bandits, cls=BanditDecoder)
         except (ValueError, IOError):
             return {}
+
+    def _snapshot_version(self):
+        try:
+            stat = os.stat(self.file_handle)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load_bandit(self, name):
+        """Like :meth:`BanditStorage.load_bandit`, but keeps the parsed JSON
+        and only turns the requested bandit into a :class:`Bandit`
+        """
+        version = self._snapshot_version()
+        cache = getattr(self, "_raw_cache", None)
+        if cache is None or cache[0] != version:
+            try:
+                with open(self.file_handle, "r") as bandit_file:
+                    raw = json.loads(bandit_file.read())
+            except (ValueError, IOError):
+                raw = {}
+            cache = self._raw_cache = (version, raw)
+        dict_repr = cache[1].get(name)
+        if dict_repr is None:
+            return None
+        if "bandit_type" not in dict_repr.keys():
+            raise TypeError("Serialized object is not a valid bandit")
+        # Copy the lists so that bandits never share state with the cache
+        return flask_mab.bandits.Bandit.fromdict(
+            dict(
+                [
+                    (key, list(value) if isinstance(value, list) else value)
+                    for key, value in dict_repr.items()
+                ]
+            )
+        )
+
+
+class BinaryBanditStorage(JSONBanditStorage):
+    """File storage using the compact binary format of :func:`dumps_binary`
+
+    Smaller and quicker to decode than JSON for many bandits or arms, and
+    written atomically.  Existing JSON files can be converted with
+    :func:`convert_json_snapshot`.
+
+    :param filepath: Path of the snapshot file
+    :param compress: Whether to zlib compress snapshots
+    :type compress: bool
+    """
+
+    def __init__(self, filepath, compress=True):
+        super(BinaryBanditStorage, self).__init__(filepath)
+        self.compress = compress
+
+    def save(self, bandits):
+        _atomic_write(self.file_handle, dumps_binary(bandits, self.compress))
+
+    def load(self):
+        try:
+            with open(self.file_handle, "rb") as bandit_file:
+                return loads_binary(bandit_file.read())
+        except (ValueError, IOError, zlib.error):
+            return {}
+
+    load_bandit = BanditStorage.load_bandit
+
+
+class WriteBehindStorage(BanditStorage):
+    """Wraps another storage engine so that saves happen off the request path
+
+    :meth:`save` only records that the bandits have changed.  A background
+    thread writes them to the wrapped engine every ``interval`` seconds, or
+    sooner once ``max_pending`` saves have piled up.  Any outstanding
+    changes are written one last time when the interpreter exits.
+
+    :param storage: The storage engine doing the actual I/O
+    :type storage: BanditStorage
+    :param interval: Seconds between background writes
+    :type interval: float
+    :param max_pending: Number of saves that triggers an early write
+    :type max_pending: int
+    """
+
+    def __init__(self, storage, interval=5.0, max_pending=100):
+        self.storage = storage
+        self.interval = interval
+        self.max_pending = max_pending
+        self._bandits = None
+        self._events = []
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Held for the writes themselves, so that close() at exit never
+        # writes alongside the background flush
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        # Threads don't survive a fork, so pre-fork servers get a fresh
+        # flusher in every worker the first time it saves.
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="mab-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.sync()
+            except Exception:
+                # Changes were re-queued, try again next time round
+                log.exception("Write-behind flush failed")
+
+    async def asave(self, bandits):
+        # Only touches memory, no need for an executor
+        self.save(bandits)
+
+    async def async_sync(self):
+        """Awaitable :meth:`sync`, the write runs in the default executor"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.sync)
+
+    def sync(self):
+        """Write any pending changes to the wrapped storage right away
+
+        If the wrapped storage raises, whatever was not written is queued
+        again for the next sync and the error is raised.
+        """
+        with self._io_lock:
+            with self._lock:
+                bandits, pending, events = self._bandits, self._pending, self._events
+                self._pending = 0
+                self._events = []
+            written = 0
+            try:
+                for event in events:
+                    if len(event) == 2:
+                        self.storage.record_pull(*event)
+                    else:
+                        self.storage.record_reward(*event)
+                    written += 1
+                if pending and bandits is not None:
+                    self.storage.save(bandits)
+            except Exception:
+                with self._lock:
+                    self._events = events[written:] + self._events
+                    self._pending += pending
+                raise
+
+    def close(self):
+        """Final write, called automatically at interpreter shutdown"""
+        self.sync()
+
+    def flush(self):
+        with self._lock:
+            self._pending = 0
+            self._events = []
+        self.storage.flush()
+
+    def apply_pull(self, bandit_id, bandit, arm_id, context=None):
+        if self.storage.ordered_events:
+            self.storage.apply_pull(bandit_id, bandit, arm_id, context)
+        else:
+            super(WriteBehindStorage, self).apply_pull(
+                bandit_id, bandit, arm_id, context
+            )
+
+    def apply_reward(self, bandit_id, bandit, arm_id, reward, context=None):
+        if self.storage.ordered_events:
+            self.storage.apply_reward(bandit_id, bandit, arm_id, reward, context)
+        else:
+            super(WriteBehindStorage, self).apply_reward(
+                bandit_id, bandit, arm_id, reward, context
+            )
+
+    def record_pull(self, bandit_id, arm_id):
+        with self._lock:
+            self._events.append((bandit_id, arm_id))
+
+    def record_reward(self, bandit_id, arm_id, reward):
+        with self._lock:
+            self._events.append((bandit_id, arm_id, reward))
+
+    def save(self, bandits):
+        with self._lock:
+            self._bandits = bandits
+            self._pending += 1
+            pending = self._pending
+            self._ensure_thread()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def load(self):
+        return self.storage.load()
+
+    def load_bandit(self, name):
+        return self.storage.load_bandit(name)
+
+
+class JournalBanditStorage(BanditStorage):
+    """Append-only journal of pulls and rewards with periodic snapshots
+
+    Every pull and reward is appended to ``<filepath>.journal`` as one compact
+    line, so the cost of a write does not grow with the number of bandits.
+    Once ``compact_after`` entries have accumulated, or bandits or arms have
+    been added, the full state is written to ``filepath`` (atomically,
+    through a temporary file and a rename) and the journal is started afresh.  :meth:`load` replays the journal on top of
+    the last snapshot.
+
+    Journal entries carry a sequence number and the snapshot remembers the
+    last one it includes, so a crash between writing a snapshot and
+    truncating the journal does not count anything twice.  A torn final line
+    from a crash mid-append is ignored.  :meth:`apply_pull` and
+    :meth:`apply_reward` change the bandit and append the entry under the
+    same lock as snapshots, so a snapshot never holds a change whose entry
+    comes after it.
+
+    :param filepath: Path of the snapshot file
+    :param compact_after: Number of journal entries between snapshots
+    :type compact_after: int
+    """
+
+    ordered_events = True
+
+    def __init__(self, filepath, compact_after=1000):
+        self.file_handle = filepath
+        self.journal_handle = filepath + ".journal"
+        self.compact_after = compact_after
+        self._seq = 0
+        self._entries = 0
+        # Arm count of each bandit in the last snapshot, None before one
+        self._snapshot_arms = None
+        self._journal = None
+        self._lock = threading.RLock()
+
+    def _append(self, entry):
+        # Called with the lock held
+        self._seq += 1
+        if self._journal is None:
+            self._journal = open(self.journal_handle, "a")
+        self._journal.write(
+            json.dumps([self._seq] + entry, separators=(",", ":")) + "\n"
+        )
+        self._journal.flush()
+        self._entries += 1
+
+    def apply_pull(self, bandit_id, bandit, arm_id, context=None):
+        with self._lock:
+            super(JournalBanditStorage, self).apply_pull(
+                bandit_id, bandit, arm_id, context
+            )
+
+    def apply_reward(self, bandit_id, bandit, arm_id, reward, context=None):
+        with self._lock:
+            super(JournalBanditStorage, self).apply_reward(
+                bandit_id, bandit, arm_id, reward, context
+            )
+
+    def record_pull(self, bandit_id, arm_id):
+        with self._lock:
+            self._append(["p", bandit_id, arm_id])
+
+    def record_reward(self, bandit_id, arm_id, reward):
+        with self._lock:
+            self._append(["r", bandit_id, arm_id, reward])
+
+    def _compact(self, bandits):
+        snapshot = json.dumps({"seq": self._seq, "bandits": bandits}, cls=BanditEncoder)
+        _atomic_write(self.file_handle, snapshot)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_handle, "w")
+        self._entries = 0
+        self._snapshot_arms = self._arm_counts(bandits)
+
+    @staticmethod
+    def _arm_counts(bandits):
+        return dict([(name, len(bandit.arms)) for name, bandit in bandits.items()])
+
+    def save(self, bandits):
+        with self._lock:
+            # Entries for bandits or arms missing from the snapshot would be
+            # dropped on replay
+            if (
+                self._entries >= self.compact_after
+                or self._snapshot_arms != self._arm_counts(bandits)
+            ):
+                self._compact(bandits)
+
+    def flush(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            for path in (self.file_handle, self.journal_handle):
+                open(path, "w").truncate()
+            self._entries = 0
+            self._snapshot_arms = None
+
+    def _snapshot_version(self):
+        versions = []
+        for path in (self.file_handle, self.journal_handle):
+            try:
+                stat = os.stat(path)
+                versions.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                versions.append(None)
+        return tuple(versions)
+
+    def load(self):
+        try:
+            with open(self.file_handle, "r") as snapshot_file:
+                snapshot = json.loads(snapshot_file.read())
+            seq = snapshot["seq"]
+            bandits = dict(
+                [
+                    (key, flask_mab.bandits.Bandit.fromdict(value))
+                    for key, value in snapshot["bandits"].items()
+                ]
+            )
+        except (ValueError, IOError, KeyError, TypeError):
+            seq, bandits = 0, {}
+
+        replayed = 0
+        last_seq = seq
+        try:
+            with open(self.journal_handle, "r") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    last_seq = max(last_seq, entry[0])
+                    if entry[0] <= seq or entry[2] not in bandits:
+                        continue
+                    replayed += 1
+                    try:
+                        if entry[1] == "p":
+                            bandits[entry[2]].pull_arm(entry[3])
+                        else:
+                            bandits[entry[2]].reward_arm(entry[3], entry[4])
+                    except (ValueError, KeyError):
+                        pass
+        except IOError:
+            pass
+
+        with self._lock:
+            self._seq = max(self._seq, last_seq)
+            self._entries = max(self._entries, replayed)
+            if self._snapshot_arms is None and bandits:
+                self._snapshot_arms = self._arm_counts(bandits)
+        return bandits
+
+
+class CounterBanditStorage(BanditStorage):
+    """Base for engines that keep per-arm counters in a shared store
+
+    Instead of writing whole bandits, :meth:`save` sends each touched arm's
+    change since the last sync as increments, so several processes can add
+    to the same totals without overwriting each other.  Every
+    ``refresh_interval`` seconds a save also reads the combined totals back
+    into the local bandits.
+
+    Subclasses implement :meth:`_write`, :meth:`_read_totals` and
+    :meth:`_read_specs`.
+
+    :param refresh_interval: Seconds between reads of the shared totals
+    :type refresh_interval: float
+    """
+
+    #: Counters that are summed across processes, anything else in
+    #: :attr:`flask_mab.bandits.Bandit.counter_fields` is last-writer-wins
+    additive_fields = ("pulls", "reward", "a", "b")
+    #: Every counter an engine keeps per arm, with its value for a new arm
+    counter_defaults = (
+        ("pulls", 0),
+        ("reward", 0.0),
+        ("confidence", 0.0),
+        ("a", 1.0),
+        ("b", 1.0),
+    )
+
+    def __init__(self, refresh_interval=1.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._touched = set()
+        self._synced = {}
+        self._known = {}
+        self._last_refresh = 0.0
+
+    @staticmethod
+    def _counters(bandit, ind):
+        return dict(
+            [(field, getattr(bandit, field)[ind]) for field in bandit.counter_fields]
+        )
+
+    @staticmethod
+    def _spec(bandit):
+        """Everything but the per-arm counters"""
+        return dict(
+            [
+                (key, value)
+                for key, value in bandit.todict().items()
+                if key not in bandit.counter_fields
+            ]
+        )
+
+    def record_pull(self, bandit_id, arm_id):
+        with self._lock:
+            self._touched.add((bandit_id, arm_id))
+
+    def record_reward(self, bandit_id, arm_id, reward):
+        with self._lock:
+            self._touched.add((bandit_id, arm_id))
+
+    def save(self, bandits):
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            new = [
+                (name, bandit)
+                for name, bandit in bandits.items()
+                if self._known.get(name) != len(bandit.arms)
+            ]
+            updates = []
+            sent = {}
+            for name, arm_id in touched:
+                if name not in bandits or (name, arm_id) not in self._synced:
+                    continue
+                bandit = bandits[name]
+                counters = self._counters(bandit, bandit.arm_index(arm_id))
+                synced = self._synced[(name, arm_id)]
+                deltas = dict(
+                    [
+                        (field, counters[field] - synced[field])
+                        for field in self.additive_fields
+                        if field in counters
+                    ]
+                )
+                updates.append((name, arm_id, deltas, counters.get("confidence")))
+                sent[(name, arm_id)] = counters
+            try:
+                self._write(new, updates)
+            except Exception:
+                # Nothing was counted as sent, so the next save retries
+                self._touched |= touched
+                raise
+            self._synced.update(sent)
+            for name, bandit in new:
+                for ind, arm_id in enumerate(bandit.arms):
+                    self._synced.setdefault((name, arm_id), self._counters(bandit, ind))
+                self._known[name] = len(bandit.arms)
+            if time.time() - self._last_refresh >= self.refresh_interval:
+                self._last_refresh = time.time()
+                self._refresh(bandits)
+
+    def _refresh(self, bandits):
+        """Pull the shared totals into the local bandits
+
+        Changes made locally since the last write (by other threads, while
+        the write was in flight) are kept on top of the totals, and are
+        sent with the next save.
+        """
+        for name, arm_id, row in self._read_totals(list(bandits.keys())):
+            bandit = bandits.get(name)
+            if bandit is None:
+                continue
+            try:
+                ind = bandit.arm_index(arm_id)
+            except KeyError:
+                continue
+            with bandit._lock_for(ind):
+                counters = self._counters(bandit, ind)
+                synced = self._synced.get((name, arm_id), counters)
+                unsent = dict(
+                    [
+                        (field, counters[field] - synced[field])
+                        for field in self.additive_fields
+                        if field in counters
+                    ]
+                )
+                settled = not any(unsent.values())
+                for field in bandit.counter_fields:
+                    if field not in row:
+                        continue
+                    if field in unsent:
+                        getattr(bandit, field)[ind] = row[field] + unsent[field]
+                    elif settled:
+                        getattr(bandit, field)[ind] = row[field]
+                # The store now holds everything but the unsent changes
+                synced = dict(synced)
+                for field in unsent:
+                    if field in row:
+                        synced[field] = row[field]
+                self._synced[(name, arm_id)] = synced
+            bandit._counters_changed()
+
+    def load(self):
+        bandits = {}
+        with self._lock:
+            for name, spec in self._read_specs().items():
+                bandit_cls = getattr(flask_mab.bandits, spec["bandit_type"])
+                for field, _ in self.counter_defaults:
+                    if field not in bandit_cls.counter_fields:
+                        spec.pop(field, None)
+                bandit = flask_mab.bandits.Bandit.fromdict(spec)
+                for ind, arm_id in enumerate(bandit.arms):
+                    self._synced[(name, arm_id)] = self._counters(bandit, ind)
+                self._known[name] = len(bandit.arms)
+                bandits[name] = bandit
+        return bandits
+
+    def flush(self):
+        with self._lock:
+            self._clear()
+            self._synced = {}
+            self._known = {}
+            self._touched = set()
+
+    def _write(self, new, updates):
+        """Store new bandits and apply counter updates, in one batch
+
+        :param new: ``(name, bandit)`` pairs for bandits (or arms) not yet
+                    stored.  Arms already present must be left untouched.
+        :param updates: ``(name, arm_id, deltas, confidence)`` tuples
+        """
+        raise NotImplementedError
+
+    def _read_totals(self, names):
+        """Yield ``(name, arm_id, counters)`` for the arms of these bandits"""
+        raise NotImplementedError
+
+    def _read_specs(self):
+        """Return every stored bandit as a :meth:`Bandit.fromdict` spec"""
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+
+class SQLiteBanditStorage(CounterBanditStorage):
+    """SQLite storage keeping one row per arm
+
+    Pulls and rewards are applied as increments (``pulls = pulls + ?``) in a
+    single transaction per save, so several processes on one host can share a
+    database file without overwriting each other's counts.
+
+    The database runs in WAL mode and each thread reuses its own connection.
+
+    :param filepath: Path of the database file
+    :param refresh_interval: Seconds between reads of the shared totals
+    :type refresh_interval: float
+    """
+
+    def __init__(self, filepath, refresh_interval=1.0):
+        super(SQLiteBanditStorage, self).__init__(refresh_interval)
+        self.file_handle = filepath
+        self._local = threading.local()
+        self._create_tables()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.file_handle, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_tables(self):
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bandits ("
+                "name TEXT PRIMARY KEY, spec TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS arms ("
+                "bandit TEXT NOT NULL, position INTEGER NOT NULL, "
+                "arm_id TEXT NOT NULL, %s, PRIMARY KEY (bandit, arm_id))"
+                % ", ".join(
+                    "%s %s NOT NULL DEFAULT %r"
+                    % (field, "INTEGER" if field == "pulls" else "REAL", default)
+                    for field, default in self.counter_defaults
+                )
+            )
+
+    def _write(self, new, updates):
+        with self._connection() as conn:
+            for name, bandit in new:
+                spec = self._spec(bandit)
+                conn.execute(
+                    "INSERT OR REPLACE INTO bandits (name, spec) VALUES (?, ?)",
+                    (name, json.dumps(spec)),
+                )
+                for ind, arm_id in enumerate(bandit.arms):
+                    counters = self._counters(bandit, ind)
+                    conn.execute(
+                        "INSERT OR IGNORE INTO arms (bandit, position, arm_id, %s) "
+                        "VALUES (?, ?, ?, %s)"
+                        % (", ".join(counters.keys()), ", ".join("?" * len(counters))),
+                        (name, ind, json.dumps(arm_id)) + tuple(counters.values()),
+                    )
+            conn.executemany(
+                "UPDATE arms SET %s, confidence = coalesce(?, confidence) "
+                "WHERE bandit = ? AND arm_id = ?"
+                % ", ".join(
+                    "%s = %s + ?" % (field, field) for field in self.additive_fields
+                ),
+                [
+                    tuple(deltas.get(field, 0) for field in self.additive_fields)
+                    + (confidence, name, json.dumps(arm_id))
+                    for name, arm_id, deltas, confidence in updates
+                ],
+            )
+
+    def _read_totals(self, names):
+        fields = [field for field, _ in self.counter_defaults]
+        rows = self._connection().execute(
+            "SELECT bandit, arm_id, %s FROM arms" % ", ".join(fields)
+        )
+        for name, arm_json, *counters in rows:
+            yield name, json.loads(arm_json), dict(zip(fields, counters))
+
+    def _read_specs(self):
+        conn = self._connection()
+        specs = dict(
+            [
+                (name, json.loads(spec))
+                for name, spec in conn.execute("SELECT name, spec FROM bandits")
+            ]
+        )
+        fields = [field for field, _ in self.counter_defaults]
+        rows = conn.execute(
+            "SELECT bandit, arm_id, %s FROM arms ORDER BY bandit, position"
+            % ", ".join(fields)
+        )
+        for name, arm_json, *counters in rows:
+            spec = specs.get(name)
+            if spec is None or json.loads(arm_json) not in spec["arms"]:
+                continue
+            for field, value in zip(fields, counters):
+                spec.setdefault(field, []).append(value)
+        return specs
+
+    def _clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM arms")
+            conn.execute("DELETE FROM bandits")
+
+
+class RedisError(Exception):
+    """Error reply from a Redis server"""
+
+    pass
+
+
+class RedisConnection(object):
+    """Minimal Redis protocol (RESP) client, only what the storage engine
+    needs: pipelined commands over one socket.
+
+    :param host: Server host
+    :param port: Server port
+    :param db: Database number to select
+    :param timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, timeout=5.0):
+        self.closed = False
+        self._sock = socket.create_connection((host, port), timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if db:
+            self.pipeline([("SELECT", db)])
+
+    @staticmethod
+    def _encode(command):
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by Redis server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            return RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError("Unexpected reply %r" % line)
+
+    def pipeline(self, commands):
+        """Send all commands in one write and read back their replies.  The
+        connection is closed if sending or reading fails part way, as
+        unread replies would be taken for the next pipeline's.
+
+        :raises RedisError: if any command failed
+        """
+        if not commands:
+            return []
+        try:
+            self._sock.sendall(
+                b"".join([self._encode(command) for command in commands])
+            )
+            replies = [self._read_reply() for _ in commands]
+        except (OSError, RedisError):
+            self.close()
+            raise
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def close(self):
+        self.closed = True
+        self._reader.close()
+        self._sock.close()
+
+
+class RedisBanditStorage(CounterBanditStorage):
+    """Keeps arm counters in a Redis (or protocol compatible) server, for
+    deployments spread over several hosts
+
+    All the increments from a save go out as a single pipelined batch of
+    ``HINCRBY``/``HINCRBYFLOAT`` commands.  Combine with write-behind mode to
+    batch over a time window rather than per request.  The shared totals are
+    read back at most every ``refresh_interval`` seconds, during a save, so
+    suggesting arms never waits on the network.
+
+    Bandit specs live in the ``<prefix>:bandits`` hash, counters in one hash
+    per bandit, ``<prefix>:counters:<name>``, with fields like
+    ``pulls:"green"``.
+
+    :param host: Server host
+    :param port: Server port
+    :param db: Database number
+    :param prefix: Prefix for all keys
+    :param refresh_interval: Seconds between reads of the shared totals
+    :type refresh_interval: float
+    """
+
+    def __init__(
+        self, host="localhost", port=6379, db=0, prefix="mab", refresh_interval=1.0
+    ):
+        super(RedisBanditStorage, self).__init__(refresh_interval)
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed or self._local.pid != os.getpid():
+            # Reconnect after a failed pipeline (timeout, server restart)
+            conn = RedisConnection(self.host, self.port, self.db)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _counters_key(self, name):
+        return "%s:counters:%s" % (self.prefix, name)
+
+    @staticmethod
+    def _field(field, arm_id):
+        return "%s:%s" % (field, json.dumps(arm_id))
+
+    def _write(self, new, updates):
+        commands = []
+        for name, bandit in new:
+            commands.append(
+                ("HSET", self.prefix + ":bandits", name, json.dumps(self._spec(bandit)))
+            )
+            for ind, arm_id in enumerate(bandit.arms):
+                for field, value in self._counters(bandit, ind).items():
+                    commands.append(
+                        (
+                            "HSETNX",
+                            self._counters_key(name),
+                            self._field(field, arm_id),
+                            repr(value),
+                        )
+                    )
+        for name, arm_id, deltas, confidence in updates:
+            key = self._counters_key(name)
+            for field, delta in deltas.items():
+                if delta and field == "pulls":
+                    commands.append(("HINCRBY", key, self._field(field, arm_id), delta))
+                elif delta:
+                    commands.append(
+                        ("HINCRBYFLOAT", key, self._field(field, arm_id), repr(delta))
+                    )
+            if confidence is not None:
+                commands.append(
+                    ("HSET", key, self._field("confidence", arm_id), repr(confidence))
+                )
+        self._connection().pipeline(commands)
+
+    def _parse_counters(self, reply):
+        """Turn an HGETALL reply into ``{arm_id: {field: value}}``"""
+        counters = {}
+        for ind in range(0, len(reply), 2):
+            field, arm_json = reply[ind].decode().split(":", 1)
+            value = float(reply[ind + 1])
+            if field == "pulls":
+                value = int(value)
+            counters.setdefault(json.loads(arm_json), {})[field] = value
+        return counters
+
+    def _read_totals(self, names):
+        replies = self._connection().pipeline(
+            [("HGETALL", self._counters_key(name)) for name in names]
+        )
+        for name, reply in zip(names, replies):
+            for arm_id, row in self._parse_counters(reply).items():
+                yield name, arm_id, row
+
+    def _read_specs(self):
+        conn = self._connection()
+        reply = conn.pipeline([("HGETALL", self.prefix + ":bandits")])[0]
+        specs = dict(
+            [
+                (reply[ind].decode(), json.loads(reply[ind + 1]))
+                for ind in range(0, len(reply), 2)
+            ]
+        )
+        names = list(specs.keys())
+        replies = conn.pipeline(
+            [("HGETALL", self._counters_key(name)) for name in names]
+        )
+        for name, reply in zip(names, replies):
+            spec = specs[name]
+            counters = self._parse_counters(reply)
+            for field, default in self.counter_defaults:
+                spec[field] = [
+                    counters.get(arm_id, {}).get(field, default)
+                    for arm_id in spec["arms"]
+                ]
+        return specs
+
+    def _clear(self):
+        conn = self._connection()
+        names = conn.pipeline([("HKEYS", self.prefix + ":bandits")])[0]
+        conn.pipeline(
+            [("DEL", self.prefix + ":bandits")]
+            + [("DEL", self._counters_key(name.decode())) for name in names]
+        )
+
+
+def merge(snapshot_a, snapshot_b):
+    """Merge two :class:`MergeableBanditStorage` snapshots, bandit by bandit,
+    see :meth:`flask_mab.bandits.Bandit.merge`
+    """
+    merged = dict(snapshot_a)
+    for name, bandit_snapshot in snapshot_b.items():
+        if name in merged:
+            merged[name] = flask_mab.bandits.Bandit.merge(merged[name], bandit_snapshot)
+        else:
+            merged[name] = bandit_snapshot
+    return merged
+
+
+class MergeableBanditStorage(CounterBanditStorage):
+    """File storage for several nodes without a central coordinator
+
+    Every node writes its own state file, ``<directory>/<node_id>.json``,
+    holding grow-only counters per node (see
+    :meth:`flask_mab.bandits.Bandit.merge`).  A node adds its own pulls and
+    rewards to its counters only, and every ``refresh_interval`` seconds
+    merges in the files of the other nodes.  Since merging is order
+    independent, nodes converge on the same totals however the files get
+    exchanged: a shared directory, rsync, or anything else that copies the
+    files around.
+
+    Confidence is not a counter, so it is derived from the merged totals as
+    the mean reward per pull.
+
+    :param directory: Directory holding the state files
+    :param node_id: Name of this node, defaults to host name and process id.
+                    Reusing it across restarts keeps the file count down.
+    :param refresh_interval: Seconds between merges of the other nodes' files
+    :type refresh_interval: float
+    """
+
+    def __init__(self, directory, node_id=None, refresh_interval=5.0):
+        super(MergeableBanditStorage, self).__init__(refresh_interval)
+        self.directory = directory
+        self.node_id = node_id or "%s-%d" % (socket.gethostname(), os.getpid())
+        self._state = {}
+        self._mtimes = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def file_handle(self):
+        return os.path.join(self.directory, self.node_id + ".json")
+
+    def _merge_files(self):
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                if self._mtimes.get(path) == mtime:
+                    continue
+                with open(path, "r") as state_file:
+                    snapshot = json.loads(state_file.read())
+                self._mtimes[path] = mtime
+            except (ValueError, IOError, OSError):
+                continue
+            self._state = merge(self._state, snapshot)
+
+    def _write(self, new, updates):
+        for name, bandit in new:
+            spec = self._spec(bandit)
+            # A stored bandit that grew arms: its counters already include
+            # the merged increments, so only the new arms start from them
+            stored = self._state.get(name)
+            initial = dict(stored["spec"].get("initial", {})) if stored else {}
+            for ind, arm_id in enumerate(bandit.arms):
+                initial.setdefault(json.dumps(arm_id), self._counters(bandit, ind))
+            spec["initial"] = initial
+            self._state = merge(self._state, {name: {"spec": spec, "nodes": {}}})
+        if not new and not updates:
+            return
+        for name, arm_id, deltas, _ in updates:
+            own = self._state[name]["nodes"].setdefault(self.node_id, {})
+            counters = own.setdefault(json.dumps(arm_id), {})
+            for field, delta in deltas.items():
+                counters[field] = counters.get(field, 0) + delta
+
+        _atomic_write(self.file_handle, json.dumps(self._state))
+
+    def _totals(self, bandit_snapshot):
+        """``(arm_id, counters)`` pairs summed over all nodes"""
+        spec = bandit_snapshot["spec"]
+        for arm_id in spec["arms"]:
+            arm_key = json.dumps(arm_id)
+            row = dict(self.counter_defaults)
+            row.update(spec.get("initial", {}).get(arm_key, {}))
+            for arms in bandit_snapshot["nodes"].values():
+                for field, amount in arms.get(arm_key, {}).items():
+                    row[field] = row.get(field, 0) + amount
+            if row["pulls"]:
+                row["confidence"] = row["reward"] / float(row["pulls"])
+            yield arm_id, row
+
+    def _read_totals(self, names):
+        self._merge_files()
+        for name in names:
+            if name in self._state:
+                for arm_id, row in self._totals(self._state[name]):
+                    yield name, arm_id, row
+
+    def _read_specs(self):
+        self._merge_files()
+        specs = {}
+        for name, bandit_snapshot in self._state.items():
+            spec = dict(bandit_snapshot["spec"])
+            spec.pop("initial", None)
+            for arm_id, row in self._totals(bandit_snapshot):
+                for field, value in row.items():
+                    spec.setdefault(field, []).append(value)
+            specs[name] = spec
+        return specs
+
+    def _clear(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json"):
+                os.unlink(os.path.join(self.directory, filename))
+        self._state = {}
+        self._mtimes = {}
@@ -0,0 +1,105 @@
+"""
+flask_mab.trees
+~~~~~~~~~~~~~~~
+
+Binary trees over per-arm values, used by bandits with many arms so that
+changing one arm and picking an arm both take O(log arms).
+"""
+
+from array import array
+
+
+def _capacity(n):
+    size = 1
+    while size < n:
+        size *= 2
+    return size
+
+
+class SumTree(object):
+    """Sums of non-negative weights over a complete binary tree, for
+    weighted sampling
+
+    :param weights: Starting weight of each index
+    """
+
+    def __init__(self, weights):
+        self._n = len(weights)
+        self._size = _capacity(self._n)
+        self._tree = array("d", [0.0] * (2 * self._size))
+        self._tree[self._size : self._size + self._n] = array("d", weights)
+        for pos in range(self._size - 1, 0, -1):
+            self._tree[pos] = self._tree[2 * pos] + self._tree[2 * pos + 1]
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        return self._tree[self._size + index]
+
+    @property
+    def total(self):
+        return self._tree[1]
+
+    def update(self, index, weight):
+        pos = self._size + index
+        self._tree[pos] = weight
+        pos //= 2
+        while pos:
+            # Re-add rather than apply a delta, so rounding never piles up
+            self._tree[pos] = self._tree[2 * pos] + self._tree[2 * pos + 1]
+            pos //= 2
+
+    def find(self, value):
+        """First index whose cumulative weight exceeds ``value``, which
+        should be below :attr:`total`
+        """
+        pos = 1
+        while pos < self._size:
+            left = self._tree[2 * pos]
+            if value < left:
+                pos = 2 * pos
+            else:
+                value -= left
+                pos = 2 * pos + 1
+        # Rounding can walk off the end by a hair
+        return min(pos - self._size, self._n - 1)
+
+
+class MaxTree(object):
+    """Tournament tree tracking the index of the largest value, ties going
+    to the lowest index
+
+    :param values: Starting value of each index
+    """
+
+    def __init__(self, values):
+        self._n = len(values)
+        self._size = _capacity(self._n)
+        self._values = array("d", values)
+        self._winners = array("q", [0] * (2 * self._size))
+        for index in range(self._size):
+            self._winners[self._size + index] = index
+        for pos in range(self._size - 1, 0, -1):
+            self._winners[pos] = self._play(pos)
+
+    def __len__(self):
+        return self._n
+
+    def _play(self, pos):
+        left, right = self._winners[2 * pos], self._winners[2 * pos + 1]
+        if right >= self._n or (
+            left < self._n and self._values[left] >= self._values[right]
+        ):
+            return left
+        return right
+
+    def update(self, index, value):
+        self._values[index] = value
+        pos = (self._size + index) // 2
+        while pos:
+            self._winners[pos] = self._play(pos)
+            pos //= 2
+
+    def argmax(self):
+        return self._winners[1]
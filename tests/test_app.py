@@ -37,6 +37,11 @@ class MABTestCase(unittest.TestCase):
         def reward_decorated():
             return flask.make_response("awarded the arm")
 
+        @app.route("/show_btn_manual")
+        def assign_arm_manual():
+            arm_id, value = flask_mab.suggest_arm_for("color_button")
+            return flask.make_response(value)
+
         self.app = app
         self.app.config["MAB_DEBUG_HEADERS"] = True
         self.app_client = app.test_client()
@@ -45,6 +50,26 @@ class MABTestCase(unittest.TestCase):
         rv = self.app_client.get("/")
         assert "Hello".encode() in rv.data
 
+    def test_untracked_route_skipped(self):
+        self.app_client.get("/show_btn_decorated")
+        rv = self.app_client.get("/")
+        assert "Set-Cookie" not in rv.headers
+        assert "X-MAB-Debug" not in rv.headers
+        assert self.app.extensions["mab"].bandit_endpoints == {
+            "assign_arm_decorated": True,
+            "root": False,
+        }
+
+    def test_suggest_manual(self):
+        rv = self.app_client.get("/show_btn_manual")
+        assert rv.headers["X-MAB-Debug"].split(";")[0].strip() == "STORE"
+        chosen_arm = self.get_arm(rv.headers)["color_button"]
+        assert (
+            self.app.extensions["mab"].bandits["color_button"][chosen_arm]["pulls"] > 0
+        )
+        rv = self.app_client.get("/show_btn_manual")
+        assert rv.headers["X-MAB-Debug"].split(";")[0].strip() == "SAVED"
+
     def test_suggest_decorated(self):
         rv = self.app_client.get("/show_btn_decorated")
         assert parse_cookie(rv.headers["Set-Cookie"])["MAB"]
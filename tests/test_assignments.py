@@ -0,0 +1,156 @@
+import unittest
+import os
+import tempfile
+import flask
+from mock import patch
+
+from flask_mab import BanditMiddleware, choose_arm, reward_endpt, suggest_arm_for
+from flask_mab.assignments import (
+    AssignmentStore,
+    SQLiteAssignmentStorage,
+    is_visitor_id,
+    new_visitor_id,
+)
+
+from werkzeug.http import parse_cookie
+from utils import make_bandit
+
+
+class AssignmentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "assignments.db")
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def test_visitor_ids(self):
+        visitor_id = new_visitor_id()
+        assert is_visitor_id(visitor_id)
+        assert visitor_id != new_visitor_id()
+        assert not is_visitor_id('{"color_button": ["red", true]}')
+        assert not is_visitor_id("v." + "a" * 100)
+
+    def test_lru_eviction(self):
+        store = AssignmentStore(max_size=2)
+        store.set("v.one", {"color_button": ("red", True)})
+        store.set("v.two", {"color_button": ("blue", True)})
+        store.get("v.one")
+        store.set("v.three", {"color_button": ("green", True)})
+        assert len(store) == 2
+        assert store.get("v.two") is None
+        assert store.get("v.one") == {"color_button": ("red", True)}
+
+    def test_ttl(self):
+        store = AssignmentStore(SQLiteAssignmentStorage(self.path), ttl=60)
+        with patch("time.time", return_value=1000.0):
+            store.set("v.one", {"color_button": ("red", True)})
+        with patch("time.time", return_value=1059.0):
+            assert store.get("v.one") == {"color_button": ("red", True)}
+        with patch("time.time", return_value=1120.0):
+            assert store.get("v.one") is None
+
+    def test_backed_by_engine(self):
+        with patch("time.time", return_value=1000.0):
+            AssignmentStore(SQLiteAssignmentStorage(self.path)).set(
+                "v.one", {"color_button": ("red", False)}
+            )
+            store = AssignmentStore(SQLiteAssignmentStorage(self.path), max_size=1)
+            assert store.get("v.one") == {"color_button": ("red", False)}
+
+    def test_processes_share_engine(self):
+        store_a = AssignmentStore(SQLiteAssignmentStorage(self.path))
+        store_b = AssignmentStore(SQLiteAssignmentStorage(self.path))
+        with patch("time.time", return_value=1000.0):
+            store_a.set("v.one", {"color_button": ("red", True)})
+            assert store_a.get("v.one") == {"color_button": ("red", True)}
+        with patch("time.time", return_value=1001.0):
+            assert store_b.get("v.one") == {"color_button": ("red", True)}
+            store_b.set("v.one", {"color_button": ("red", False)})
+        with patch("time.time", return_value=1002.0):
+            assert store_a.get("v.one") == {"color_button": ("red", False)}
+
+    def test_refreshes_engine_copy(self):
+        storage = SQLiteAssignmentStorage(self.path)
+        store = AssignmentStore(storage, ttl=60)
+        with patch("time.time", return_value=1000.0):
+            store.set("v.one", {"color_button": ("red", True)})
+        with patch("time.time", return_value=1040.0):
+            store.get("v.one")
+        assert storage.load("v.one", 0)[1] == 1040.0
+
+    def test_expire(self):
+        storage = SQLiteAssignmentStorage(self.path)
+        store = AssignmentStore(storage, ttl=60, expire_every=2)
+        with patch("time.time", return_value=1000.0):
+            store.set("v.one", {"color_button": ("red", True)})
+        with patch("time.time", return_value=1100.0):
+            store.set("v.two", {"color_button": ("red", True)})
+        assert storage.load("v.one", 0) is None
+        assert storage.load("v.two", 0) is not None
+
+
+class AssignmentMiddlewareTest(unittest.TestCase):
+    def setUp(self):
+        app = flask.Flask("test_app")
+        app.config["MAB_ASSIGNMENT_ENGINE"] = "AssignmentStorage"
+        BanditMiddleware(app)
+        for ind in range(12):
+            app.add_bandit(
+                "exp-%d" % ind, make_bandit("EpsilonGreedyBandit", epsilon=0.1)
+            )
+
+        @app.route("/show_btn_decorated")
+        @choose_arm("exp-0")
+        @choose_arm("exp-1")
+        def assign_arm_decorated(**kwargs):
+            return "assigned"
+
+        @app.route("/everything")
+        def everything():
+            for ind in range(12):
+                suggest_arm_for("exp-%d" % ind)
+            return "assigned"
+
+        @app.route("/reward_decorated")
+        @reward_endpt("exp-0", 1.0)
+        def reward_decorated():
+            return "awarded the arm"
+
+        self.app = app
+        self.store = app.extensions["mab"].assignment_store
+        self.client = app.test_client()
+
+    def test_cookie_holds_visitor_id(self):
+        rv = self.client.get("/everything")
+        visitor_id = parse_cookie(rv.headers["Set-Cookie"])["MAB"]
+        assert is_visitor_id(visitor_id)
+        assert set(self.store.get(visitor_id)) == set(
+            self.app.extensions["mab"].bandits
+        )
+
+    def test_assignments_kept_server_side(self):
+        rv = self.client.get("/show_btn_decorated")
+        visitor_id = parse_cookie(rv.headers["Set-Cookie"])["MAB"]
+        arm_id = self.store.get(visitor_id)["exp-0"][0]
+
+        rv = self.client.get("/everything")
+        assert "Set-Cookie" not in rv.headers
+        assert len(self.store.get(visitor_id)) == 12
+        assert self.store.get(visitor_id)["exp-0"][0] == arm_id
+
+        self.client.get("/reward_decorated")
+        assert self.store.get(visitor_id)["exp-0"] == (arm_id, False)
+        assert self.app.extensions["mab"].bandits["exp-0"][arm_id]["reward"] == 1.0
+
+    def test_moves_cookie_assignments_into_store(self):
+        self.client.set_cookie("MAB", '{"exp-0": ["red", true]}')
+        rv = self.client.get("/show_btn_decorated")
+        visitor_id = parse_cookie(rv.headers["Set-Cookie"])["MAB"]
+        assert self.store.get(visitor_id)["exp-0"] == ("red", True)
+
+
+if __name__ == "__main__":
+    unittest.main()
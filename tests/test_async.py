@@ -0,0 +1,90 @@
+import unittest
+import asyncio
+import flask
+from mock import Mock
+
+from flask_mab import BanditMiddleware, choose_arm, reward_endpt
+import flask_mab.storage
+from werkzeug.http import parse_cookie
+import json
+from utils import make_bandit
+
+try:
+    import asgiref
+except ImportError:
+    asgiref = None
+
+
+@unittest.skipUnless(asgiref, "async views need flask[async]")
+class AsyncViewTest(unittest.TestCase):
+    def setUp(self):
+        app = flask.Flask("test_app")
+        BanditMiddleware(app)
+        self.bandit_a = make_bandit("EpsilonGreedyBandit", epsilon=1.0)
+        self.bandit_b = make_bandit("NaiveStochasticBandit")
+        app.add_bandit("color_button", self.bandit_a)
+        app.add_bandit("color_bg", self.bandit_b)
+
+        @app.route("/show_btn_decorated")
+        @choose_arm("color_button")
+        @choose_arm("color_bg")
+        async def assign_arm_decorated(color_button, color_bg):
+            await asyncio.sleep(0)
+            return flask.make_response("%s %s" % (color_button, color_bg))
+
+        @app.route("/reward_decorated")
+        @reward_endpt("color_button", 1.0)
+        @reward_endpt("color_bg", 1.0)
+        async def reward_decorated():
+            await asyncio.sleep(0)
+            return flask.make_response("awarded the arm")
+
+        self.app = app
+        self.app_client = app.test_client()
+
+    def test_pull_and_reward(self):
+        rv = self.app_client.get("/show_btn_decorated")
+        chosen_arms = json.loads(parse_cookie(rv.headers["Set-Cookie"])["MAB"])
+        button_arm = chosen_arms["color_button"][0]
+        bg_arm = chosen_arms["color_bg"][0]
+        assert rv.data.decode() == "%s %s" % (
+            self.bandit_a[button_arm]["value"],
+            self.bandit_b[bg_arm]["value"],
+        )
+        assert self.bandit_a[button_arm]["pulls"] == 1
+
+        self.app_client.get("/reward_decorated")
+        assert self.bandit_a[button_arm]["reward"] == 1.0
+        assert self.bandit_b[bg_arm]["reward"] == 1.0
+
+
+class AsyncStorageTest(unittest.TestCase):
+    def test_asave_runs_in_executor(self):
+        storage = flask_mab.storage.BanditStorage()
+        storage.save = Mock()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        asyncio.run(storage.asave(bandits))
+        storage.save.assert_called_once_with(bandits)
+
+    def test_aload(self):
+        storage = flask_mab.storage.BanditStorage()
+        assert asyncio.run(storage.aload()) == {}
+
+    def test_write_behind_async_sync(self):
+        storage = flask_mab.storage.WriteBehindStorage(
+            flask_mab.storage.BanditStorage(), interval=3600
+        )
+        storage.storage.save = Mock()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+
+        async def flow():
+            await storage.asave(bandits)
+            assert not storage.storage.save.called
+            await storage.async_sync()
+
+        asyncio.run(flow())
+        storage.storage.save.assert_called_once_with(bandits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,8 @@ import random
 import sys
 from collections import Counter
 
+import flask_mab.bandits
+
 
 class MonteCarloTest(unittest.TestCase):
     """Tests to ensure that over many iterations, a winner
@@ -97,3 +99,430 @@ class ThompsonBanditTest(MonteCarloTest):
     def test_bandit(self):
         results = self.run_algo(make_bandit("ThompsonBandit"), 10, 15000)
         self.assert_winner(results, "blue")
+
+
+class UCB1BanditTest(MonteCarloTest):
+    true_arm_probs = dict(green=0.01, red=0.98, blue=0.01)
+
+    def test_bandit(self):
+        results = self.run_algo(make_bandit("UCB1Bandit"), 10, 10000)
+        self.assert_winner(results, "red")
+
+
+class ArmIndexTest(unittest.TestCase):
+    def test_arm_view(self):
+        bandit = make_bandit("EpsilonGreedyBandit")
+        bandit.pull_arm("red")
+        arm = bandit["red"]
+        assert arm["id"] == arm.id == "red"
+        assert arm["value"] == "#FF0000"
+        assert arm["pulls"] == 1
+        assert dict(arm) == {"id": "red", "pulls": 1, "reward": 0.0, "value": "#FF0000"}
+        bandit.pull_arm("red")
+        assert arm["pulls"] == 2
+
+    def test_missing_arm(self):
+        bandit = make_bandit("EpsilonGreedyBandit")
+        with self.assertRaises(KeyError):
+            bandit["purple"]
+        with self.assertRaises(KeyError):
+            bandit.pull_arm("purple")
+
+    def test_fromdict_reads_plain_lists(self):
+        from flask_mab.bandits import Bandit
+
+        bandit = Bandit.fromdict(
+            {
+                "bandit_type": "EpsilonGreedyBandit",
+                "epsilon": 0.2,
+                "arms": ["a", "b"],
+                "values": [1, 2],
+                "pulls": [3, 4],
+                "reward": [1.0, 2.0],
+            }
+        )
+        assert bandit["b"]["pulls"] == 4
+        bandit.pull_arm("b")
+        assert bandit.todict()["pulls"] == [3, 5]
+        assert bandit.todict()["confidence"] == [0.0, 0.0]
+
+    def test_reindexes_replaced_arms(self):
+        bandit = make_bandit("EpsilonGreedyBandit")
+        bandit.arms = ["green", "red", "blue", "purple"]
+        assert bandit["purple"].index == 3
+
+
+class SuggestArmsTest(unittest.TestCase):
+    bandit_types = [
+        "Bandit",
+        "EpsilonGreedyBandit",
+        "NaiveStochasticBandit",
+        "SoftmaxBandit",
+        "AnnealingSoftmaxBandit",
+        "ThompsonBandit",
+        "UCB1Bandit",
+    ]
+
+    def check_batches(self):
+        for bandit_type in self.bandit_types:
+            bandit = make_bandit(bandit_type)
+            arms = bandit.suggest_arms(50)
+            assert len(arms) == 50
+            assert set(arm["id"] for arm in arms) <= set(bandit.arms)
+            assert bandit.suggest_arms(0) == []
+
+    def test_batches(self):
+        self.check_batches()
+
+    def test_batches_without_numpy(self):
+        import flask_mab.bandits
+        from mock import patch
+
+        with patch.object(flask_mab.bandits, "numpy", None):
+            self.check_batches()
+
+    def test_follows_weights(self):
+        bandit = make_bandit("EpsilonGreedyBandit", epsilon=0)
+        bandit.reward_arm("red", 1.0)
+        assert set(arm["id"] for arm in bandit.suggest_arms(100)) == {"red"}
+
+        bandit = make_bandit("NaiveStochasticBandit")
+        for arm_id in bandit.arms:
+            bandit.pull_arm(arm_id)
+        bandit.reward_arm("blue", 1.0)
+        assert set(arm["id"] for arm in bandit.suggest_arms(100)) == {"blue"}
+
+
+class AliasTableTest(unittest.TestCase):
+    def test_draws_follow_probabilities(self):
+        from flask_mab.bandits import _AliasTable
+
+        table = _AliasTable([0.5, 0.0, 0.25, 0.25])
+        draws = Counter(table.draw() for _ in range(20000))
+        assert draws[1] == 0
+        assert abs(draws[0] / 20000.0 - 0.5) < 0.03
+        assert abs(draws[2] / 20000.0 - 0.25) < 0.03
+
+    def test_naive_leftover_goes_to_first_arm(self):
+        bandit = make_bandit("NaiveStochasticBandit")
+        for arm_id in bandit.arms:
+            bandit.pull_arm(arm_id)
+            bandit.pull_arm(arm_id)
+        bandit.reward_arm("red", 1.0)
+        assert bandit._selection_probabilities() == [0.5, 0.5, 0.0]
+
+    def test_rebuilds_after_changes(self):
+        bandit = make_bandit("NaiveStochasticBandit")
+        table = bandit._alias_table()
+        assert bandit._alias_table() is table
+        bandit.pull_arm("red")
+        assert bandit._alias_table() is not table
+
+    def test_staleness_budget(self):
+        bandit = make_bandit("SoftmaxBandit", max_stale=2)
+        table = bandit._alias_table()
+        bandit.pull_arm("red")
+        bandit.reward_arm("red", 1.0)
+        bandit.reward_arm("red", 1.0)
+        assert bandit._alias_table() is table
+        bandit.reward_arm("red", 1.0)
+        assert bandit._alias_table() is not table
+
+    def test_roundtrip_keeps_budget(self):
+        from flask_mab.bandits import Bandit
+
+        bandit = make_bandit("AnnealingSoftmaxBandit", max_stale=5)
+        loaded = Bandit.fromdict(bandit.todict())
+        assert loaded.max_stale == 5
+        assert loaded.suggest_arm()["id"] in bandit.arms
+
+
+class IncrementalSoftmaxTest(unittest.TestCase):
+    def expected_weights(self, bandit, tau):
+        from math import exp
+
+        exps = [exp(x / tau) for x in bandit.confidence]
+        return [x / sum(exps) for x in exps]
+
+    def assert_close(self, actual, expected):
+        for a, b in zip(actual, expected):
+            self.assertAlmostEqual(a, b, places=9)
+
+    def test_matches_full_recompute(self):
+        bandit = make_bandit("SoftmaxBandit", tau=0.2)
+        bandit._compute_weights()
+        for _ in range(200):
+            arm_id = random.choice(bandit.arms)
+            bandit.pull_arm(arm_id)
+            if random.random() < 0.4:
+                bandit.reward_arm(arm_id, 1.0)
+        assert bandit._exps is not None
+        self.assert_close(bandit._compute_weights(), self.expected_weights(bandit, 0.2))
+
+    def test_annealing_refreshes_tau_on_schedule(self):
+        from math import log
+
+        bandit = make_bandit("AnnealingSoftmaxBandit")
+        bandit._compute_weights()
+        for _ in range(500):
+            bandit.pull_arm("red")
+        bandit.reward_arm("red", 1.0)
+        assert 495 <= bandit._tau_pulls <= 500
+        assert bandit.tau == 1 / log(bandit._tau_pulls + 1 + 0.0000001)
+        self.assert_close(
+            bandit._compute_weights(), self.expected_weights(bandit, bandit.tau)
+        )
+        tau = bandit.tau
+        bandit._tau_pulls = 500
+        bandit._total_pulls = 500
+        bandit.pull_arm("red")
+        assert bandit.tau == tau
+        for _ in range(4):
+            bandit.pull_arm("red")
+        assert bandit.tau == 1 / log(505 + 1 + 0.0000001)
+
+    def test_large_confidence_does_not_overflow(self):
+        bandit = make_bandit("SoftmaxBandit", tau=0.1)
+        bandit._compute_weights()
+        bandit.pull_arm("green")
+        bandit.reward_arm("green", 500.0)
+        weights = bandit._compute_weights()
+        self.assertAlmostEqual(weights[0], 1.0)
+
+
+class ThompsonPosteriorTest(unittest.TestCase):
+    def test_posteriors_are_per_bandit(self):
+        first = make_bandit("ThompsonBandit")
+        second = make_bandit("ThompsonBandit", prior=(2.0, 3.0))
+        first.reward_arm("red", 1.0)
+        assert list(first.a) == [1.0, 2.0, 1.0]
+        assert list(second.a) == [2.0, 2.0, 2.0]
+        assert list(second.b) == [3.0, 3.0, 3.0]
+
+    def test_posteriors_are_serialized(self):
+        import json
+        from flask_mab.bandits import Bandit
+        from flask_mab.storage import BanditEncoder
+
+        bandit = make_bandit("ThompsonBandit", prior=(2.0, 1.0))
+        bandit.pull_arm("blue")
+        bandit.reward_arm("blue", 1.0)
+        spec = json.loads(json.dumps(bandit, cls=BanditEncoder))
+        assert spec["a"] == [2.0, 2.0, 3.0]
+        loaded = Bandit.fromdict(spec)
+        assert list(loaded.a) == [2.0, 2.0, 3.0]
+        assert loaded.prior == [2.0, 1.0]
+
+    def test_old_snapshots_rebuild_posteriors(self):
+        from flask_mab.bandits import Bandit
+
+        loaded = Bandit.fromdict(
+            {
+                "bandit_type": "ThompsonBandit",
+                "arms": ["a", "b"],
+                "values": [1, 2],
+                "pulls": [5, 5],
+                "reward": [3.0, 0.0],
+            }
+        )
+        assert list(loaded.a) == [4.0, 1.0]
+        assert list(loaded.b) == [1.0, 1.0]
+
+    def test_sample_buffer(self):
+        bandit = make_bandit("ThompsonBandit", sample_buffer=10)
+        bandit.suggest_arm()
+        assert len(bandit._buffer) == 9
+        bandit.pull_arm("red")
+        bandit.suggest_arm()
+        assert len(bandit._buffer) == 8
+        bandit.reward_arm("red", 1.0)
+        bandit.suggest_arm()
+        assert len(bandit._buffer) == 9
+
+    def test_sample_buffer_without_numpy(self):
+        import flask_mab.bandits
+        from mock import patch
+
+        with patch.object(flask_mab.bandits, "numpy", None):
+            bandit = make_bandit("ThompsonBandit", sample_buffer=5)
+            assert bandit.suggest_arm()["id"] in bandit.arms
+            assert len(bandit._buffer) == 4
+
+
+class IncrementalArgmaxTest(unittest.TestCase):
+    def exercise(self, bandit, check, steps=3000):
+        for arm in range(100):
+            bandit.add_arm("arm-%d" % arm, arm)
+        for _ in range(steps):
+            arm_id = random.choice(bandit.arms)
+            bandit.pull_arm(arm_id)
+            if random.random() < 0.5:
+                bandit.reward_arm(arm_id, random.choice([0.0, 0.5, 1.0]))
+            check(bandit)
+
+    def test_epsilon_greedy_tracks_leader(self):
+        from flask_mab.bandits import EpsilonGreedyBandit
+
+        def check(bandit):
+            confidence = list(bandit.confidence)
+            assert bandit._ind_max() == confidence.index(max(confidence))
+
+        self.exercise(EpsilonGreedyBandit(), check)
+
+    def test_ucb1_matches_full_scan(self):
+        from math import log, sqrt
+        from flask_mab.bandits import UCB1Bandit
+
+        def check(bandit):
+            total = max(sum(bandit.pulls), 1)
+            bounds = [
+                (
+                    bandit.reward[ind] / n + sqrt(2 * log(total) / n)
+                    if n
+                    else float("inf")
+                )
+                for ind, n in enumerate(bandit.pulls)
+            ]
+            assert bandit._ind_max() == bounds.index(max(bounds))
+
+        self.exercise(UCB1Bandit(), check)
+
+    def test_ucb1_tries_every_arm_first(self):
+        bandit = make_bandit("UCB1Bandit")
+        seen = []
+        for _ in range(3):
+            arm = bandit.suggest_arm()
+            seen.append(arm["id"])
+            bandit.pull_arm(arm["id"])
+        assert seen == ["green", "red", "blue"]
+
+
+class LinUCBTest(unittest.TestCase):
+    def make_linucb(self):
+        from flask_mab.bandits import LinUCBBandit
+
+        bandit = LinUCBBandit(2, alpha=0.5)
+        bandit.add_arm("mobile", "m")
+        bandit.add_arm("desktop", "d")
+        return bandit
+
+    def train(self, bandit):
+        for _ in range(200):
+            for context, winner in (([1.0, 0.0], "mobile"), ([0.0, 1.0], "desktop")):
+                arm = bandit.suggest_arm(context)
+                bandit.pull_arm(arm["id"], context)
+                if arm["id"] == winner:
+                    bandit.reward_arm(arm["id"], 1.0, context)
+
+    @unittest.skipIf(flask_mab.bandits.numpy is None, "needs NumPy")
+    def test_rank_one_updates_match_inverse(self):
+        import numpy
+
+        bandit = self.make_linucb()
+        design = numpy.eye(2)
+        for context in ([1.0, 2.0], [0.5, -1.0], [3.0, 0.0]):
+            bandit.pull_arm("mobile", context)
+            design += numpy.outer(context, context)
+        numpy.testing.assert_allclose(bandit._a_inv[0], numpy.linalg.inv(design))
+        numpy.testing.assert_allclose(bandit._a_inv[1], numpy.eye(2))
+
+    def test_learns_per_context(self):
+        bandit = self.make_linucb()
+        self.train(bandit)
+        assert bandit.suggest_arm([1.0, 0.0])["id"] == "mobile"
+        assert bandit.suggest_arm([0.0, 1.0])["id"] == "desktop"
+
+    def test_without_numpy(self):
+        import flask_mab.bandits
+        from mock import patch
+
+        with patch.object(flask_mab.bandits, "numpy", None):
+            bandit = self.make_linucb()
+            self.train(bandit)
+            assert bandit.suggest_arm([1.0, 0.0])["id"] == "mobile"
+            assert bandit.suggest_arm([0.0, 1.0])["id"] == "desktop"
+
+    def test_roundtrip(self):
+        import json
+        from flask_mab.bandits import Bandit
+        from flask_mab.storage import BanditEncoder
+
+        bandit = self.make_linucb()
+        self.train(bandit)
+        loaded = Bandit.fromdict(json.loads(json.dumps(bandit, cls=BanditEncoder)))
+        assert loaded.dimensions == 2
+        assert list(loaded.scores([1.0, 0.0])) == list(bandit.scores([1.0, 0.0]))
+
+    def test_wrong_dimensions(self):
+        bandit = self.make_linucb()
+        with self.assertRaises(ValueError):
+            bandit.suggest_arm([1.0, 0.0, 0.0])
+
+
+class ForgettingBanditTest(unittest.TestCase):
+    bandit_types = [
+        ("SlidingWindowEpsilonGreedyBandit", {"epsilon": 0.1, "window": 200}),
+        ("DiscountedEpsilonGreedyBandit", {"epsilon": 0.1, "discount": 0.98}),
+        ("SlidingWindowUCBBandit", {"window": 200}),
+        ("DiscountedUCBBandit", {"discount": 0.98}),
+        ("SlidingWindowThompsonBandit", {"window": 200}),
+        ("DiscountedThompsonBandit", {"discount": 0.98}),
+    ]
+
+    def play(self, bandit, winner, rounds):
+        for _ in range(rounds):
+            arm = bandit.suggest_arm()
+            bandit.pull_arm(arm["id"])
+            if arm["id"] == winner:
+                bandit.reward_arm(arm["id"], 1.0)
+
+    def test_follows_a_shift(self):
+        for bandit_type, kwargs in self.bandit_types:
+            bandit = make_bandit(bandit_type, **kwargs)
+            self.play(bandit, "green", 2000)
+            self.play(bandit, "blue", 1000)
+            chosen = Counter(bandit.suggest_arm()["id"] for _ in range(100))
+            assert chosen.most_common(1)[0][0] == "blue", (bandit_type, chosen)
+
+    def test_window_evicts(self):
+        bandit = make_bandit("SlidingWindowEpsilonGreedyBandit", window=3)
+        for arm_id in ("green", "green", "red", "blue"):
+            bandit.pull_arm(arm_id)
+        bandit.reward_arm("green", 1.0)
+        pulls, reward, total = bandit._stats()
+        assert pulls == [1.0, 1.0, 1.0]
+        assert reward == [1.0, 0.0, 0.0]
+        assert total == 3
+        assert len(bandit._slot_arm) == 3
+        bandit.pull_arm("red")
+        assert bandit._stats()[:2] == ([0.0, 2.0, 1.0], [0.0, 0.0, 0.0])
+        bandit.reward_arm("green", 1.0)
+        assert bandit._stats()[1] == [0.0, 0.0, 0.0]
+        assert list(bandit.reward) == [2.0, 0.0, 0.0]
+
+    def test_discounted_stats(self):
+        bandit = make_bandit("DiscountedUCBBandit", discount=0.5)
+        bandit.pull_arm("green")
+        bandit.reward_arm("green", 1.0)
+        bandit.pull_arm("red")
+        bandit.pull_arm("red")
+        pulls, reward, total = bandit._stats()
+        assert pulls == [0.25, 1.5, 0.0]
+        assert reward == [0.25, 0.0, 0.0]
+        assert total == 1.75
+
+    def test_roundtrip(self):
+        import json
+        from flask_mab.bandits import Bandit
+        from flask_mab.storage import BanditEncoder
+
+        for bandit_type, kwargs in self.bandit_types:
+            bandit = make_bandit(bandit_type, **kwargs)
+            self.play(bandit, "red", 500)
+            loaded = Bandit.fromdict(json.loads(json.dumps(bandit, cls=BanditEncoder)))
+            for ours, theirs in zip(bandit._stats(), loaded._stats()):
+                if isinstance(ours, list):
+                    for a, b in zip(ours, theirs):
+                        self.assertAlmostEqual(a, b)
+                else:
+                    self.assertAlmostEqual(ours, theirs)
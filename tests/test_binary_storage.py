@@ -0,0 +1,58 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import flask_mab.storage
+from utils import make_bandit
+
+
+class BinarySnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bandits = {
+            "color_button": make_bandit("EpsilonGreedyBandit", epsilon=0.3),
+            "color_bg": make_bandit("SoftmaxBandit", tau=0.2),
+        }
+        self.bandits["color_button"].pull_arm("red")
+        self.bandits["color_button"].reward_arm("red", 0.5)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assert_same(self, loaded):
+        assert sorted(loaded.keys()) == sorted(self.bandits.keys())
+        for name, bandit in self.bandits.items():
+            assert loaded[name].todict() == bandit.todict()
+
+    def test_round_trip(self):
+        for compress in (False, True):
+            data = flask_mab.storage.dumps_binary(self.bandits, compress)
+            assert data.startswith(b"MABB")
+            self.assert_same(flask_mab.storage.loads_binary(data))
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            flask_mab.storage.loads_binary(b'{"color_button": {}}')
+        data = flask_mab.storage.dumps_binary(self.bandits)
+        with self.assertRaises(ValueError):
+            flask_mab.storage.loads_binary(data[:-4])
+
+    def test_storage(self):
+        path = os.path.join(self.tmpdir, "bandits.bin")
+        storage = flask_mab.storage.BinaryBanditStorage(path)
+        assert storage.load() == {}
+        storage.save(self.bandits)
+        self.assert_same(flask_mab.storage.BinaryBanditStorage(path).load())
+
+    def test_convert_json_snapshot(self):
+        json_path = os.path.join(self.tmpdir, "bandits.json")
+        binary_path = os.path.join(self.tmpdir, "bandits.bin")
+        flask_mab.storage.JSONBanditStorage(json_path).save(self.bandits)
+        flask_mab.storage.convert_json_snapshot(json_path, binary_path)
+        self.assert_same(flask_mab.storage.BinaryBanditStorage(binary_path).load())
+        assert os.path.getsize(binary_path) < os.path.getsize(json_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
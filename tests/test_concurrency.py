@@ -0,0 +1,54 @@
+import unittest
+import sys
+import threading
+
+from utils import make_bandit
+
+
+class StripedLockingTest(unittest.TestCase):
+    """Hammer one bandit from many threads and check no update is lost"""
+
+    bandit_types = [
+        ("Bandit", {}),
+        ("EpsilonGreedyBandit", {"epsilon": 0.1}),
+        ("NaiveStochasticBandit", {}),
+        ("SoftmaxBandit", {"tau": 0.1}),
+        ("AnnealingSoftmaxBandit", {}),
+        ("ThompsonBandit", {}),
+    ]
+    threads = 8
+    iterations = 2000
+
+    def setUp(self):
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def hammer(self, bandit):
+        def work():
+            for _ in range(self.iterations):
+                bandit.pull_arm("green")
+                bandit.reward_arm("green", 1.0)
+
+        workers = [threading.Thread(target=work) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_exact_counts(self):
+        total = self.threads * self.iterations
+        for bandit_type, kwargs in self.bandit_types:
+            bandit = make_bandit(bandit_type, **kwargs)
+            self.hammer(bandit)
+            assert bandit["green"]["pulls"] == total, bandit_type
+            assert bandit["green"]["reward"] == total, bandit_type
+            # The running mean depends on how pulls and rewards interleave,
+            # so it is only close to 1 rather than exact
+            self.assertAlmostEqual(bandit.confidence[0], 1.0, 2, bandit_type)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import flask
+
+from flask_mab import BanditMiddleware, choose_arm, reward_endpt, suggest_arm_for
+from flask_mab.bandits import LinUCBBandit
+
+
+class ContextTest(unittest.TestCase):
+    def setUp(self):
+        app = flask.Flask("test_app")
+        BanditMiddleware(app)
+        self.bandit = LinUCBBandit(2)
+        self.bandit.add_arm("short", "Sign up")
+        self.bandit.add_arm("long", "Create your free account")
+        app.add_bandit("headline", self.bandit)
+
+        def device():
+            if flask.request.args.get("mobile"):
+                return [1.0, 0.0]
+            return [0.0, 1.0]
+
+        @app.route("/")
+        @choose_arm("headline", context=device)
+        def home(headline):
+            return headline
+
+        @app.route("/manual")
+        def manual():
+            arm_id, value = suggest_arm_for("headline", [1.0, 0.0])
+            return value
+
+        @app.route("/signup")
+        @reward_endpt("headline", 1.0, context=device)
+        def signup():
+            return "thanks"
+
+        self.app = app
+        self.client = app.test_client()
+
+    def test_pull_and_reward_carry_context(self):
+        arm_id = self.client.get("/?mobile=1").headers["X-MAB-Debug"].split(":")[1]
+        ind = self.bandit.arm_index(arm_id)
+        assert self.bandit._get_state("a_inv")[ind][0] == 0.5
+        self.client.get("/signup?mobile=1")
+        assert self.bandit._get_state("b_vec")[ind] == [1.0, 0.0]
+        assert self.bandit.reward[ind] == 1.0
+
+    def test_suggest_arm_for_context(self):
+        self.client.get("/manual")
+        assert sum(self.bandit.pulls) == 1
+        a_inv = self.bandit._get_state("a_inv")
+        assert sorted(arm_a_inv[0] for arm_a_inv in a_inv) == [0.5, 1.0]
@@ -0,0 +1,149 @@
+import unittest
+import json
+import flask
+
+from flask_mab import BanditMiddleware, MABConfigException, choose_arm, reward_endpt
+from flask_mab.cookies import CookieCodec
+
+from werkzeug.http import parse_cookie
+from utils import make_bandit
+
+
+class CookieCodecTest(unittest.TestCase):
+    def setUp(self):
+        self.bandits = dict(
+            [
+                ("exp-%d" % ind, make_bandit("EpsilonGreedyBandit", epsilon=0.1))
+                for ind in range(12)
+            ]
+        )
+        self.assignments = dict(
+            [(name, ("blue", ind % 2 == 0)) for ind, name in enumerate(self.bandits)]
+        )
+
+    def test_compact_round_trip(self):
+        codec = CookieCodec(self.bandits, "compact")
+        value = codec.encode(self.assignments)
+        assert codec.decode(value) == self.assignments
+        assert len(value) < len(json.dumps(self.assignments)) / 3
+
+    def test_reads_either_encoding(self):
+        json_codec = CookieCodec(self.bandits, "json")
+        compact_codec = CookieCodec(self.bandits, "compact")
+        for value in (
+            json_codec.encode(self.assignments),
+            compact_codec.encode(self.assignments),
+        ):
+            assert json_codec.decode(value) == self.assignments
+            assert compact_codec.decode(value) == self.assignments
+        assert compact_codec.needs_rewrite(json_codec.encode(self.assignments))
+        assert not compact_codec.needs_rewrite(compact_codec.encode(self.assignments))
+
+    def test_compact_drops_missing_experiments(self):
+        codec = CookieCodec(self.bandits, "compact")
+        value = codec.encode(self.assignments)
+        del self.bandits["exp-3"]
+        codec.refresh()
+        expected = dict(self.assignments)
+        del expected["exp-3"]
+        assert codec.decode(value) == expected
+
+    def test_compact_garbage(self):
+        codec = CookieCodec(self.bandits, "compact")
+        assert codec.decode("not base64!") == {}
+        assert codec.decode("AAAA") == {}
+        value = codec.encode(self.assignments)
+        assert len(codec.decode(value[:-3])) == len(self.assignments) - 1
+
+    def test_parse_cache(self):
+        codec = CookieCodec(self.bandits, "compact")
+        value = codec.encode(self.assignments)
+        first = codec.decode(value)
+        first["exp-0"] = ("red", False)
+        assert codec.decode(value) == self.assignments
+        assert codec._parse.cache_info().hits == 1
+
+    def test_add_experiment(self):
+        codec = CookieCodec(self.bandits, "compact")
+        self.bandits["exp-12"] = make_bandit("EpsilonGreedyBandit", epsilon=0.1)
+        value = codec.encode({"exp-12": ("red", True)})
+        assert codec.decode(value) == {}
+        codec.add("exp-12")
+        assert codec.decode(value) == {"exp-12": ("red", True)}
+        # Names with the same CRC32
+        codec.add("exp-29685295")
+        with self.assertRaises(ValueError):
+            codec.add("exp-32060020")
+
+
+class CookieMiddlewareTest(unittest.TestCase):
+    def make_app(self, encoding):
+        app = flask.Flask("test_app")
+        app.config["MAB_COOKIE_ENCODING"] = encoding
+        BanditMiddleware(app)
+        app.add_bandit("color_button", make_bandit("EpsilonGreedyBandit", epsilon=0.1))
+
+        @app.route("/show_btn_decorated")
+        @choose_arm("color_button")
+        def assign_arm_decorated(color_button):
+            return color_button
+
+        @app.route("/reward_decorated")
+        @reward_endpt("color_button", 1.0)
+        def reward_decorated():
+            return "awarded the arm"
+
+        return app
+
+    def test_cookie_only_set_on_change(self):
+        for encoding in ("json", "compact"):
+            client = self.make_app(encoding).test_client()
+            assert "Set-Cookie" in client.get("/show_btn_decorated").headers
+            assert "Set-Cookie" not in client.get("/show_btn_decorated").headers
+            assert "Set-Cookie" in client.get("/reward_decorated").headers
+            assert "Set-Cookie" not in client.get("/reward_decorated").headers
+
+    def test_compact_flow(self):
+        app = self.make_app("compact")
+        client = app.test_client()
+        rv = client.get("/show_btn_decorated")
+        assigned = app.extensions["mab"].cookie_codec.decode(
+            parse_cookie(rv.headers["Set-Cookie"])["MAB"]
+        )
+        arm_id = assigned["color_button"][0]
+        assert client.get("/show_btn_decorated").headers["X-MAB-Debug"] == (
+            "SAVED; color_button:%s" % arm_id
+        )
+        client.get("/reward_decorated")
+        assert app.extensions["mab"].bandits["color_button"][arm_id]["reward"] == 1.0
+
+    def test_migrates_json_cookie(self):
+        app = self.make_app("compact")
+        client = app.test_client()
+        client.set_cookie("MAB", '{"color_button": ["red", true]}')
+        rv = client.get("/show_btn_decorated")
+        assert rv.data == b"#FF0000"
+        value = parse_cookie(rv.headers["Set-Cookie"])["MAB"]
+        assert not value.startswith("{")
+        assert app.extensions["mab"].cookie_codec.decode(value) == {
+            "color_button": ("red", True)
+        }
+
+    def test_colliding_experiment(self):
+        app = self.make_app("compact")
+        app.add_bandit("exp-29685295", make_bandit("EpsilonGreedyBandit", epsilon=0.1))
+        with self.assertRaises(MABConfigException):
+            app.add_bandit(
+                "exp-32060020", make_bandit("EpsilonGreedyBandit", epsilon=0.1)
+            )
+        assert "exp-32060020" not in app.extensions["mab"].bandits
+
+    def test_unknown_encoding(self):
+        app = flask.Flask("test_app")
+        app.config["MAB_COOKIE_ENCODING"] = "xml"
+        with self.assertRaises(MABConfigException):
+            BanditMiddleware(app)
+
+
+if __name__ == "__main__":
+    unittest.main()
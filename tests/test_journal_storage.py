@@ -0,0 +1,127 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from mock import patch
+
+import flask_mab.storage
+from utils import make_bandit
+
+
+class JournalStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "bandits.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def storage(self, **kwargs):
+        return flask_mab.storage.JournalBanditStorage(self.path, **kwargs)
+
+    def play(self, storage, bandits, name, arm, reward=None):
+        bandits[name].pull_arm(arm)
+        storage.record_pull(name, arm)
+        if reward is not None:
+            bandits[name].reward_arm(arm, reward)
+            storage.record_reward(name, arm, reward)
+        storage.save(bandits)
+
+    def test_replays_journal_over_snapshot(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        self.play(storage, bandits, "color_button", "green", 1.0)
+        self.play(storage, bandits, "color_button", "red")
+        self.play(storage, bandits, "color_button", "green", 0.5)
+
+        loaded = self.storage().load()["color_button"]
+        assert loaded.pulls == bandits["color_button"].pulls
+        assert loaded.reward == bandits["color_button"].reward
+        assert loaded.confidence == bandits["color_button"].confidence
+
+    def test_compaction_truncates_journal(self):
+        storage = self.storage(compact_after=3)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.save(bandits)
+        for _ in range(2):
+            self.play(storage, bandits, "color_button", "blue")
+        assert os.path.getsize(self.path + ".journal") > 0
+        self.play(storage, bandits, "color_button", "blue")
+        assert os.path.getsize(self.path + ".journal") == 0
+        loaded = self.storage().load()["color_button"]
+        assert loaded["blue"]["pulls"] == 3
+
+    def test_entries_already_in_snapshot_are_skipped(self):
+        storage = self.storage(compact_after=2)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.save(bandits)
+        self.play(storage, bandits, "color_button", "blue")
+        with open(self.path + ".journal") as journal:
+            stale_journal = journal.read()
+        self.play(storage, bandits, "color_button", "blue")
+        # Simulate a crash after the snapshot rename but before truncation
+        with open(self.path + ".journal", "w") as journal:
+            journal.write(stale_journal)
+        assert self.storage().load()["color_button"]["blue"]["pulls"] == 2
+
+    def test_compaction_during_pull(self):
+        storage = self.storage()
+        bandit = make_bandit("EpsilonGreedyBandit")
+        bandits = {"color_button": bandit}
+        storage.save(bandits)
+        pull_arm = type(bandit).pull_arm
+        compactors = []
+
+        def pull_then_compact(self, arm_id):
+            pull_arm(self, arm_id)
+            # Another request compacts before this pull is journaled
+            storage._snapshot_arms = None
+            compactor = threading.Thread(target=storage.save, args=(bandits,))
+            compactor.start()
+            compactor.join(0.2)
+            compactors.append(compactor)
+
+        with patch.object(type(bandit), "pull_arm", pull_then_compact):
+            storage.apply_pull("color_button", bandit, "red")
+        compactors[0].join()
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 1
+
+    def test_write_behind_does_not_buffer(self):
+        storage = flask_mab.storage.WriteBehindStorage(self.storage(), 3600)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.apply_pull("color_button", bandits["color_button"], "red")
+        storage.save(bandits)
+        assert storage._events == []
+        storage.sync()
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 1
+
+    def test_added_arm_kept(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        self.play(storage, bandits, "color_button", "red")
+        bandits["color_button"].add_arm("yellow", "#FFFF00")
+        for _ in range(5):
+            self.play(storage, bandits, "color_button", "yellow")
+        loaded = self.storage().load()["color_button"]
+        assert loaded["yellow"]["pulls"] == 5
+        assert loaded["red"]["pulls"] == 1
+
+    def test_torn_line_ignored(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        self.play(storage, bandits, "color_button", "red")
+        with open(self.path + ".journal", "a") as journal:
+            journal.write('[99,"p","color_bu')
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 1
+
+    def test_flush(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        self.play(storage, bandits, "color_button", "red")
+        storage.flush()
+        assert self.storage().load() == {}
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+import flask
+from mock import patch
+
+from flask_mab import BanditMiddleware
+import flask_mab.storage
+from flask_mab.bandits import Bandit
+from utils import make_bandit
+
+
+class LoadBanditTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "bandits.json")
+        self.saved = dict(
+            [
+                ("experiment_%d" % ind, make_bandit("EpsilonGreedyBandit"))
+                for ind in range(5)
+            ]
+        )
+        self.saved["experiment_0"].pull_arm("red")
+        flask_mab.storage.JSONBanditStorage(self.path).save(self.saved)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_startup_reads_storage_once(self):
+        app = flask.Flask("test_app")
+        app.config["MAB_STORAGE_ENGINE"] = "JSONBanditStorage"
+        app.config["MAB_STORAGE_OPTS"] = (self.path,)
+        BanditMiddleware(app)
+        with patch("json.loads", wraps=flask_mab.storage.json.loads) as loads:
+            with patch.object(Bandit, "fromdict", wraps=Bandit.fromdict) as fromdict:
+                app.add_bandit("experiment_0", make_bandit("EpsilonGreedyBandit"))
+                app.add_bandit("experiment_1", make_bandit("EpsilonGreedyBandit"))
+                app.add_bandit("unsaved", make_bandit("EpsilonGreedyBandit"))
+        assert loads.call_count == 1
+        assert fromdict.call_count == 2
+        assert app.extensions["mab"].bandits["experiment_0"]["red"]["pulls"] == 1
+
+    def test_bandits_do_not_share_cached_state(self):
+        storage = flask_mab.storage.JSONBanditStorage(self.path)
+        first = storage.load_bandit("experiment_0")
+        first.pull_arm("red")
+        assert storage.load_bandit("experiment_0")["red"]["pulls"] == 1
+
+    def test_cache_invalidated_when_file_changes(self):
+        storage = flask_mab.storage.JSONBanditStorage(self.path)
+        assert storage.load_bandit("experiment_0")["red"]["pulls"] == 1
+        self.saved["experiment_0"].pull_arm("red")
+        time.sleep(0.01)
+        flask_mab.storage.JSONBanditStorage(self.path).save(self.saved)
+        assert storage.load_bandit("experiment_0")["red"]["pulls"] == 2
+
+    def test_base_storage_loads_once(self):
+        storage = flask_mab.storage.BinaryBanditStorage(
+            os.path.join(self.tmpdir, "bandits.bin")
+        )
+        storage.save(self.saved)
+        with patch.object(storage, "load", wraps=storage.load) as load:
+            for name in self.saved:
+                assert storage.load_bandit(name) is not None
+            assert storage.load_bandit("unsaved") is None
+        assert load.call_count == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
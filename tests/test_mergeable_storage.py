@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+import flask_mab.storage
+from flask_mab.bandits import Bandit
+from utils import make_bandit
+
+
+def run_node(directory, node_id, times):
+    storage = flask_mab.storage.MergeableBanditStorage(directory, node_id)
+    bandits = storage.load()
+    for _ in range(times):
+        bandits["color_button"].pull_arm("green")
+        storage.record_pull("color_button", "green")
+        bandits["color_button"].reward_arm("green", 1.0)
+        storage.record_reward("color_button", "green", 1.0)
+        storage.save(bandits)
+
+
+class MergeTest(unittest.TestCase):
+    spec = {"arms": ["green"], "values": [None], "bandit_type": "Bandit"}
+
+    def snapshot(self, nodes, spec=None):
+        return {"spec": spec or self.spec, "nodes": nodes}
+
+    def test_merge_takes_max_per_node(self):
+        a = self.snapshot(
+            {"a": {'"green"': {"pulls": 3}}, "b": {'"green"': {"pulls": 1}}}
+        )
+        b = self.snapshot({"b": {'"green"': {"pulls": 2}}})
+        merged = Bandit.merge(a, b)
+        assert merged["nodes"] == {
+            "a": {'"green"': {"pulls": 3}},
+            "b": {'"green"': {"pulls": 2}},
+        }
+
+    def test_merge_is_commutative_and_idempotent(self):
+        bigger = dict(self.spec, arms=["green", "red"], values=[None, None])
+        a = self.snapshot({"a": {'"green"': {"pulls": 3}}})
+        b = self.snapshot({"b": {'"red"': {"reward": 1.0}}}, bigger)
+        assert Bandit.merge(a, b) == Bandit.merge(b, a)
+        assert Bandit.merge(Bandit.merge(a, b), b) == Bandit.merge(a, b)
+        assert Bandit.merge(a, b)["spec"] == bigger
+
+    def test_storage_merge(self):
+        a = {"x": self.snapshot({"a": {'"green"': {"pulls": 1}}})}
+        b = {"y": self.snapshot({"b": {'"green"': {"pulls": 1}}})}
+        assert sorted(flask_mab.storage.merge(a, b).keys()) == ["x", "y"]
+
+
+class MergeableStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def storage(self, node_id, **kwargs):
+        return flask_mab.storage.MergeableBanditStorage(self.tmpdir, node_id, **kwargs)
+
+    def test_nodes_write_separate_files(self):
+        self.storage("seed").save({"color_button": make_bandit("EpsilonGreedyBandit")})
+        ctx = multiprocessing.get_context("fork")
+        nodes = [
+            ctx.Process(target=run_node, args=(self.tmpdir, "node-%d" % i, 50))
+            for i in range(3)
+        ]
+        for node in nodes:
+            node.start()
+        for node in nodes:
+            node.join()
+
+        files = sorted(os.listdir(self.tmpdir))
+        assert files == ["node-0.json", "node-1.json", "node-2.json", "seed.json"]
+        loaded = self.storage("reader").load()["color_button"]
+        assert loaded["green"]["pulls"] == 150
+        assert loaded["green"]["reward"] == 150.0
+        assert loaded.confidence[0] == 1.0
+
+    def test_nodes_converge(self):
+        node_a, node_b = self.storage("a"), self.storage("b")
+        node_a.save({"color_button": make_bandit("EpsilonGreedyBandit")})
+        bandits_a, bandits_b = node_a.load(), node_b.load()
+
+        bandits_a["color_button"].pull_arm("red")
+        node_a.record_pull("color_button", "red")
+        node_a.save(bandits_a)
+        bandits_b["color_button"].pull_arm("red")
+        node_b.record_pull("color_button", "red")
+        node_b.save(bandits_b)
+        node_a._last_refresh = 0
+        node_a.save(bandits_a)
+
+        assert bandits_a["color_button"]["red"]["pulls"] == 2
+        assert bandits_b["color_button"]["red"]["pulls"] == 2
+
+    def test_added_arm_not_double_counted(self):
+        node = self.storage("a")
+        bandits = {"color_button": Bandit()}
+        bandits["color_button"].add_arm("x")
+        node.save(bandits)
+        for _ in range(10):
+            bandits["color_button"].pull_arm("x")
+            node.record_pull("color_button", "x")
+        node.save(bandits)
+        bandits["color_button"].add_arm("y")
+        node.save(bandits)
+
+        loaded = self.storage("b").load()["color_button"]
+        assert list(loaded.pulls) == [10, 0]
+
+
+if __name__ == "__main__":
+    unittest.main()
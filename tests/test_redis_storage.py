@@ -0,0 +1,119 @@
+import unittest
+import socket
+import time
+
+import flask_mab.storage
+from utils import make_bandit, FakeRedisServer
+
+
+class RedisStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRedisServer()
+
+    def tearDown(self):
+        self.server.close()
+
+    def storage(self, **kwargs):
+        return flask_mab.storage.RedisBanditStorage(
+            "127.0.0.1", self.server.port, **kwargs
+        )
+
+    def play(self, storage, bandits, name, arm, reward=None):
+        bandits[name].pull_arm(arm)
+        storage.record_pull(name, arm)
+        if reward is not None:
+            bandits[name].reward_arm(arm, reward)
+            storage.record_reward(name, arm, reward)
+        storage.save(bandits)
+
+    def test_round_trip(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit", epsilon=0.3)}
+        self.play(storage, bandits, "color_button", "green", 1.0)
+        self.play(storage, bandits, "color_button", "red")
+
+        loaded = self.storage().load()["color_button"]
+        assert loaded.__class__.__name__ == "EpsilonGreedyBandit"
+        assert loaded.epsilon == 0.3
+        assert loaded.arms == ["green", "red", "blue"]
+        assert loaded.values == ["#00FF00", "#FF0000", "#0000FF"]
+        assert list(loaded.pulls) == [1, 1, 0]
+        assert list(loaded.reward) == [1.0, 0.0, 0.0]
+        assert loaded.confidence == bandits["color_button"].confidence
+
+    def test_hosts_share_totals(self):
+        self.storage().save({"color_button": make_bandit("EpsilonGreedyBandit")})
+        host_a, host_b = self.storage(), self.storage()
+        bandits_a, bandits_b = host_a.load(), host_b.load()
+
+        self.play(host_a, bandits_a, "color_button", "green", 1.0)
+        self.play(host_b, bandits_b, "color_button", "green", 1.0)
+
+        loaded = self.storage().load()["color_button"]
+        assert loaded["green"]["pulls"] == 2
+        assert loaded["green"]["reward"] == 2.0
+        assert bandits_b["color_button"]["green"]["pulls"] == 2
+
+    def test_save_is_one_round_trip(self):
+        storage = self.storage(refresh_interval=3600)
+        bandits = {
+            "color_button": make_bandit("EpsilonGreedyBandit"),
+            "color_bg": make_bandit("EpsilonGreedyBandit"),
+        }
+        storage.save(bandits)
+        connection = storage._connection()
+        calls = []
+        pipeline = connection.pipeline
+        connection.pipeline = lambda commands: calls.append(commands) or pipeline(
+            commands
+        )
+        for name in bandits:
+            bandits[name].pull_arm("red")
+            storage.record_pull(name, "red")
+            bandits[name].reward_arm("red", 1.0)
+            storage.record_reward(name, "red", 1.0)
+        storage.save(bandits)
+        assert len(calls) == 1
+        assert len(calls[0]) == 6
+
+    def test_reconnects_after_timeout(self):
+        storage = self.storage(refresh_interval=3600)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.save(bandits)
+        connection = storage._connection()
+        connection._sock.settimeout(0.05)
+        execute = self.server.execute
+
+        def slow(args):
+            self.server.execute = execute
+            time.sleep(0.2)
+            return execute(args)
+
+        self.server.execute = slow
+        with self.assertRaises(OSError):
+            self.play(storage, bandits, "color_button", "red")
+        assert connection.closed
+        self.play(storage, bandits, "color_button", "red")
+        assert storage._connection() is not connection
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 2
+
+    def test_reconnects_after_dropped_connection(self):
+        storage = self.storage(refresh_interval=3600)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.save(bandits)
+        storage._connection()._sock.shutdown(socket.SHUT_RDWR)
+        with self.assertRaises(OSError):
+            self.play(storage, bandits, "color_button", "red")
+        self.play(storage, bandits, "color_button", "red")
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 2
+
+    def test_flush(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        self.play(storage, bandits, "color_button", "red")
+        storage.flush()
+        assert self.storage().load() == {}
+
+
+if __name__ == "__main__":
+    unittest.main()
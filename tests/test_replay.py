@@ -0,0 +1,107 @@
+import gzip
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from flask_mab.bandits import Bandit, EpsilonGreedyBandit, LinUCBBandit
+from flask_mab.replay import compare, evaluate, read_log
+
+
+def logged_traffic(n, seed=0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        arm = rng.choice(["good", "bad"])
+        payoff = 0.8 if arm == "good" else 0.2
+        yield {
+            "arm": arm,
+            "propensity": 0.5,
+            "reward": 1.0 if rng.random() < payoff else 0.0,
+        }
+
+
+def with_arms(bandit):
+    bandit.add_arm("good")
+    bandit.add_arm("bad")
+    return bandit
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_uniform_policy(self):
+        result = evaluate(with_arms(Bandit()), logged_traffic(20000), learn=False)
+        assert result["records"] == 20000
+        assert abs(result["replay"] - 0.5) < 0.03
+        assert abs(result["ips"] - 0.5) < 0.03
+        assert abs(result["snips"] - 0.5) < 0.03
+        assert result["ips_stderr"] < 0.02
+
+    def test_learning_policy_beats_uniform(self):
+        results = compare(
+            {
+                "uniform": with_arms(Bandit()),
+                "greedy": with_arms(EpsilonGreedyBandit(0.1)),
+            },
+            lambda: logged_traffic(20000),
+            chunk_size=100,
+        )
+        assert results["greedy"]["ips"] > results["uniform"]["ips"] + 0.15
+
+    def test_streams_records(self):
+        consumed = []
+
+        def records():
+            for record in logged_traffic(250):
+                consumed.append(record)
+                yield record
+
+        bandit = with_arms(Bandit())
+        original = bandit.suggest_arms
+        seen = []
+
+        def suggest_arms(n):
+            seen.append(len(consumed))
+            return original(n)
+
+        bandit.suggest_arms = suggest_arms
+        evaluate(bandit, records(), chunk_size=100)
+        assert seen == [100, 200, 250]
+
+    def test_reads_gzip_log(self):
+        path = os.path.join(self.dir, "log.jsonl.gz")
+        with gzip.open(path, "wt") as log:
+            for record in logged_traffic(100):
+                log.write(json.dumps(record) + "\n")
+        result = evaluate(with_arms(Bandit()), read_log(path))
+        assert result["records"] == 100
+
+    def test_requires_propensities(self):
+        records = list(logged_traffic(10))
+        records[5]["propensity"] = 0
+        with self.assertRaises(ValueError):
+            evaluate(with_arms(Bandit()), records)
+        for record in records:
+            del record["propensity"]
+        result = evaluate(with_arms(Bandit()), records)
+        assert result["ips"] is None
+        assert result["records"] == 10
+
+    def test_contextual(self):
+        rng = random.Random(4)
+        records = []
+        for _ in range(4000):
+            mobile = rng.random() < 0.5
+            arm = rng.choice(["good", "bad"])
+            best = "bad" if mobile else "good"
+            records.append(
+                ([1.0, 0.0] if mobile else [0.0, 1.0], arm, 0.5, float(arm == best))
+            )
+        result = evaluate(with_arms(LinUCBBandit(2, alpha=0.2)), records, 50)
+        assert result["ips"] > 0.8
@@ -0,0 +1,100 @@
+import unittest
+import os
+import shutil
+import tempfile
+import json
+import multiprocessing
+
+import flask
+from flask_mab import BanditMiddleware, choose_arm
+from flask_mab.counters import SharedCounterTable
+from flask_mab.storage import BanditEncoder
+from utils import make_bandit
+
+
+def pull_many(path, times):
+    table = SharedCounterTable(path)
+    bandit = table.attach("color_button", make_bandit("EpsilonGreedyBandit"))
+    for _ in range(times):
+        bandit.pull_arm("green")
+        bandit.reward_arm("green", 1.0)
+
+
+class SharedCounterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "counters")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_workers_see_same_counts(self):
+        worker_a = SharedCounterTable(self.path, slots=16)
+        worker_b = SharedCounterTable(self.path, slots=16)
+        bandit_a = worker_a.attach("color_button", make_bandit("EpsilonGreedyBandit"))
+        bandit_b = worker_b.attach("color_button", make_bandit("EpsilonGreedyBandit"))
+
+        bandit_a.pull_arm("green")
+        bandit_b.pull_arm("green")
+        bandit_b.reward_arm("green", 1.0)
+        assert bandit_a["green"]["pulls"] == 2
+        assert bandit_a["green"]["reward"] == 1.0
+        assert bandit_a.confidence == bandit_b.confidence
+
+    def test_attach_seeds_new_arms(self):
+        bandit = make_bandit("EpsilonGreedyBandit")
+        bandit.pull_arm("red")
+        SharedCounterTable(self.path).attach("color_button", bandit)
+        fresh = SharedCounterTable(self.path).attach(
+            "color_button", make_bandit("EpsilonGreedyBandit")
+        )
+        assert fresh.pulls == [0, 1, 0]
+
+    def test_serializes_as_lists(self):
+        bandit = SharedCounterTable(self.path).attach(
+            "color_button", make_bandit("EpsilonGreedyBandit")
+        )
+        bandit.pull_arm("blue")
+        assert json.loads(json.dumps(bandit, cls=BanditEncoder))["pulls"] == [0, 0, 1]
+
+    def test_full_table(self):
+        table = SharedCounterTable(self.path, slots=2)
+        with self.assertRaises(IndexError):
+            table.attach("color_button", make_bandit("EpsilonGreedyBandit"))
+
+    def test_processes_do_not_lose_updates(self):
+        SharedCounterTable(self.path)
+        ctx = multiprocessing.get_context("fork")
+        workers = [
+            ctx.Process(target=pull_many, args=(self.path, 250)) for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        bandit = SharedCounterTable(self.path).attach(
+            "color_button", make_bandit("EpsilonGreedyBandit")
+        )
+        assert bandit["green"]["pulls"] == 1000
+        assert bandit["green"]["reward"] == 1000.0
+
+    def test_middleware_attaches(self):
+        app = flask.Flask("test_app")
+        app.config["MAB_SHARED_COUNTERS"] = self.path
+        BanditMiddleware(app)
+        app.add_bandit("color_button", make_bandit("EpsilonGreedyBandit"))
+
+        @app.route("/")
+        @choose_arm("color_button")
+        def root(color_button):
+            return "Hello"
+
+        app.test_client().get("/")
+        bandit = SharedCounterTable(self.path).attach(
+            "color_button", make_bandit("EpsilonGreedyBandit")
+        )
+        assert sum(bandit.pulls) == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
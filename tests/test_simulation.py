@@ -0,0 +1,97 @@
+import random
+import unittest
+
+import flask_mab.bandits
+from flask_mab.simulation import (
+    BernoulliArms,
+    DriftingArms,
+    GaussianArms,
+    format_report,
+    run_trial,
+    simulate,
+)
+
+
+class DistributionTest(unittest.TestCase):
+    def test_bernoulli(self):
+        arms = BernoulliArms([0.0, 1.0])
+        rng = random.Random(1)
+        assert arms.draw(0, 0, rng) == 0.0
+        assert arms.draw(1, 0, rng) == 1.0
+
+    def test_gaussian(self):
+        arms = GaussianArms([5.0], sigma=0.1)
+        draws = [arms.draw(0, 0, random.Random(seed)) for seed in range(50)]
+        assert abs(sum(draws) / 50 - 5.0) < 0.1
+
+    def test_drifting(self):
+        arms = DriftingArms([0.0, 1.0], [1.0, 0.0], period=100)
+        assert arms.mean(0, 0) == 0.0
+        assert arms.mean(0, 50) == 0.5
+        assert arms.mean(1, 1000) == 0.0
+
+
+class SimulateTest(unittest.TestCase):
+    strategies = [
+        ("uniform", "Bandit", {}),
+        ("greedy", "EpsilonGreedyBandit", {"epsilon": 0.1}),
+    ]
+
+    def test_trial(self):
+        result = run_trial(
+            "EpsilonGreedyBandit",
+            {"epsilon": 0.1},
+            BernoulliArms([0.1, 0.9]),
+            horizon=1000,
+            seed=3,
+        )
+        assert len(result["regret_curve"]) == 20
+        assert result["regret"] == result["regret_curve"][-1]
+        assert result["converged"] is not None
+        assert result["suggestions_per_second"] > 0
+
+    def test_trials_are_reproducible(self):
+        arms = BernoulliArms([0.2, 0.5])
+        first = run_trial("ThompsonBandit", {}, arms, 300, seed=7)
+        second = run_trial("ThompsonBandit", {}, arms, 300, seed=7)
+        assert first["regret"] == second["regret"]
+
+    def test_leaves_caller_state_alone(self):
+        np_rng = flask_mab.bandits._np_rng
+        random.seed(11)
+        expected = random.random()
+        random.seed(11)
+        simulate(self.strategies, BernoulliArms([0.2, 0.5]), 50, 2, processes=1)
+        assert random.random() == expected
+        assert flask_mab.bandits._np_rng is np_rng
+
+    def test_compares_strategies(self):
+        results = simulate(
+            self.strategies,
+            BernoulliArms([0.1, 0.2, 0.9]),
+            horizon=1000,
+            trials=4,
+            processes=1,
+        )
+        uniform, greedy = results
+        assert uniform["name"] == "uniform"
+        assert greedy["regret"] < uniform["regret"]
+        assert uniform["converged_share"] == 0.0
+        assert "greedy" in format_report(results)
+
+    def test_process_pool(self):
+        results = simulate(
+            self.strategies,
+            BernoulliArms([0.1, 0.9]),
+            horizon=200,
+            trials=2,
+            processes=2,
+        )
+        inline = simulate(
+            self.strategies,
+            BernoulliArms([0.1, 0.9]),
+            horizon=200,
+            trials=2,
+            processes=1,
+        )
+        assert [r["regret"] for r in results] == [r["regret"] for r in inline]
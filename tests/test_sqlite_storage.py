@@ -0,0 +1,120 @@
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+import flask_mab.storage
+from utils import make_bandit
+
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "bandits.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def storage(self, **kwargs):
+        return flask_mab.storage.SQLiteBanditStorage(self.path, **kwargs)
+
+    def play(self, storage, bandits, name, arm, reward=None):
+        bandits[name].pull_arm(arm)
+        storage.record_pull(name, arm)
+        if reward is not None:
+            bandits[name].reward_arm(arm, reward)
+            storage.record_reward(name, arm, reward)
+        storage.save(bandits)
+
+    def test_round_trip(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit", epsilon=0.3)}
+        self.play(storage, bandits, "color_button", "green", 1.0)
+        self.play(storage, bandits, "color_button", "red")
+
+        loaded = self.storage().load()["color_button"]
+        assert loaded.__class__.__name__ == "EpsilonGreedyBandit"
+        assert loaded.epsilon == 0.3
+        assert loaded.arms == ["green", "red", "blue"]
+        assert loaded.values == ["#00FF00", "#FF0000", "#0000FF"]
+        assert list(loaded.pulls) == [1, 1, 0]
+        assert list(loaded.reward) == [1.0, 0.0, 0.0]
+        assert loaded.confidence == bandits["color_button"].confidence
+
+    def test_pull_during_write_kept(self):
+        storage = self.storage(refresh_interval=0)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.save(bandits)
+        write = storage._write
+
+        def write_while_pulled(new, updates):
+            write(new, updates)
+            # Another request thread pulls while the write is in flight,
+            # recording it once the save lets go of the lock
+            bandits["color_button"].pull_arm("red")
+
+        storage._write = write_while_pulled
+        self.play(storage, bandits, "color_button", "red")
+        storage.record_pull("color_button", "red")
+        assert bandits["color_button"]["red"]["pulls"] == 2
+        storage._write = write
+        storage.save(bandits)
+        assert bandits["color_button"]["red"]["pulls"] == 2
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 2
+
+    def test_failed_write_retried(self):
+        storage = self.storage(refresh_interval=0)
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        storage.save(bandits)
+        write = storage._write
+
+        def locked(new, updates):
+            storage._write = write
+            raise sqlite3.OperationalError("database is locked")
+
+        storage._write = locked
+        with self.assertRaises(sqlite3.OperationalError):
+            self.play(storage, bandits, "color_button", "red")
+        storage.save(bandits)
+        assert bandits["color_button"]["red"]["pulls"] == 1
+        assert self.storage().load()["color_button"]["red"]["pulls"] == 1
+
+    def test_workers_share_totals(self):
+        self.storage().save({"color_button": make_bandit("EpsilonGreedyBandit")})
+        worker_a, worker_b = self.storage(), self.storage()
+        bandits_a, bandits_b = worker_a.load(), worker_b.load()
+
+        self.play(worker_a, bandits_a, "color_button", "green", 1.0)
+        self.play(worker_b, bandits_b, "color_button", "green", 1.0)
+        self.play(worker_b, bandits_b, "color_button", "blue")
+
+        loaded = self.storage().load()["color_button"]
+        assert loaded["green"]["pulls"] == 2
+        assert loaded["green"]["reward"] == 2.0
+        assert loaded["blue"]["pulls"] == 1
+        # worker b refreshed from the shared totals on its first save
+        assert bandits_b["color_button"]["green"]["pulls"] == 2
+
+    def test_connection_per_thread(self):
+        storage = self.storage()
+        connections = []
+        thread = threading.Thread(
+            target=lambda: connections.append(storage._connection())
+        )
+        thread.start()
+        thread.join()
+        assert storage._connection() is storage._connection()
+        assert connections[0] is not storage._connection()
+
+    def test_flush(self):
+        storage = self.storage()
+        bandits = {"color_button": make_bandit("EpsilonGreedyBandit")}
+        self.play(storage, bandits, "color_button", "red")
+        storage.flush()
+        assert self.storage().load() == {}
+
+
+if __name__ == "__main__":
+    unittest.main()
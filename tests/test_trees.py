@@ -0,0 +1,85 @@
+import random
+import unittest
+
+from flask_mab.trees import MaxTree, SumTree
+from utils import make_bandit
+
+
+class SumTreeTest(unittest.TestCase):
+    def test_find_matches_cumulative_scan(self):
+        weights = [random.random() for _ in range(37)]
+        weights[5] = 0.0
+        tree = SumTree(weights)
+        for _ in range(500):
+            value = random.random() * tree.total
+            cumulative = 0.0
+            for expected, weight in enumerate(weights):
+                cumulative += weight
+                if cumulative > value:
+                    break
+            assert tree.find(value) == expected
+
+    def test_update(self):
+        tree = SumTree([1.0, 1.0, 1.0])
+        tree.update(1, 0.0)
+        assert tree.total == 2.0
+        assert tree.find(0.5) == 0
+        assert tree.find(1.5) == 2
+        assert tree[1] == 0.0
+
+
+class MaxTreeTest(unittest.TestCase):
+    def test_argmax(self):
+        values = [random.random() for _ in range(100)]
+        tree = MaxTree(values)
+        for _ in range(200):
+            index = random.randrange(100)
+            values[index] = random.choice([0.0, 0.5, 1.0, random.random()])
+            tree.update(index, values[index])
+            assert tree.argmax() == values.index(max(values))
+
+
+class LargeArmTest(unittest.TestCase):
+    def make_large(self, bandit_type, **kwargs):
+        bandit = make_bandit(bandit_type, **kwargs)
+        bandit.large_arm_threshold = 3
+        return bandit
+
+    def test_naive_stochastic_uses_tree(self):
+        bandit = self.make_large("NaiveStochasticBandit")
+        bandit.suggest_arm()
+        assert bandit._sum_tree is not None
+        for arm_id in bandit.arms:
+            bandit.pull_arm(arm_id)
+        bandit.reward_arm("blue", 1.0)
+        assert bandit._sum_tree.total == 1.0
+        chosen = set(bandit.suggest_arm()["id"] for _ in range(100))
+        assert chosen == {"blue"}
+
+    def test_softmax_tracks_exponentials(self):
+        bandit = self.make_large("SoftmaxBandit", tau=0.1)
+        bandit.suggest_arm()
+        bandit.pull_arm("red")
+        bandit.reward_arm("red", 1.0)
+        tree_weights = [bandit._sum_tree[ind] for ind in range(3)]
+        assert tree_weights == bandit._exps
+        chosen = [bandit.suggest_arm()["id"] for _ in range(200)]
+        assert chosen.count("red") > 150
+
+    def test_annealing_drops_tree_with_tau(self):
+        bandit = self.make_large("AnnealingSoftmaxBandit")
+        bandit.suggest_arm()
+        assert bandit._sum_tree is not None
+        bandit.pull_arm("red")
+        assert bandit._sum_tree is None
+
+    def test_epsilon_greedy_uses_max_tree(self):
+        bandit = self.make_large("EpsilonGreedyBandit", epsilon=0.0)
+        bandit.pull_arm("red")
+        bandit.reward_arm("red", 1.0)
+        assert bandit.suggest_arm()["id"] == "red"
+        bandit.reward_arm("red", -5.0)
+        bandit.pull_arm("blue")
+        bandit.reward_arm("blue", 0.5)
+        assert bandit.suggest_arm()["id"] == "blue"
+        assert bandit._max_tree is not None
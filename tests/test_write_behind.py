@@ -0,0 +1,98 @@
+import unittest
+import time
+import flask
+from mock import Mock
+
+from flask_mab import BanditMiddleware, choose_arm, reward_endpt
+import flask_mab.storage
+from utils import make_bandit
+
+
+class WriteBehindTest(unittest.TestCase):
+    def setUp(self):
+        app = flask.Flask("test_app")
+        app.config["MAB_WRITE_BEHIND"] = True
+        app.config["MAB_FLUSH_INTERVAL"] = 3600
+        app.config["MAB_FLUSH_MAX_PENDING"] = 1000
+        BanditMiddleware(app)
+        self.bandit = make_bandit("EpsilonGreedyBandit", epsilon=1.0)
+        app.add_bandit("color_button", self.bandit)
+
+        @app.route("/")
+        def root():
+            return "Hello"
+
+        @app.route("/show_btn_decorated")
+        @choose_arm("color_button")
+        def assign_arm_decorated(color_button):
+            return flask.make_response("assigned an arm")
+
+        @app.route("/reward_decorated")
+        @reward_endpt("color_button", 1.0)
+        def reward_decorated():
+            return flask.make_response("awarded the arm")
+
+        self.app = app
+        self.storage = app.extensions["mab"].bandit_storage
+        self.storage.storage.save = Mock()
+        self.app_client = app.test_client()
+
+    def test_wraps_configured_engine(self):
+        assert isinstance(self.storage, flask_mab.storage.WriteBehindStorage)
+
+    def test_requests_do_not_save(self):
+        self.app_client.get("/show_btn_decorated")
+        self.app_client.get("/reward_decorated")
+        assert not self.storage.storage.save.called
+        self.storage.sync()
+        self.storage.storage.save.assert_called_once_with({"color_button": self.bandit})
+
+    def test_untouched_bandits_not_queued(self):
+        self.app_client.get("/")
+        assert self.storage._pending == 0
+        self.app_client.get("/show_btn_decorated")
+        assert self.storage._pending == 1
+        self.app_client.get("/show_btn_decorated")
+        assert self.storage._pending == 1
+
+    def test_max_pending_wakes_flusher(self):
+        self.storage.max_pending = 1
+        self.app_client.get("/show_btn_decorated")
+        self.storage._thread.join(0.5)
+        self.storage.storage.save.assert_called_once_with({"color_button": self.bandit})
+
+    def test_close_flushes_pending(self):
+        self.app_client.get("/show_btn_decorated")
+        self.storage.close()
+        assert self.storage.storage.save.call_count == 1
+        self.storage.close()
+        assert self.storage.storage.save.call_count == 1
+
+    def test_failed_write_is_retried(self):
+        self.storage.storage.save.side_effect = [IOError("disk full"), None]
+        self.app_client.get("/show_btn_decorated")
+        with self.assertLogs("flask_mab.storage", "ERROR"):
+            self.storage.interval = 0.01
+            self.storage._wake.set()
+            for _ in range(200):
+                if self.storage.storage.save.call_count == 2:
+                    break
+                time.sleep(0.01)
+        assert self.storage._thread.is_alive()
+        assert self.storage.storage.save.call_count == 2
+        assert self.storage._pending == 0
+
+    def test_failed_events_requeued(self):
+        self.storage.storage.record_pull = Mock(side_effect=[None, IOError, None])
+        self.storage.record_pull("color_button", "green")
+        self.storage.record_pull("color_button", "red")
+        with self.assertRaises(IOError):
+            self.storage.sync()
+        assert self.storage._events == [("color_button", "red")]
+        self.storage.sync()
+        self.storage.storage.record_pull.assert_called_with("color_button", "red")
+        assert self.storage._events == []
+
+
+if __name__ == "__main__":
+    unittest.main()
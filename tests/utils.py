@@ -8,3 +8,86 @@ def make_bandit(bandit_type, **kwargs):
     bandit.add_arm("red", "#FF0000")
     bandit.add_arm("blue", "#0000FF")
     return bandit
+
+
+class FakeRedisServer(object):
+    """In-process stand-in for a Redis server, speaking just enough of the
+    protocol (and the hash commands) for RedisBanditStorage.
+    """
+
+    def __init__(self):
+        import socketserver
+        import threading
+
+        self.data = {}
+        self.commands = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    self.wfile.write(server.execute(args))
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+
+    @staticmethod
+    def bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(self, args):
+        name, args = args[0].upper().decode(), args[1:]
+        with self.lock:
+            self.commands.append(name)
+            if name in ("PING", "SELECT"):
+                return b"+OK\r\n"
+            if name == "DEL":
+                return b":%d\r\n" % sum(
+                    self.data.pop(key, None) is not None for key in args
+                )
+            table = self.data.setdefault(args[0], {})
+            if name == "HSET":
+                table[args[1]] = args[2]
+                return b":1\r\n"
+            if name == "HSETNX":
+                if args[1] in table:
+                    return b":0\r\n"
+                table[args[1]] = args[2]
+                return b":1\r\n"
+            if name == "HINCRBY":
+                table[args[1]] = b"%d" % (
+                    int(float(table.get(args[1], b"0"))) + int(args[2])
+                )
+                return b":%s\r\n" % table[args[1]]
+            if name == "HINCRBYFLOAT":
+                table[args[1]] = repr(
+                    float(table.get(args[1], b"0")) + float(args[2])
+                ).encode()
+                return self.bulk(table[args[1]])
+            if name == "HGETALL":
+                reply = [b"*%d\r\n" % (2 * len(table))]
+                for field, value in table.items():
+                    reply.append(self.bulk(field) + self.bulk(value))
+                return b"".join(reply)
+            if name == "HKEYS":
+                return b"*%d\r\n" % len(table) + b"".join(map(self.bulk, table))
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()